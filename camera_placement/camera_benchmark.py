@@ -0,0 +1,298 @@
+"""
+Camera placement instance families and solver benchmark.
+========================================================
+
+Command-line version of the workflow of `camera_optimization_problem.ipynb`
+and `spinglass_example.py`:
+
+- instance families with given numbers of sites N, cameras C and
+  multipliers xi are generated deterministically: Sobol site locations and
+  radii drawn from a seed derived from (seed, N), as in the notebook;
+- each instance is written in binary form (numpy .npz) with the sites and
+  the sparse overlap pairs, so batch jobs can load it without rebuilding;
+- the ground state is searched with qtealeaves (MPS or TTN, configurable
+  bond dimension), or with a classical greedy single-flip descent that does
+  not need qtealeaves;
+- coverage, overlap, number of cameras, energy and runtime are reported.
+
+Usage:
+    python3 camera_benchmark.py --sites 16 64 256 --xi 1.0 --penalty 2.0 --solver tn --bond-dimension 20
+
+"""
+import os
+import json
+import argparse
+from time import perf_counter
+
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.stats.qmc import Sobol
+
+from camera_problem import overlapping_pairs, number_constraint, LowRankIsing
+
+try:
+    import qtealeaves as qtl
+    from qtealeaves import modeling
+except ImportError:
+    qtl = None
+
+
+def generate_sites(N, a=10, seed=42, optimization="auto"):
+    """
+    Function to generate the candidate sites of an instance, as in the notebook.
+
+
+    Input:
+    -----------------------------------------
+       N:             int, number of sites
+       a:             float, side of the square. Default: 10.
+       seed:          int, seed of the radii. Default: 42.
+       optimization:  str or None, optimization of the Sobol sample. Default: 'auto',
+                      i.e. 'lloyd' as in the notebook up to 4096 sites, and None
+                      above, since the Lloyd iterations need all the pairwise distances.
+
+    Returns:
+    -----------------------------------------
+    dict of numpy.arrays with keys 'id', 'x_loc', 'y_loc', 'radius', 'area'
+
+    """
+    rng = np.random.default_rng(np.random.SeedSequence([seed, N]))
+    radius = 0.5*a*(1. + rng.random(N))/np.sqrt(N)
+
+    # Distribute sites uniformly but not symmetrically in the square
+    if optimization == "auto":
+        optimization = "lloyd" if N <= 4096 else None
+    m = int(np.ceil(np.log2(N)))
+    sampler = Sobol(2, scramble=False, optimization=optimization)
+    sequence = a*sampler.random_base2(m=m)[:N]
+
+    return {'id': np.arange(N, dtype=int),
+            'x_loc': sequence[:, 0],
+            'y_loc': sequence[:, 1],
+            'radius': radius,
+            'area': np.pi*radius**2}
+
+
+def write_instance(filename, sites, metadata, pairs=None):
+    """
+    Function to write the sites and the overlap pairs of an instance to a .npz file.
+    The pairs (rows, cols, overlap) of `overlapping_pairs` are computed if not given.
+    """
+    if pairs is None:
+        pairs = overlapping_pairs(sites['x_loc'], sites['y_loc'], sites['radius'])
+    rows, cols, overlap = pairs
+    np.savez(filename, rows=rows, cols=cols, overlap=overlap,
+             metadata=np.array(json.dumps(metadata)), **sites)
+
+
+def read_instance(filename):
+    """
+    Function to read an instance written by `write_instance`.
+
+
+    Returns:
+    -----------------------------------------
+        sites:     dict of numpy.arrays, data of the cameras
+        W:         scipy.sparse.csr_matrix, symmetric overlap matrix
+        metadata:  dict, parameters of the instance
+
+    """
+    with np.load(filename) as data:
+        sites = {key: data[key] for key in ('id', 'x_loc', 'y_loc', 'radius', 'area')}
+        rows, cols, overlap = data['rows'], data['cols'], data['overlap']
+        metadata = json.loads(str(data['metadata']))
+    N = sites['id'].shape[0]
+    W = coo_matrix((np.concatenate([overlap, overlap]),
+                    (np.concatenate([rows, cols]), np.concatenate([cols, rows]))),
+                   shape=(N, N)).tocsr()
+    return sites, W, metadata
+
+
+def generate_family(sites_list, cameras_list, xi_list, output_folder, a=10, seed=42):
+    """
+    Function to write a family of instances, one per (N, C, xi), to output_folder.
+    Entries of cameras_list smaller than 1 are fractions of N.
+
+
+    Returns:
+    -----------------------------------------
+    list of str, the written files
+
+    """
+    os.makedirs(output_folder, exist_ok=True)
+    filenames = []
+    for N in sites_list:
+        sites = generate_sites(N, a, seed)
+        # The overlaps depend only on the sites, shared by all the (C, xi)
+        pairs = overlapping_pairs(sites['x_loc'], sites['y_loc'], sites['radius'])
+        for cameras in cameras_list:
+            C = int(round(cameras*N)) if cameras < 1 else int(cameras)
+            for xi in xi_list:
+                filename = os.path.join(output_folder, f"camera_N_{N}_C_{C}_xi_{xi}.npz")
+                metadata = {'N': N, 'C': C, 'xi': xi, 'a': a, 'seed': seed}
+                write_instance(filename, sites, metadata, pairs)
+                filenames.append(filename)
+    return filenames
+
+
+def build_model(sites, W, xi, C, P):
+    """
+    Function to build the Ising model of an instance; P=0 gives the unconstrained problem.
+    """
+    A = -xi * np.asarray(sites['area'])
+    if P == 0:
+        return LowRankIsing(W, A)
+    return number_constraint(W, A, C, P)[0]
+
+
+def greedy_ground_state(model, max_sweeps=100, seed=0):
+    """
+    Function to search the ground state with single spin flips, accepted whenever
+    they lower the energy, sweeping the sites in random order until convergence.
+
+
+    Returns:
+    -----------------------------------------
+    numpy.array, spins z_i in {-1, 1}
+
+    """
+    rng = np.random.default_rng(seed)
+    W = model.W
+    z = -np.ones(model.num_sites)
+    fields = W @ z
+    total = np.sum(z)
+    for _ in range(max_sweeps):
+        flipped = False
+        for ii in rng.permutation(model.num_sites):
+            local = fields[ii] + model.uniform*(total - z[ii]) + model.A[ii]
+            if z[ii]*local > 0:
+                start, stop = W.indptr[ii], W.indptr[ii + 1]
+                fields[W.indices[start:stop]] -= 2*z[ii]*W.data[start:stop]
+                total -= 2*z[ii]
+                z[ii] = -z[ii]
+                flipped = True
+        if not flipped:
+            break
+    return z
+
+
+def tn_ground_state(model, bond_dimension=20, max_iter=10, tn_type=6, folder="camera_tn"):
+    """
+    Function to search the ground state with qtealeaves, as in `spinglass_example.py`.
+    The state is read from the local magnetization <sz> of each site.
+
+
+    Input:
+    -----------------------------------------
+       model:           LowRankIsing, the Ising problem
+       bond_dimension:  int, maximum bond dimension. Default: 20.
+       max_iter:        int, maximum number of sweeps. Default: 10.
+       tn_type:         int, 5 for TTN (N power of 2), 6 for MPS. Default: 6.
+       folder:          str, folder of the simulation files. Default: 'camera_tn'.
+
+    Returns:
+    -----------------------------------------
+    numpy.array, spins z_i in {-1, 1}
+
+    """
+    if qtl is None:
+        raise ImportError("qtealeaves is required for the tensor-network solver.")
+
+    qtl_model = modeling.QuantumModel(1, "L", name="CameraPlacement")
+    for term in model.qtealeaves_terms("sz"):
+        qtl_model += term
+
+    my_conv = qtl.convergence_parameters.TNConvergenceParameters(
+        max_iter=max_iter,
+        max_bond_dimension=bond_dimension,
+        statics_method=2        # Single-tensor update with space-link expansion
+    )
+    my_ops = qtl.operators.TNSpin12Operators()
+    my_obs = qtl.observables.TNObservables()
+    my_obs += qtl.observables.TNObsLocal("sz", "sz")
+
+    simulation = qtl.QuantumGreenTeaSimulation(
+        qtl_model,
+        my_ops,
+        my_conv,
+        my_obs,
+        tn_type=tn_type,
+        tensor_backend=2,
+        folder_name_input=folder + "/input",
+        folder_name_output=folder + "/output",
+        has_log_file=False,
+        store_checkpoints=False,
+    )
+    params = {"L": model.num_sites}
+    simulation.run([params], delete_existing_folder=True)
+    magnetization = np.real(np.asarray(simulation.get_static_obs(params)["sz"]))
+    return np.where(magnetization >= 0, 1.0, -1.0)
+
+
+def report(sites, W, model, z):
+    """
+    Function to compute the metrics of a solution; cameras are on where z_i = 1.
+
+
+    Returns:
+    -----------------------------------------
+    dict with the number of 'cameras', the total 'area' of their fields of view,
+    the pairwise 'overlap', the 'coverage' area (to second order in the overlaps),
+    and the Ising 'energy'
+
+    """
+    on = z > 0
+    area = float(np.sum(np.asarray(sites['area'])[on]))
+    overlap = 0.5*float(on.astype(float) @ (W @ on.astype(float)))
+    return {'cameras': int(np.sum(on)),
+            'area': area,
+            'overlap': overlap,
+            'coverage': area - overlap,
+            'energy': float(model.energy(z))}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Camera placement instances and solver benchmark.")
+    parser.add_argument("--sites", type=int, nargs="+", default=[16, 32, 64])
+    parser.add_argument("--cameras", type=float, nargs="+", default=[0.5],
+                        help="Numbers of cameras, or fractions of N if smaller than 1.")
+    parser.add_argument("--xi", type=float, nargs="+", default=[1.0])
+    parser.add_argument("--penalty", type=float, default=2.0,
+                        help="Penalty of the number constraint, 0 for the unconstrained problem.")
+    parser.add_argument("--side", type=float, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--solver", default="greedy", choices=["greedy", "tn"])
+    parser.add_argument("--bond-dimension", type=int, default=20)
+    parser.add_argument("--max-iter", type=int, default=10)
+    parser.add_argument("--tn-type", type=int, default=6, choices=[5, 6])
+    parser.add_argument("--output", default="camera_instances")
+    args = parser.parse_args()
+
+    st_time = perf_counter()
+    filenames = generate_family(args.sites, args.cameras, args.xi, args.output, args.side, args.seed)
+    print(f"Written {len(filenames)} instances to {args.output} in {perf_counter() - st_time:.3f} s")
+
+    print(f"{'N':>7} {'C':>6} {'xi':>6} {'cameras':>8} {'coverage':>10} {'overlap':>10} "
+          f"{'energy':>12} {'build [s]':>10} {'solve [s]':>10}")
+    for filename in filenames:
+        st_time = perf_counter()
+        sites, W, metadata = read_instance(filename)
+        model = build_model(sites, W, metadata['xi'], metadata['C'], args.penalty)
+        build_time = perf_counter() - st_time
+
+        st_time = perf_counter()
+        if args.solver == "tn":
+            z = tn_ground_state(model, args.bond_dimension, args.max_iter, args.tn_type,
+                                folder=os.path.join(args.output, "tn_" + os.path.basename(filename)[:-4]))
+        else:
+            z = greedy_ground_state(model, seed=args.seed)
+        solve_time = perf_counter() - st_time
+
+        result = report(sites, W, model, z)
+        print(f"{metadata['N']:>7} {metadata['C']:>6} {metadata['xi']:>6} {result['cameras']:>8} "
+              f"{result['coverage']:>10.4f} {result['overlap']:>10.4f} {result['energy']:>12.4f} "
+              f"{build_time:>10.3f} {solve_time:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+"""
+Ising formulation of the camera placement problem.
+==================================================
+
+Library version of the problem generation in
+`camera_optimization_problem.ipynb`. The overlap matrix `W` between the
+fields of view of the cameras is sparse, since each camera only overlaps
+with its neighbours: the candidate pairs are found with a KD-tree, the
+circle-intersection areas are computed for all of them at once with numpy,
+and `W` is returned as a `scipy.sparse` matrix. Instances with 10^4-10^5
+candidate sites are built in seconds.
+
+The soft number constraint adds the same coupling to all the pairs of
+sites. `number_constraint` keeps it as a separate uniform all-to-all term
+next to the sparse `W`, instead of adding a dense N x N matrix, and
+`LowRankIsing.qtealeaves_terms` exports it to qtealeaves terms without
+ever building the dense matrix either. Memory stays proportional to the
+number of overlapping pairs.
+
+"""
+import numpy as np
+from scipy.sparse import coo_matrix, csr_matrix, triu
+from scipy.spatial import cKDTree
+
+try:
+    from qtealeaves import modeling
+except ImportError:
+    modeling = None
+
+
+def circle_overlap(x0, y0, r0, x1, y1, r1):
+    """
+    Function to calculate the overlap between pairs of circles,
+    given the coordinates of the center and the radius of each circle.
+    All the arguments can be numpy arrays of the same shape, and each
+    entry is a pair of circles.
+
+
+    Input:
+    -----------------------------------------
+       x0:  float or numpy.array, x-coordinate of first circle
+       y0:  float or numpy.array, y-coordinate of first circle
+       r0:  float or numpy.array, radius of first circle
+       x1:  float or numpy.array, x-coordinate of second circle
+       y1:  float or numpy.array, y-coordinate of second circle
+       r1:  float or numpy.array, radius of second circle
+
+    Returns:
+    -----------------------------------------
+    float or numpy.array, overlap.
+
+    """
+    x0, y0, r0, x1, y1, r1 = np.broadcast_arrays(
+        *(np.asarray(value, dtype=float) for value in (x0, y0, r0, x1, y1, r1))
+    )
+    rr0 = r0*r0
+    rr1 = r1*r1
+    c = np.hypot(x1 - x0, y1 - y0)
+    overlap = np.zeros(c.shape)
+
+    # One circle inside the other
+    inside = c <= np.abs(r0 - r1)
+    overlap[inside] = np.pi*np.minimum(rr0, rr1)[inside]
+
+    # Proper intersection (lens)
+    lens = ~inside & (c < r0 + r1)
+    c, r0, r1, rr0, rr1 = c[lens], r0[lens], r1[lens], rr0[lens], rr1[lens]
+    phi = np.arccos(np.clip((rr0 + c*c - rr1) / (2*r0*c), -1, 1))
+    theta = np.arccos(np.clip((rr1 + c*c - rr0) / (2*r1*c), -1, 1))
+    overlap[lens] = theta*rr1 + phi*rr0 - 0.5*np.sqrt(
+        np.maximum(0, (r0+r1-c) * (r0-r1+c) * (r1-r0+c) * (r1+r0+c))
+    )
+    return overlap if overlap.ndim else float(overlap)
+
+
+def overlapping_pairs(x_loc, y_loc, radius):
+    """
+    Function to find the pairs of cameras whose fields of view overlap,
+    with a KD-tree neighbour search.
+
+
+    Input:
+    -----------------------------------------
+       x_loc:   numpy.array, x-coordinates of the sites, shape=(N,)
+       y_loc:   numpy.array, y-coordinates of the sites, shape=(N,)
+       radius:  numpy.array, radii of the fields of view, shape=(N,)
+
+    Returns:
+    -----------------------------------------
+        rows, cols: numpy.arrays of site indices with rows < cols
+        overlap:    numpy.array, overlap area of each pair
+
+    """
+    x_loc = np.asarray(x_loc, dtype=float)
+    y_loc = np.asarray(y_loc, dtype=float)
+    radius = np.asarray(radius, dtype=float)
+
+    # Every overlapping pair is closer than twice the largest radius
+    tree = cKDTree(np.column_stack([x_loc, y_loc]))
+    pairs = tree.query_pairs(r=2*np.max(radius, initial=0), output_type="ndarray")
+    rows, cols = pairs[:, 0], pairs[:, 1]
+
+    overlap = circle_overlap(x_loc[rows], y_loc[rows], radius[rows],
+                             x_loc[cols], y_loc[cols], radius[cols])
+    keep = overlap > 0
+    rows, cols, overlap = rows[keep], cols[keep], overlap[keep]
+    order = np.lexsort((cols, rows))
+    return rows[order], cols[order], overlap[order]
+
+
+def overlap_matrix(x_loc, y_loc, radius):
+    """
+    Function to calculate the sparse overlap matrix between the cameras.
+
+
+    Input:
+    -----------------------------------------
+       x_loc:   numpy.array, x-coordinates of the sites, shape=(N,)
+       y_loc:   numpy.array, y-coordinates of the sites, shape=(N,)
+       radius:  numpy.array, radii of the fields of view, shape=(N,)
+
+    Returns:
+    -----------------------------------------
+    scipy.sparse.csr_matrix, symmetric overlap matrix with zero diagonal, shape=(N, N)
+
+    """
+    num_sites = len(x_loc)
+    rows, cols, overlap = overlapping_pairs(x_loc, y_loc, radius)
+    W = coo_matrix(
+        (np.concatenate([overlap, overlap]),
+         (np.concatenate([rows, cols]), np.concatenate([cols, rows]))),
+        shape=(num_sites, num_sites),
+    )
+    return W.tocsr()
+
+
+def generate_problem(data, xi, normalize=False):
+    """
+    Function to calculate the overlap matrix and the linear term of the Ising model,
+    given the problem parameters. Same as in the notebook, but with sparse W.
+
+
+    Input:
+    -----------------------------------------
+        data: pandas.DataFrame or dict of numpy.arrays with keys
+              'x_loc', 'y_loc', 'radius' and optionally 'area',
+              data of the cameras.
+        xi: float, relative multiplier.
+        normalize: bool, return normalized terms. Default: False.
+
+    Returns:
+    -----------------------------------------
+        W: scipy.sparse.csr_matrix, overlap matrix, shape=(N, N)
+        A: numpy.array, linear term, shape=(N,)
+
+    """
+    assert xi >= 0, r"\xi parameters must be non-negative."
+    radius = np.asarray(data['radius'], dtype=float)
+    W = overlap_matrix(data['x_loc'], data['y_loc'], radius)
+
+    # We define the quantities in the theory
+    area = np.asarray(data['area'], dtype=float) if 'area' in data else np.pi*radius**2
+    A = -xi * area
+
+    ## Normalize the matrices
+    if normalize:
+        norm = max([np.max(np.abs(W.data), initial=0), np.max(np.abs(A))])
+        W = W/norm
+        A = A/norm
+    return W, A
+
+
+class LowRankIsing:
+    """
+    Ising model with a sparse coupling matrix plus a uniform all-to-all coupling,
+        H(z) = sum_{i<j} (W_ij + uniform) z_i z_j + sum_i A_i z_i.
+
+
+    Input:
+    -----------------------------------------
+        W:        scipy.sparse matrix, symmetric with zero diagonal, shape=(N, N)
+        A:        numpy.array, linear term, shape=(N,)
+        uniform:  float, coupling added to every pair of sites. Default: 0.
+
+    """
+
+    def __init__(self, W, A, uniform=0.0):
+        self.W = csr_matrix(W)
+        self.A = np.asarray(A, dtype=float)
+        self.uniform = float(uniform)
+
+    @property
+    def num_sites(self):
+        return self.A.shape[0]
+
+    def energy(self, z):
+        """
+        Ising energy of one configuration, shape=(N,), or of a batch, shape=(M, N),
+        of spins z_i in {-1, 1}.
+        """
+        z = np.asarray(z, dtype=float)
+        pairs = 0.5 * np.sum(z * (self.W @ z.T).T, axis=-1)
+        total = np.sum(z, axis=-1)
+        return pairs + 0.5 * self.uniform * (total**2 - np.sum(z**2, axis=-1)) + z @ self.A
+
+    def to_dense(self):
+        """
+        Dense Ising matrix and linear term, as returned by the notebook, only for small N.
+        """
+        W_dense = self.W.toarray() + self.uniform * (1 - np.eye(self.num_sites))
+        return W_dense, self.A.copy()
+
+    def qtealeaves_terms(self, operator="sz"):
+        """
+        Function to export the model to qtealeaves terms, to be added to a
+        `modeling.QuantumModel(1, "L")` with L equal to the number of sites.
+
+
+        Input:
+        -----------------------------------------
+            operator: str, single-site operator of the Ising variables. Default: "sz".
+
+        Returns:
+        -----------------------------------------
+        list of qtealeaves terms: the linear term, the sparse pairs of W,
+        and one two-body term per distance for the uniform coupling.
+
+        """
+        if modeling is None:
+            raise ImportError("qtealeaves is required to export the model.")
+        terms = [modeling.RandomizedLocalTerm(operator, lambda params: self.A)]
+        terms.append(SparseAllToAllTerm1D([operator, operator], triu(self.W, k=1)))
+        if self.uniform != 0:
+            for shift in range(1, self.num_sites):
+                terms.append(modeling.TwoBodyTerm1D(
+                    [operator, operator], shift=shift, strength=self.uniform, has_obc=True
+                ))
+        return terms
+
+
+if modeling is not None:
+
+    class SparseAllToAllTerm1D(modeling.TwoBodyAllToAllTerm1D):
+        """
+        `TwoBodyAllToAllTerm1D` whose coupling matrix is a scipy.sparse upper
+        triangle: only the stored pairs are visited, instead of all the
+        N(N-1)/2 entries of a dense matrix. For the python emulators only.
+        """
+
+        def get_interactions(self, ll, params, **kwargs):
+            cmat = self.coupling_matrix.tocoo()
+            for ii, jj, weight in zip(cmat.row, cmat.col, cmat.data):
+                if weight == 0.0 or ii >= jj:
+                    continue
+                yield {"operators": self.operators, "weight": weight}, [int(ii), int(jj)]
+
+
+def number_constraint(W, A, C, P, normalize=False):
+    """
+    Function to add the soft constraint on the number of cameras to the sparse
+    Ising model. Same couplings as the notebook `number_constraint`, kept as
+    a uniform all-to-all term instead of a dense matrix.
+
+
+    Input:
+    -----------------------------------------
+       W:           scipy.sparse matrix, Ising matrix of unconstrained model, shape=(N, N)
+       A:           numpy.array, Ising linear term of unconstrained model, shape=(N,)
+       C:           int, number of available cameras
+       P:           float, penalty factor
+       normalize:   bool, normalize the Ising terms? Default: False.
+
+    Returns:
+    -----------------------------------------
+        model:   LowRankIsing, constrained model
+        scaling: float, scaling dividing the terms (if normalize is False, it is 1.0).
+
+    """
+    num_sites = W.shape[0]
+    assert P >= 0, "Penalty must be non-negative"
+    assert num_sites > C > 0, "Number of cameras must be in (0, N)"
+    W = csr_matrix(W)
+    A_P = np.asarray(A, dtype=float) + 2 * P * (num_sites - 2*C)
+    uniform = 2 * P
+    scaling = 1.0
+    if normalize:
+        max_w = np.max(np.abs(W.data + uniform), initial=abs(uniform))
+        scaling = max([max_w, np.max(np.abs(A_P))])
+        W = W / scaling
+        A_P = A_P / scaling
+        uniform = uniform / scaling
+    return LowRankIsing(W, A_P, uniform), scaling
@@ -1,41 +1,72 @@
 import numpy as np
+from scipy.sparse import coo_matrix
 from qtealeaves.modeling import QuantumModel
 from qtealeaves.modeling import RandomizedLocalTerm, TwoBodyAllToAllTerm1D
 
-# local disorder sampler
-def loc_rand(params):
-    # seeding
-    qtrand = np.random.RandomState()
+# independent random streams of the local and two-body disorder
+LOCAL_STREAM = 0
+TWOBODY_STREAM = 1
+
+# seeded random generator of one disorder term
+def disorder_rng(params, stream):
     if "seed" not in params:
         print("Attention: Running with default seed")
-    # seed the random numbers
-    qtrand.seed(params.get("seed", [11, 13, 17, 19]))
-    # skip 1000 numbers
-    _ = qtrand.random(1000)
+    # the same seed always gives the same couplings, and the
+    # local and two-body terms draw from independent streams
+    seed = np.random.SeedSequence(params.get("seed", [11, 13, 17, 19]), spawn_key=(stream,))
+    return np.random.default_rng(seed)
+
+# nearest-neighbour pairs (i, j) with i < j (with periodic boundaries)
+def ring_pairs(L):
+    sites = np.arange(L)
+    pairs = np.sort(np.column_stack([sites, np.mod(sites + 1, L)]), axis=1)
+    # for L = 2 both bonds connect the same pair
+    pairs = np.unique(pairs, axis=0)
+    return pairs[:, 0], pairs[:, 1]
+
+# local disorder of n_realizations, shape (n_realizations, L), in one call
+def sample_local(L, n_realizations, rng):
+    return rng.normal(0, 1, (n_realizations, L))
+
+# two-body disorder of n_realizations, in one call: the pairs (rows, cols)
+# and the couplings of each realization, shape (n_realizations, n_pairs)
+def sample_twobody(L, n_realizations, rng):
+    rows, cols = ring_pairs(L)
+    couplings = rng.normal(0, 1, (n_realizations, len(rows)))
+    return rows, cols, couplings
+
+# symmetric sparse coupling matrix of one realization of the pairs
+def sparse_coupling_matrix(L, rows, cols, couplings):
+    coupling_matrix = coo_matrix((np.concatenate([couplings, couplings]),
+                                  (np.concatenate([rows, cols]), np.concatenate([cols, rows]))),
+                                 shape=(L, L))
+    return coupling_matrix.tocsr()
+
+# local disorder sampler, a batch of n_realizations couplings;
+# its first realization is the one of loc_rand with the same params
+def loc_rand_batch(params, n_realizations):
+    return sample_local(params['L'], n_realizations, disorder_rng(params, LOCAL_STREAM))
+
+# two-body disorder sampler, a batch of n_realizations couplings on the pairs;
+# its first realization is the one of twobody_rand with the same params
+def twobody_rand_batch(params, n_realizations):
+    return sample_twobody(params['L'], n_realizations, disorder_rng(params, TWOBODY_STREAM))
+
+# local disorder sampler
+def loc_rand(params):
     # get normal disorder
-    vec = qtrand.normal(0,1,params['L'])
+    vec = loc_rand_batch(params, 1)[0]
     return vec
 
 # two-body disorder sampler
 def twobody_rand(params):
-    # seeding
-    qtrand = np.random.RandomState()
-    if "seed" not in params:
-        print("Attention: Running with default seed")
-    # seed the random numbers
-    qtrand.seed(params.get("seed", [11, 13, 17, 19]))
-    # skip 1000+L numbers 
     L = params['L']
-    _ = qtrand.random(1000+L)
-    # initialise disorder matrix
+    # get random couplings of the pairs
+    rows, cols, couplings = twobody_rand_batch(params, 1)
+    # qtealeaves expects a dense disorder matrix, filled at once
     coupling_matrix = np.zeros((L,L))
-    # coupling pairs (with periodic boundaries)
-    pairs = [(np.mod(i,L),np.mod(i+1,L)) for i in range(L)]
-    # get ranomd numbers
-    for (i,j) in pairs:
-        coupling = np.random.normal(0,1)
-        coupling_matrix[i,j] = coupling
-        coupling_matrix[j,i] = coupling
+    coupling_matrix[rows, cols] = couplings[0]
+    coupling_matrix[cols, rows] = couplings[0]
     return coupling_matrix
 
 # add disorder to model
@@ -61,4 +92,4 @@ def get_model(has_obc=False):
                                    strength="disJt", 
                                    prefactor=+1)
     
-    return model
\ No newline at end of file
+    return model
@@ -0,0 +1,274 @@
+"""
+Disorder-ensemble runner for the models of disorder.py.
+
+Every realization of the disorder is one call simulate(params) with its
+own params['seed'], spawned from a single base seed with numpy's
+SeedSequence, so realization k is the same whatever the number of
+processes and the order in which the realizations complete.
+The realizations run on a process pool (or on MPI ranks), and their
+observables, a dictionary of arrays, are streamed into running mean and
+variance accumulators (Welford), never held all in memory. The
+accumulators and the list of finished realizations are checkpointed to
+disk, and a restarted run only computes the missing realizations; a
+checkpoint is only resumed by the same simulate function with the same params.
+
+Usage:
+    python3 disorder_ensemble.py --L 6 --n-realizations 1000 --workers 4
+    mpirun -n 4 python3 disorder_ensemble.py --L 6 --n-realizations 1000 --mpi
+"""
+
+import os
+import hashlib
+import argparse
+import importlib
+from time import perf_counter
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import numpy as np
+from scipy.linalg import eigh
+
+from disorder import loc_rand, twobody_rand
+
+
+# seeds of the realizations, independent streams of the same base seed
+def realization_seeds(seed, n_realizations):
+    children = np.random.SeedSequence(seed).spawn(n_realizations)
+    return [[int(word) for word in child.generate_state(4)] for child in children]
+
+
+# running mean and variance of a dictionary of observables (Welford)
+class RunningStats:
+
+    def __init__(self):
+        self.count = 0
+        self.mean = {}
+        self.m2 = {}
+
+    # add the observables of one realization
+    def update(self, observables):
+        self.count += 1
+        for key, value in observables.items():
+            value = np.asarray(value, dtype=float)
+            if key not in self.mean:
+                self.mean[key] = np.zeros_like(value)
+                self.m2[key] = np.zeros_like(value)
+            delta = value - self.mean[key]
+            self.mean[key] += delta / self.count
+            self.m2[key] += delta * (value - self.mean[key])
+
+    # combine with the accumulators of other realizations (Chan et al.)
+    def merge(self, other):
+        if other.count == 0:
+            return
+        if self.count == 0:
+            self.count = other.count
+            self.mean = {key: value.copy() for key, value in other.mean.items()}
+            self.m2 = {key: value.copy() for key, value in other.m2.items()}
+            return
+        count = self.count + other.count
+        for key in self.mean:
+            delta = other.mean[key] - self.mean[key]
+            self.mean[key] += delta * other.count / count
+            self.m2[key] += other.m2[key] + delta**2 * self.count * other.count / count
+        self.count = count
+
+    # sample variance of each observable
+    def variance(self):
+        return {key: value / max(self.count - 1, 1) for key, value in self.m2.items()}
+
+    # standard error of each mean
+    def standard_error(self):
+        return {key: np.sqrt(value / max(self.count, 1)) for key, value in self.variance().items()}
+
+    def state(self):
+        state = {"count": np.array(self.count)}
+        state.update({"mean/" + key: value for key, value in self.mean.items()})
+        state.update({"m2/" + key: value for key, value in self.m2.items()})
+        return state
+
+    @classmethod
+    def from_state(cls, state):
+        stats = cls()
+        stats.count = int(state["count"])
+        for key in state:
+            if key.startswith("mean/"):
+                stats.mean[key[5:]] = np.array(state[key], dtype=float)
+                stats.m2[key[5:]] = np.array(state["m2/" + key[5:]], dtype=float)
+        return stats
+
+
+# hash of the simulate function and of the params, identifying the ensemble of a checkpoint
+def ensemble_fingerprint(simulate, params):
+    digest = hashlib.sha256(f"{simulate.__module__}:{simulate.__qualname__}".encode())
+    for key, value in sorted(params.items()):
+        value = np.asarray(value)
+        digest.update(f"|{key}|{value.dtype.str}|{value.shape}|".encode())
+        digest.update(value.tobytes() if value.dtype != object else repr(value.tolist()).encode())
+    return digest.hexdigest()
+
+
+# write the accumulators and the finished realizations, atomically
+def save_checkpoint(filename, stats, done, seed, fingerprint):
+    temporary = filename + f".{os.getpid()}.npz"
+    np.savez(temporary, done=done, seed=np.asarray(seed), fingerprint=np.array(fingerprint),
+             **stats.state())
+    os.replace(temporary, filename)
+
+
+# read a checkpoint, or start from scratch if there is none (or it is of another ensemble)
+def load_checkpoint(filename, n_realizations, seed, fingerprint):
+    if filename is not None and os.path.exists(filename):
+        with np.load(filename) as state:
+            state = dict(state)
+        if (len(state["done"]) == n_realizations and np.array_equal(state["seed"], np.asarray(seed))
+                and str(state.get("fingerprint", "")) == fingerprint):
+            return RunningStats.from_state(state), state["done"]
+        print(f"Attention: ignoring checkpoint {filename} of a different ensemble")
+    return RunningStats(), np.zeros(n_realizations, dtype=bool)
+
+
+def _run_realization(simulate, params, index, seed):
+    return index, simulate({**params, "seed": seed})
+
+
+def run_ensemble(simulate, params, n_realizations, seed=None, n_workers=None,
+                 checkpoint="disorder_ensemble.npz", checkpoint_every=50, indices=None):
+    """
+    Arguments:
+    simulate top-level (picklable) function of the params returning a dict of observables,
+    params parameters shared by all the realizations, n_realizations size of the ensemble,
+    seed base seed (default params['seed']), n_workers processes (1 runs in this process),
+    checkpoint file (None for no checkpoints), checkpoint_every realizations between two
+    checkpoints, indices realizations to run, default all of them
+    Returns:
+    RunningStats of the observables over the finished realizations
+    """
+
+    seed = params.get("seed", [11, 13, 17, 19]) if seed is None else seed
+    seeds = realization_seeds(seed, n_realizations)
+    fingerprint = ensemble_fingerprint(simulate, params)
+    stats, done = load_checkpoint(checkpoint, n_realizations, seed, fingerprint)
+    indices = range(n_realizations) if indices is None else indices
+    pending = [index for index in indices if not done[index]]
+
+    def collect(index, observables):
+        stats.update(observables)
+        done[index] = True
+        if checkpoint is not None and stats.count % checkpoint_every == 0:
+            save_checkpoint(checkpoint, stats, done, seed, fingerprint)
+
+    if n_workers == 1:
+        for index in pending:
+            collect(*_run_realization(simulate, params, index, seeds[index]))
+    else:
+        n_workers = n_workers or os.cpu_count()
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            # keep a bounded number of realizations in flight
+            pending = iter(pending)
+            running = set()
+            while True:
+                for index in pending:
+                    running.add(executor.submit(_run_realization, simulate, params, index, seeds[index]))
+                    if len(running) >= 2*n_workers:
+                        break
+                if not running:
+                    break
+                finished, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    collect(*future.result())
+
+    if checkpoint is not None:
+        save_checkpoint(checkpoint, stats, done, seed, fingerprint)
+    return stats
+
+
+def run_ensemble_mpi(simulate, params, n_realizations, seed=None,
+                     checkpoint="disorder_ensemble.npz", checkpoint_every=50):
+    """
+    Arguments:
+    as run_ensemble, with one process per MPI rank
+    Returns:
+    RunningStats of all the ranks on rank 0, None on the other ranks
+
+    Rank r runs the realizations r, r+size, ..., with its own checkpoint file,
+    and only the accumulators are sent to rank 0 at the end.
+    """
+
+    from mpi4py import MPI
+    comm = MPI.COMM_WORLD
+    rank, size = comm.Get_rank(), comm.Get_size()
+    if checkpoint is not None:
+        checkpoint = f"{checkpoint[:-4]}_rank{rank}_of_{size}.npz"
+    stats = run_ensemble(simulate, params, n_realizations, seed=seed, n_workers=1,
+                         checkpoint=checkpoint, checkpoint_every=checkpoint_every,
+                         indices=range(rank, n_realizations, size))
+    states = comm.gather(stats.state(), root=0)
+    if rank != 0:
+        return None
+    total = RunningStats()
+    for state in states:
+        total.merge(RunningStats.from_state(state))
+    return total
+
+
+# example observable: dynamics of one singlet exciton on the disordered ring
+def single_exciton_dynamics(params):
+    """
+    Arguments:
+    params with 'L', 'seed', singlet energy 'Es', disorder strengths 'disEs' and 'disJt',
+    'times' of the dynamics
+    Returns:
+    Populations of the sites, shape (n_times, L), of one singlet exciton starting on
+    site 0, and its participation ratio, in the one-exciton sector of the
+    disorder model of get_model (exact diagonalization of the L x L Hamiltonian)
+    """
+
+    H = np.diag(params.get("Es", 1) + params["disEs"]*loc_rand(params)) + params["disJt"]*twobody_rand(params)
+    energies, vectors = eigh(H)
+    amplitudes = vectors @ (np.exp(-1j*np.outer(energies, params["times"])) * vectors[0][:, None])
+    populations = np.abs(amplitudes.T)**2
+    return {"populations": populations,
+            "participation_ratio": 1/np.sum(populations**2, axis=1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Disorder averages over independent realizations.")
+    parser.add_argument("--simulate", default="disorder_ensemble:single_exciton_dynamics",
+                        help="module:function of the realization, returning a dict of observables")
+    parser.add_argument("--L", type=int, default=6)
+    parser.add_argument("--disEs", type=float, default=0.1)
+    parser.add_argument("--disJt", type=float, default=0.1)
+    parser.add_argument("--t-max", type=float, default=10)
+    parser.add_argument("--n-times", type=int, default=101)
+    parser.add_argument("--n-realizations", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=11)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--mpi", action="store_true")
+    parser.add_argument("--checkpoint", default="disorder_ensemble.npz")
+    parser.add_argument("--checkpoint-every", type=int, default=50)
+    args = parser.parse_args()
+
+    module, function = args.simulate.split(":")
+    simulate = getattr(importlib.import_module(module), function)
+    params = {"L": args.L, "disEs": args.disEs, "disJt": args.disJt,
+              "times": np.linspace(0, args.t_max, args.n_times)}
+
+    st_time = perf_counter()
+    if args.mpi:
+        stats = run_ensemble_mpi(simulate, params, args.n_realizations, args.seed,
+                                 args.checkpoint, args.checkpoint_every)
+    else:
+        stats = run_ensemble(simulate, params, args.n_realizations, args.seed, args.workers,
+                             args.checkpoint, args.checkpoint_every)
+    if stats is None:
+        return
+    runtime = perf_counter() - st_time
+
+    print(f"{stats.count} realizations in {runtime:.3f} s")
+    error = stats.standard_error()
+    for key, mean in stats.mean.items():
+        print(f"{key}: final mean {np.ravel(mean[-1])} +- {np.ravel(error[key][-1])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,424 @@
+r"""
+Tiled FFT image compression
+===========================
+
+Classical baseline of the QFT compression: a JPEG-like codec where the
+image is divided in tiles of 8x8 or 16x16 pixels, each tile is Fourier
+transformed, and only the low frequencies are kept.
+
+The images are streamed: an uncompressed BMP is memory-mapped and read
+one band of tiles at a time, so only `tile` rows of pixels are in memory
+at once, also for the reconstructed image, which is written band by band.
+All the tiles of a band, and all the color channels, are transformed
+together with a single batched `numpy.fft.fft2` call.
+
+For each image we report the PSNR of the reconstruction and the
+compression ratio, i.e. the number of pixels over the number of real
+coefficients kept. The images of a folder are processed on a pool of
+processes:
+
+.. codeblock::
+
+    python3 fft_compression.py --data data --tile 8 16 --cutoff 1 2 3 --workers 4
+
+With `--mode mps` the tiles are transformed with the QFT MPO of
+`mps_qft.py` instead of the FFT, optionally truncated with `--max-bond`.
+
+"""
+
+import os
+import glob
+import struct
+import argparse
+from time import perf_counter
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+
+def open_bmp(filename):
+    """
+    Memory-map the pixels of an uncompressed 8-bit (paletted) or 24-bit BMP.
+
+    Parameters
+    ----------
+    filename : str
+        Path to the BMP file
+
+    Returns
+    -------
+    np.memmap
+        Pixels, shape (height, width) for 8-bit and (height, width, 3) for
+        24-bit images, with the rows from top to bottom
+    np.ndarray | None
+        Palette of the 8-bit images, shape (256, 3) in RGB order, else None
+    """
+    with open(filename, "rb") as fh:
+        header = fh.read(54)
+    if header[:2] != b"BM":
+        raise IOError(f"File {filename} is not a BMP image.")
+    offset = struct.unpack("<I", header[10:14])[0]
+    header_size, width, height, _, bits, compression = struct.unpack("<IiiHHI", header[14:34])
+    if compression != 0 or bits not in (8, 24):
+        raise IOError(f"Only uncompressed 8-bit and 24-bit BMP are supported, not {filename}.")
+
+    channels = bits // 8
+    row_bytes = (width * channels + 3) // 4 * 4
+    rows = np.memmap(filename, dtype=np.uint8, mode="r", offset=offset, shape=(abs(height), row_bytes))
+    # Positive heights are stored from the bottom row up
+    if height > 0:
+        rows = rows[::-1]
+    pixels = rows[:, : width * channels]
+
+    palette = None
+    if channels == 1:
+        palette = np.fromfile(filename, dtype=np.uint8, count=1024, offset=14 + header_size)
+        palette = palette.reshape(256, 4)[:, 2::-1]
+    else:
+        # BGR to RGB
+        pixels = pixels.reshape(abs(height), width, 3)[:, :, ::-1]
+    return pixels, palette
+
+
+def create_bmp(filename, width, height, channels):
+    """
+    Create an uncompressed BMP file, 8-bit grayscale or 24-bit color, and
+    memory-map its pixels for writing.
+
+    Parameters
+    ----------
+    filename : str
+        Path to the BMP file
+    width, height : int
+        Size of the image
+    channels : int
+        1 for grayscale, 3 for RGB
+
+    Returns
+    -------
+    np.memmap
+        Pixels as in `open_bmp`, writable
+    """
+    row_bytes = (width * channels + 3) // 4 * 4
+    palette = b""
+    if channels == 1:
+        gray = np.arange(256, dtype=np.uint8)
+        palette = np.column_stack([gray, gray, gray, np.zeros_like(gray)]).tobytes()
+    offset = 54 + len(palette)
+    size = offset + row_bytes * height
+    with open(filename, "wb") as fh:
+        fh.write(b"BM" + struct.pack("<IHHI", size, 0, 0, offset))
+        fh.write(struct.pack("<IiiHHIIiiII", 40, width, -height, 1, 8 * channels, 0,
+                             row_bytes * height, 2835, 2835, 0, 0))
+        fh.write(palette)
+        fh.truncate(size)
+    rows = np.memmap(filename, dtype=np.uint8, mode="r+", offset=offset, shape=(height, row_bytes))
+    pixels = rows[:, : width * channels]
+    if channels == 3:
+        pixels = pixels.reshape(height, width, 3)[:, :, ::-1]
+    return pixels
+
+
+def read_image(filename):
+    """
+    Open an image as an array of pixels of shape (height, width, channels).
+    BMP images are memory-mapped, the other formats are loaded with PIL.
+
+    Parameters
+    ----------
+    filename : str
+        Path to the image
+
+    Returns
+    -------
+    np.ndarray
+        Pixels, with one channel for the grayscale images
+    """
+    if filename.lower().endswith(".bmp"):
+        pixels, palette = open_bmp(filename)
+        if palette is None:
+            return pixels
+        if np.array_equal(palette, np.repeat(np.arange(256, dtype=np.uint8)[:, None], 3, axis=1)):
+            return pixels[:, :, None]
+        # Generic palettes: the lookup is applied band by band in `bands`
+        return _Paletted(pixels, palette)
+
+    if Image is None:
+        raise ImportError("PIL is required to read images that are not BMP.")
+    pixels = np.array(Image.open(filename))
+    return pixels[:, :, None] if pixels.ndim == 2 else pixels[:, :, :3]
+
+
+class _Paletted:
+    """Paletted pixels, converted to RGB (or gray) when sliced by rows"""
+
+    def __init__(self, pixels, palette):
+        self.pixels = pixels
+        self.palette = palette[:, :1] if np.all(palette == palette[:, :1]) else palette
+        self.shape = pixels.shape + (self.palette.shape[1],)
+
+    def __getitem__(self, rows):
+        return self.palette[self.pixels[rows]]
+
+
+def bands(pixels, tile):
+    """
+    Iterate over the bands of `tile` rows of the image, padded to a multiple
+    of the tile size by repeating the last row and column.
+
+    Parameters
+    ----------
+    pixels : np.ndarray
+        Pixels of shape (height, width, channels)
+    tile : int
+        Size of the tiles
+
+    Yields
+    ------
+    int
+        First row of the band
+    np.ndarray
+        Band of shape (tile, padded width, channels), float
+    """
+    height, width = pixels.shape[:2]
+    pad_width = -width % tile
+    for start in range(0, height, tile):
+        band = np.asarray(pixels[start : start + tile], dtype=float)
+        band = np.pad(band, ((0, tile - band.shape[0]), (0, pad_width), (0, 0)), mode="edge")
+        yield start, band
+
+
+def to_tiles(band, tile):
+    """Band (tile, width, channels) to tiles (width/tile, channels, tile, tile)"""
+    return band.reshape(tile, -1, tile, band.shape[2]).transpose(1, 3, 0, 2)
+
+
+def from_tiles(tiles):
+    """Inverse of `to_tiles`"""
+    num_tiles, channels, tile, _ = tiles.shape
+    return tiles.transpose(2, 0, 3, 1).reshape(tile, num_tiles * tile, channels)
+
+
+def frequency_mask(tile, cutoff):
+    """
+    Low-pass mask of the 2D FFT of a tile, keeping the frequencies with
+    |k_x|, |k_y| <= cutoff. The mask is symmetric under k -> -k, so for
+    real tiles the kept coefficients are as many as the real numbers stored.
+
+    Parameters
+    ----------
+    tile : int
+        Size of the tiles
+    cutoff : int
+        Largest frequency kept, smaller than tile/2
+
+    Returns
+    -------
+    np.ndarray
+        Boolean mask of shape (tile, tile)
+    """
+    if not 0 <= cutoff < tile // 2:
+        raise ValueError(f"The cutoff must be in [0, {tile // 2 - 1}] for tiles of size {tile}.")
+    low = np.abs(np.fft.fftfreq(tile) * tile) <= cutoff
+    return np.outer(low, low)
+
+
+def compress_tiles(tiles, mask):
+    """
+    Compress a batch of tiles, with a single FFT over all of them.
+
+    Parameters
+    ----------
+    tiles : np.ndarray
+        Tiles of shape (..., tile, tile)
+    mask : np.ndarray
+        Frequencies kept, see `frequency_mask`
+
+    Returns
+    -------
+    np.ndarray
+        Kept Fourier coefficients, shape (..., number of kept frequencies)
+    """
+    return np.fft.fft2(tiles)[..., mask]
+
+
+def decompress_tiles(coefficients, mask):
+    """
+    Reconstruct the tiles from the kept Fourier coefficients.
+
+    Parameters
+    ----------
+    coefficients : np.ndarray
+        Output of `compress_tiles`
+    mask : np.ndarray
+        Frequencies kept, see `frequency_mask`
+
+    Returns
+    -------
+    np.ndarray
+        Tiles of shape (..., tile, tile)
+    """
+    spectrum = np.zeros(coefficients.shape[:-1] + mask.shape, dtype=complex)
+    spectrum[..., mask] = coefficients
+    return np.fft.ifft2(spectrum).real
+
+
+def _codec(mode, max_bond):
+    """Functions (compress, decompress) of the tiles for the given mode"""
+    if mode == "fft":
+        return compress_tiles, decompress_tiles
+    if mode == "mps":
+        from mps_qft import compress_tiles as mps_compress, decompress_tiles as mps_decompress
+
+        return (
+            lambda tiles, mask: mps_compress(tiles, mask, max_bond),
+            lambda coefficients, mask: mps_decompress(coefficients, mask, max_bond),
+        )
+    raise ValueError(f"Mode must be 'fft' or 'mps', not {mode}.")
+
+
+def compress_image(filename, tile=8, cutoff=2, output=None, mode="fft", max_bond=None):
+    """
+    Compress and reconstruct an image band by band, measuring the quality.
+
+    Parameters
+    ----------
+    filename : str
+        Path to the image
+    tile : int, optional
+        Size of the tiles. Default to 8.
+    cutoff : int, optional
+        Largest frequency kept, see `frequency_mask`. Default to 2.
+    output : str | None, optional
+        If given, path of the reconstructed BMP image. Default to None.
+    mode : str, optional
+        "fft" for the batched FFT, "mps" for the QFT MPO of `mps_qft.py`,
+        which needs tile sizes that are powers of 2. Default to "fft".
+    max_bond : int | None, optional
+        Maximum bond dimension of the "mps" mode. Default to None, i.e. exact.
+
+    Returns
+    -------
+    dict
+        Image, size, tile, cutoff, mode, `psnr` in dB, `compression_ratio` and `time` in seconds
+    """
+    start_time = perf_counter()
+    pixels = read_image(filename)
+    height, width, channels = pixels.shape
+    mask = frequency_mask(tile, cutoff)
+    compress, decompress = _codec(mode, max_bond)
+    reconstructed = None if output is None else create_bmp(output, width, height, channels)
+
+    squared_error = 0.0
+    for start, band in bands(pixels, tile):
+        coefficients = compress(to_tiles(band, tile), mask)
+        approx = np.clip(np.rint(from_tiles(decompress(coefficients, mask))), 0, 255)
+
+        rows = min(tile, height - start)
+        squared_error += np.sum((approx[:rows, :width] - band[:rows, :width]) ** 2)
+        if reconstructed is not None:
+            reconstructed[start : start + rows] = approx[:rows, :width].reshape(
+                reconstructed[start : start + rows].shape
+            )
+    if reconstructed is not None:
+        reconstructed.flush()
+
+    mse = squared_error / (height * width * channels)
+    return {
+        "image": os.path.basename(filename),
+        "height": height,
+        "width": width,
+        "channels": channels,
+        "tile": tile,
+        "cutoff": cutoff,
+        "mode": mode,
+        "psnr": 10 * np.log10(255**2 / mse) if mse > 0 else np.inf,
+        "compression_ratio": tile**2 / np.sum(mask),
+        "time": perf_counter() - start_time,
+    }
+
+
+def _compress_task(task):
+    return compress_image(*task)
+
+
+def compress_directory(
+    folder, tiles=(8,), cutoffs=(2,), output_folder=None, n_workers=None, pattern="*.bmp", mode="fft", max_bond=None
+):
+    """
+    Compress all the images of a folder, for all the tile sizes and cutoffs,
+    on a pool of processes.
+
+    Parameters
+    ----------
+    folder : str
+        Folder of the images
+    tiles : Sequence[int], optional
+        Sizes of the tiles. Default to (8,).
+    cutoffs : Sequence[int], optional
+        Cutoffs of the frequencies. Default to (2,).
+    output_folder : str | None, optional
+        If given, folder of the reconstructed images. Default to None.
+    n_workers : int | None, optional
+        Number of processes. Default to None, i.e. the number of CPUs.
+    pattern : str, optional
+        Pattern of the image files. Default to "*.bmp".
+    mode : str, optional
+        Transform of the tiles, see `compress_image`. Default to "fft".
+    max_bond : int | None, optional
+        Maximum bond dimension of the "mps" mode. Default to None.
+
+    Returns
+    -------
+    List[dict]
+        Results of `compress_image`
+    """
+    tasks = []
+    for filename in sorted(glob.glob(os.path.join(folder, pattern))):
+        for tile in tiles:
+            for cutoff in cutoffs:
+                if cutoff >= tile // 2:
+                    continue
+                output = None
+                if output_folder is not None:
+                    os.makedirs(output_folder, exist_ok=True)
+                    name = os.path.splitext(os.path.basename(filename))[0]
+                    output = os.path.join(output_folder, f"{name}_{mode}_tile{tile}_cut{cutoff}.bmp")
+                tasks.append((filename, tile, cutoff, output, mode, max_bond))
+
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        return list(executor.map(_compress_task, tasks))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tiled FFT compression of a folder of images.")
+    parser.add_argument("--data", default="data")
+    parser.add_argument("--tile", type=int, nargs="+", default=[8, 16])
+    parser.add_argument("--cutoff", type=int, nargs="+", default=[1, 2, 3])
+    parser.add_argument("--output", default=None, help="Folder of the reconstructed images.")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--mode", choices=["fft", "mps"], default="fft")
+    parser.add_argument("--max-bond", type=int, default=None, help="Maximum bond dimension of the mps mode.")
+    args = parser.parse_args()
+
+    start_time = perf_counter()
+    results = compress_directory(
+        args.data, args.tile, args.cutoff, args.output, args.workers, mode=args.mode, max_bond=args.max_bond
+    )
+    total_time = perf_counter() - start_time
+
+    print(f"{'image':>14} {'size':>10} {'tile':>5} {'cutoff':>6} {'ratio':>7} {'PSNR [dB]':>10} {'time [s]':>9}")
+    for res in results:
+        size = f"{res['width']}x{res['height']}"
+        print(f"{res['image']:>14} {size:>10} {res['tile']:>5} {res['cutoff']:>6} "
+              f"{res['compression_ratio']:>7.2f} {res['psnr']:>10.3f} {res['time']:>9.3f}")
+    print(f"Total time: {total_time:.3f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+r"""
+Batched MPS compression with the quantum Fourier transform
+==========================================================
+
+MPS version of the tiled compression of `fft_compression.py`, where the
+Fourier transform of each tile is the QFT applied as a matrix product
+operator (MPO) to the amplitude-encoded tile, without any circuit.
+
+- The QFT MPO is built once for each number of qubits and cached. Without
+  the final swaps, i.e. with the output qubits in reversed order, the QFT
+  has a small bond dimension, and it is obtained with a sequence of
+  truncated SVDs of its matrix. The 2D transform of a tile with 2^m x 2^m
+  pixels is the 1D QFT MPO on the m row qubits followed by the one on the
+  m column qubits.
+- Each tile of 2^(2m) pixels is normalized and encoded directly as an MPS
+  by sequential SVD of the pixel vector.
+- The cached MPO is applied to a whole batch of tiles at once: the MPS of
+  the batch are stored as arrays with a leading batch index, and every
+  contraction and SVD is a stacked numpy operation.
+
+Everything stays in memory, no state goes through `TNState2File`. The sign
+convention is the one of `numpy.fft.fft`, so the coefficients are the same
+as the ones of the FFT baseline, up to the truncation of the bond dimension.
+"""
+
+from functools import lru_cache
+
+import numpy as np
+
+__all__ = [
+    "qft_mpo",
+    "tile_mpo",
+    "mps_from_vectors",
+    "mps_to_vectors",
+    "apply_mpo",
+    "compress_mps",
+    "compress_tiles",
+    "decompress_tiles",
+]
+
+
+def bit_reversal(num_qubits):
+    """
+    Permutation reversing the order of the bits of the integers below 2^num_qubits.
+
+    Parameters
+    ----------
+    num_qubits : int
+        Number of bits
+
+    Returns
+    -------
+    np.ndarray
+        Reversed integers
+    """
+    states = np.arange(2**num_qubits)
+    reversed_states = np.zeros_like(states)
+    for bit in range(num_qubits):
+        reversed_states |= ((states >> bit) & 1) << (num_qubits - 1 - bit)
+    return reversed_states
+
+
+@lru_cache(maxsize=None)
+def qft_mpo(num_qubits, tol=1e-12):
+    """
+    MPO of the unitary QFT, with the sign of `numpy.fft.fft` and the output
+    qubits in reversed order, as the QFT circuit without the final swaps.
+
+    Parameters
+    ----------
+    num_qubits : int
+        Number of qubits, first qubit is the most significant bit
+    tol : float, optional
+        Singular values below tol times the largest one are cut. Default to 1e-12.
+
+    Returns
+    -------
+    Tuple[np.ndarray]
+        Read-only tensors of shape (left bond, output, input, right bond)
+    """
+    dim = 2**num_qubits
+    states = np.arange(dim)
+    matrix = np.exp(-2j * np.pi * np.outer(bit_reversal(num_qubits), states) / dim) / np.sqrt(dim)
+
+    # Interleave output and input bits, (o1, i1, o2, i2, ...)
+    tensor = matrix.reshape([2] * (2 * num_qubits))
+    order = [ax for site in range(num_qubits) for ax in (site, num_qubits + site)]
+    rest = tensor.transpose(order).reshape(1, -1)
+
+    tensors = []
+    for _ in range(num_qubits - 1):
+        left = rest.shape[0]
+        U, S, Vh = np.linalg.svd(rest.reshape(left * 4, -1), full_matrices=False)
+        keep = max(1, int(np.sum(S > tol * S[0])))
+        tensors.append(U[:, :keep].reshape(left, 2, 2, keep))
+        rest = S[:keep, None] * Vh[:keep]
+    tensors.append(rest.reshape(-1, 2, 2, 1))
+
+    for tens in tensors:
+        tens.flags.writeable = False
+    return tuple(tensors)
+
+
+@lru_cache(maxsize=None)
+def tile_mpo(tile, tol=1e-12):
+    """
+    MPO of the 2D QFT of a tile of size tile x tile, with tile a power of 2,
+    acting on the row qubits and then on the column qubits of the row-major
+    pixel vector. The bits of the output row and column are reversed.
+
+    Parameters
+    ----------
+    tile : int
+        Size of the tile
+    tol : float, optional
+        Tolerance of `qft_mpo`. Default to 1e-12.
+
+    Returns
+    -------
+    Tuple[np.ndarray]
+        Tensors of the MPO on 2 log2(tile) qubits
+    """
+    num_qubits = int(np.log2(tile))
+    if 2**num_qubits != tile:
+        raise ValueError(f"The tile size must be a power of 2, not {tile}.")
+    return qft_mpo(num_qubits, tol) * 2
+
+
+def mps_from_vectors(vectors, max_bond=None):
+    """
+    Encode a batch of vectors of length 2^n as MPS by sequential SVD.
+
+    Parameters
+    ----------
+    vectors : np.ndarray
+        Vectors of shape (batch, 2^n)
+    max_bond : int | None, optional
+        Maximum bond dimension. Default to None, i.e. exact.
+
+    Returns
+    -------
+    List[np.ndarray]
+        Tensors of shape (batch, left bond, 2, right bond)
+    """
+    batch = vectors.shape[0]
+    num_qubits = int(np.log2(vectors.shape[1]))
+    rest = vectors.reshape(batch, 1, -1)
+    tensors = []
+    for _ in range(num_qubits - 1):
+        left = rest.shape[1]
+        U, S, Vh = np.linalg.svd(rest.reshape(batch, left * 2, -1), full_matrices=False)
+        keep = S.shape[-1] if max_bond is None else min(max_bond, S.shape[-1])
+        tensors.append(U[..., :keep].reshape(batch, left, 2, keep))
+        rest = S[..., :keep, None] * Vh[:, :keep]
+    tensors.append(rest.reshape(batch, -1, 2, 1))
+    return tensors
+
+
+def mps_to_vectors(mps):
+    """
+    Contract a batch of MPS into vectors of shape (batch, 2^n).
+
+    Parameters
+    ----------
+    mps : List[np.ndarray]
+        Tensors of shape (batch, left bond, 2, right bond)
+
+    Returns
+    -------
+    np.ndarray
+        The vectors
+    """
+    vectors = mps[0][:, 0]
+    for tens in mps[1:]:
+        vectors = np.einsum("bvl,blir->bvir", vectors, tens).reshape(tens.shape[0], -1, tens.shape[3])
+    return vectors[..., 0]
+
+
+def apply_mpo(mpo, mps, dagger=False):
+    """
+    Apply the same MPO to a batch of MPS.
+
+    Parameters
+    ----------
+    mpo : Sequence[np.ndarray]
+        Tensors of shape (left bond, output, input, right bond)
+    mps : List[np.ndarray]
+        Tensors of shape (batch, left bond, 2, right bond)
+    dagger : bool, optional
+        If True, apply the hermitian conjugate of the MPO. Default to False.
+
+    Returns
+    -------
+    List[np.ndarray]
+        The resulting MPS, with bond dimensions multiplied by the MPO ones
+    """
+    result = []
+    for op, tens in zip(mpo, mps):
+        if dagger:
+            op = np.conj(op.transpose(0, 2, 1, 3))
+        new = np.einsum("poiq,blir->bploqr", op, tens)
+        batch, p, l, o, q, r = new.shape
+        result.append(new.reshape(batch, p * l, o, q * r))
+    return result
+
+
+def compress_mps(mps, max_bond):
+    """
+    Truncate the bond dimension of a batch of MPS, with a QR sweep to the
+    right followed by a truncated SVD sweep to the left.
+
+    Parameters
+    ----------
+    mps : List[np.ndarray]
+        Tensors of shape (batch, left bond, 2, right bond)
+    max_bond : int
+        Maximum bond dimension
+
+    Returns
+    -------
+    List[np.ndarray]
+        The compressed MPS
+    """
+    mps = list(mps)
+    batch = mps[0].shape[0]
+    for site in range(len(mps) - 1):
+        _, left, dim, right = mps[site].shape
+        Q, R = np.linalg.qr(mps[site].reshape(batch, left * dim, right))
+        mps[site] = Q.reshape(batch, left, dim, -1)
+        mps[site + 1] = np.einsum("bxr,brjs->bxjs", R, mps[site + 1])
+    for site in range(len(mps) - 1, 0, -1):
+        _, left, dim, right = mps[site].shape
+        U, S, Vh = np.linalg.svd(mps[site].reshape(batch, left, dim * right), full_matrices=False)
+        keep = min(max_bond, S.shape[-1])
+        mps[site] = Vh[:, :keep].reshape(batch, keep, dim, right)
+        mps[site - 1] = np.einsum("bxil,blk->bxik", mps[site - 1], U[..., :keep] * S[:, None, :keep])
+    return mps
+
+
+def _transform(vectors, mpo, max_bond, dagger):
+    """Normalize the vectors, apply the MPO to their MPS, and restore the norms"""
+    norms = np.linalg.norm(vectors, axis=1)
+    safe = np.where(norms > 0, norms, 1)
+    mps = apply_mpo(mpo, mps_from_vectors(vectors / safe[:, None]), dagger)
+    if max_bond is not None:
+        mps = compress_mps(mps, max_bond)
+    return mps_to_vectors(mps) * norms[:, None]
+
+
+def compress_tiles(tiles, mask, max_bond=None):
+    """
+    Compress a batch of tiles with the QFT MPO, as `fft_compression.compress_tiles`.
+
+    Parameters
+    ----------
+    tiles : np.ndarray
+        Tiles of shape (..., tile, tile)
+    mask : np.ndarray
+        Frequencies kept, see `fft_compression.frequency_mask`
+    max_bond : int | None, optional
+        Maximum bond dimension of the transformed MPS. Default to None, i.e. exact.
+
+    Returns
+    -------
+    np.ndarray
+        Kept Fourier coefficients, shape (..., number of kept frequencies),
+        normalized as the ones of `numpy.fft.fft2`
+    """
+    tile = tiles.shape[-1]
+    batch_shape = tiles.shape[:-2]
+    vectors = tiles.reshape(-1, tile * tile).astype(complex)
+    reversal = bit_reversal(int(np.log2(tile)))
+
+    spectrum = _transform(vectors, tile_mpo(tile), max_bond, dagger=False).reshape(-1, tile, tile)
+    # Undo the reversal of the output qubits, and the unitary normalization
+    spectrum = tile * spectrum[:, reversal][:, :, reversal]
+    return spectrum[:, mask].reshape(batch_shape + (-1,))
+
+
+def decompress_tiles(coefficients, mask, max_bond=None):
+    """
+    Reconstruct the tiles from the kept Fourier coefficients with the inverse
+    QFT MPO, i.e. the hermitian conjugate of the cached one.
+
+    Parameters
+    ----------
+    coefficients : np.ndarray
+        Output of `compress_tiles`
+    mask : np.ndarray
+        Frequencies kept
+    max_bond : int | None, optional
+        Maximum bond dimension of the transformed MPS. Default to None, i.e. exact.
+
+    Returns
+    -------
+    np.ndarray
+        Tiles of shape (..., tile, tile)
+    """
+    tile = mask.shape[0]
+    batch_shape = coefficients.shape[:-1]
+    reversal = bit_reversal(int(np.log2(tile)))
+
+    spectrum = np.zeros((int(np.prod(batch_shape)), tile, tile), dtype=complex)
+    spectrum[:, mask] = coefficients.reshape(-1, coefficients.shape[-1])
+    # The hermitian conjugate of the MPO takes the qubits in reversed order
+    vectors = spectrum[:, reversal][:, :, reversal].reshape(-1, tile * tile) / tile
+    tiles = _transform(vectors, tile_mpo(tile), max_bond, dagger=True)
+    return tiles.real.reshape(batch_shape + (tile, tile))
@@ -0,0 +1,101 @@
+##############################################################################
+#                              COPYRIGHT NOTICE                              #
+##############################################################################
+#
+# This code is part of the Tensor Network Hackathon
+# project of the Quantum Padova group.
+# (https://baltig.infn.it/qpd/tensor-network-hackathon)
+#
+# This code is licensed under the Apache License, Version 2.0.
+# You may obtain a copy of this license at
+# http://www.apache.org/licenses/LICENSE-2.0.
+#
+# Any modifications or derivative works of this code must retain this
+# copyright notice, and modified files need to carry a notice indicating
+# that they have been altered from the originals.
+#
+##############################################################################
+##############################################################################
+
+"""
+Benchmark of the KP QUBO builders
+=================================
+
+Compares the loop-based `kp_qubo` with the array-based
+`kp_qubo_vectorized` on random KP instances of growing size,
+checking that both return the same matrix. Run it as
+
+.. codeblock::
+
+    python3 benchmark_kp_qubo.py --sizes 10 100 1000 5000
+"""
+
+
+## Modules
+from time import perf_counter
+from argparse import ArgumentParser
+from numpy import array_equal
+from numpy.random import default_rng
+
+from knapsack import kp_qubo, kp_qubo_vectorized
+
+
+## Timing helper
+def best_time(function, repetitions, *args):
+
+    """
+    Best wall time over the repetitions, together with the last output.
+    """
+
+    timings = []
+    for _ in range(repetitions):
+        st_time = perf_counter()
+        output = function(*args)
+        timings.append(perf_counter() - st_time)
+    return min(timings), output
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[10, 50, 100, 500, 1000, 2000, 5000],
+                        help="Numbers of items of the benchmarked instances.")
+    parser.add_argument("--repetitions", type=int, default=3,
+                        help="Repetitions per size, the best time is kept.")
+    parser.add_argument("--stack", type=int, default=1,
+                        help="Number of instances built at once by the"
+                             " vectorized builder.")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = default_rng(args.seed)
+    print(f"{'n_items':>8} {'loops [s]':>12} {'vectorized [s]':>15}"
+          f" {'speed-up':>10} {'identical':>10}")
+    for n_items in args.sizes:
+        ### Random instances sharing the capacity bit-length
+        max_capacity = 10 * n_items
+        profits = rng.integers(1, max_capacity, size=(args.stack, n_items))
+        weights = rng.integers(1, max_capacity, size=(args.stack, n_items))
+        penalty_cte = 1.1 * profits.max(axis=1)
+
+        ### Timing the two builders
+        loop_time, loop_qubo = best_time(
+            lambda: [
+                kp_qubo(pp, ww, max_capacity, cc)
+                for pp, ww, cc in zip(profits, weights, penalty_cte)
+                ],
+            args.repetitions,
+            )
+        vec_time, vec_qubo = best_time(
+            kp_qubo_vectorized, args.repetitions,
+            profits, weights, max_capacity, penalty_cte,
+            )
+        identical = all(
+            array_equal(qq, vq) for qq, vq in zip(loop_qubo, vec_qubo)
+            )
+        print(f"{n_items:>8} {loop_time:>12.4f} {vec_time:>15.4f}"
+              f" {loop_time / vec_time:>10.1f} {str(identical):>10}")
+
+
+if __name__ == "__main__":
+    main()
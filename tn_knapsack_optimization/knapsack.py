@@ -24,6 +24,11 @@
 from random import seed, randint
 from math import pow, log2, floor
 from numpy import triu, zeros, diagonal, dot as npdot, sum as npsum
+from numpy import arange, asarray, atleast_2d, broadcast_to, multiply
+from numpy import concatenate, cumsum, float64, outer, sqrt, uint8, uint64, intp
+from numpy import int64, triu_indices, flatnonzero
+from scipy.sparse import coo_matrix, issparse, triu as sparse_triu
+from scipy.sparse.linalg import LinearOperator
 
 
 ## Knapsack Problem: instances generator
@@ -90,6 +95,76 @@ def kp_instance(n_items,
     return
 
 
+## Knapsack Problem: instances reader
+def read_kp_instance(filename):
+    
+    """
+    Reading a KP instance file
+    ===========================
+    
+    **Arguments**
+    
+        filename : str
+            Path to a file in the format of the
+            `kp_instances` folder: the number of
+            items, one line per item with its id,
+            profit and weight, and the capacity.
+    
+    **Outputs**
+    
+        item_profits : 1D Numpy array
+            The value of the profits
+            associated with each item.
+        item_weights : 1D Numpy array
+            The value of the weights
+            associated with each item.
+        max_capacity : int
+            The knapsack capacity.
+    """
+    
+    with open(filename, 'r') as in_file:
+        tokens = in_file.read().split()
+    n_items = int(tokens[0])
+    items = asarray(tokens[1:1 + 3 * n_items], dtype=int64).reshape(n_items, 3)
+    max_capacity = int(tokens[1 + 3 * n_items])
+    return items[:, 1].copy(), items[:, 2].copy(), max_capacity
+
+
+## Knapsack Problem: instances writer
+def write_kp_instance(filename, item_profits, item_weights, max_capacity):
+    
+    """
+    Writing a KP instance file
+    ===========================
+    
+    The file has the same format as the ones written
+    by `kp_instance` and read by `read_kp_instance`,
+    and it is written with a single call.
+    
+    **Arguments**
+    
+        filename : str
+            Path of the output file.
+        item_profits : 1D Numpy array
+            The value of the profits
+            associated with each item.
+        item_weights : 1D Numpy array
+            The value of the weights
+            associated with each item.
+        max_capacity : int
+            The knapsack capacity.
+    """
+    
+    lines = [str(len(item_profits))]
+    lines += [
+        f"{jj}   {pj}   {wj}"
+        for jj, (pj, wj) in enumerate(zip(item_profits, item_weights))
+        ]
+    lines.append(str(max_capacity))
+    with open(filename, 'w') as out_file:
+        out_file.write("\n".join(lines) + "\n")
+
+
 ## QUBO reformulation of the KP
 def kp_qubo(item_profits, item_weights, max_capacity, penalty_cte=1.0):
     
@@ -173,6 +248,341 @@ def kp_qubo(item_profits, item_weights, max_capacity, penalty_cte=1.0):
     return qubo_matrix
 
 
+## QUBO reformulation of the KP: vectorized builder
+def kp_qubo_vectorized(item_profits, item_weights, max_capacity, penalty_cte=1.0):
+    
+    """
+    Defining the QUBO formulation of one or more KP instances
+    ==========================================================
+    
+    Array-based counterpart of `kp_qubo`: every block of the
+    QUBO matrix is filled with outer products instead of
+    Python loops, and the output is bit-identical to the
+    one of `kp_qubo`.
+    
+    **Arguments**
+
+        item_profits : 1D or 2D Numpy array
+            The value of the profits
+            associated with each item
+            to be packed. A 2D array of
+            shape (n_instances, n_items)
+            builds a stack of instances.
+        item_weights : 1D or 2D Numpy array
+            The value of the weights
+            associated with each item
+            to be packed, with the same
+            shape as `item_profits`.
+        max_capacity : positive int or 1D Numpy array
+            The positive integer limiting
+            the capacity of the knapsack.
+            For a stack of instances, either
+            one value shared by all of them
+            or one value per instance.
+        penalty_cte : float or 1D Numpy array
+            The QUBO penalty constant, either
+            shared or one per instance.
+
+    **Outputs**
+    
+        qubo_matrix : 2D or 3D Numpy array
+            The QUBO matrix defining the
+            unconstrained KP objective function.
+            For a stack of instances, the array
+            has shape (n_instances, n_binaries, n_binaries).
+    
+    **Details**
+
+        The binaries are arranged as in `kp_qubo`.
+        All the instances of a stack must share the
+        number of items and the bit-length of the
+        maximum capacity, so that they share the
+        number of binaries.
+    """
+    
+    ### Reading input arguments
+    is_stack = asarray(item_weights).ndim == 2
+    item_profits = atleast_2d(item_profits)
+    item_weights = atleast_2d(item_weights)
+    if item_profits.shape != item_weights.shape:
+        raise ValueError("Profits and weights must have the same shape.")
+    n_instances, n_items = item_weights.shape
+    capacities = broadcast_to(max_capacity, (n_instances,))
+    c_bitlengths = {floor(log2(cc)) for cc in capacities}
+    if len(c_bitlengths) > 1:
+        raise ValueError("All the stacked instances must share"
+                         " the bit-length of the maximum capacity.")
+    c_bitlength = c_bitlengths.pop()
+    n_slack = c_bitlength + 1
+    n_binaries = n_items + n_slack
+    slack_prefactor = (capacities + 1 - 2**c_bitlength)[:, None]
+    penalty = broadcast_to(asarray(penalty_cte, dtype=float), (n_instances,))
+    penalty = penalty[:, None]
+    qubo_matrix = zeros(shape=(n_instances, n_binaries, n_binaries))
+    items = arange(n_items)
+    slacks = arange(n_slack - 1)
+    slack_powers = 2.0**slacks
+    
+    ### QUBO matrix: diagonal elements
+    qubo_matrix[:, items, items] = penalty * item_weights**2 - item_profits
+    qubo_matrix[:, n_items + slacks, n_items + slacks] = penalty * 4.0**slacks
+    qubo_matrix[:, -1, -1] = (penalty * slack_prefactor.astype(float)**2)[:, 0]
+    
+    ### QUBO matrix: off-diagonal elements
+    #### item-item interactions
+    item_block = qubo_matrix[:, :n_items, :n_items]
+    upper = items[:, None] < items[None, :]
+    multiply(item_weights[:, :, None], item_weights[:, None, :],
+             out=item_block, where=upper)
+    multiply(item_block, 2 * penalty[:, :, None],
+             out=item_block, where=upper)
+    #### slack-slack interactions
+    slack_block = 2.0**(slacks[:, None] + slacks[None, :])
+    qubo_matrix[:, n_items:-1, n_items:-1] += triu(
+        slack_block[None, :, :] * (2 * penalty[:, :, None]), k=1
+        )
+    qubo_matrix[:, n_items:-1, -1] = 2 * slack_powers * penalty
+    qubo_matrix[:, n_items:-1, -1] *= slack_prefactor
+    #### item-slack interactions
+    qubo_matrix[:, :n_items, n_items:-1] = (
+        item_weights[:, :, None] * slack_powers
+        ) * (-2 * penalty[:, :, None])
+    qubo_matrix[:, :n_items, -1] = 2 * penalty * item_weights
+    qubo_matrix[:, :n_items, -1] *= -slack_prefactor
+    
+    ### Output
+    return qubo_matrix if is_stack else qubo_matrix[0]
+
+
+## QUBO reformulation of the KP: structured representation
+class KnapsackQubo:
+    
+    """
+    Structured QUBO matrix of a KP instance
+    ========================================
+    
+    The KP QUBO matrix returned by `kp_qubo` is fully determined
+    by a handful of vectors. Calling `a = (w, -s)` the vector of
+    item weights `w` followed by the slack coefficients `s`, and
+    `p` the item profits padded with zeros on the slack binaries,
+    the matrix reads
+    
+        Q_ii = P * a_i**2 - p_i,    Q_ij = 2 * P * a_i * a_j  (i < j),
+    
+    with `P` the penalty constant. Only these vectors are stored,
+    i.e., O(n) memory, and the energy and the matrix-vector products
+    are computed without ever building the matrix. The dense or
+    sparse matrices are built only on request.
+    
+    **Arguments**
+
+        item_profits : 1D Numpy array
+            The value of the profits
+            associated with each item
+            to be packed.
+        item_weights : 1D Numpy array
+            The value of the weights
+            associated with each item
+            to be packed.
+        max_capacity : positive int
+            The positive integer limiting
+            the capacity of the knapsack.
+        penalty_cte : float
+            The QUBO penalty constant.
+    
+    **Details**
+
+        The binaries are arranged as in `kp_qubo`, and
+        the dense matrix from `to_dense` is bit-identical
+        to the output of `kp_qubo`.
+    """
+    
+    def __init__(self, item_profits, item_weights, max_capacity, penalty_cte=1.0):
+        self.item_profits = asarray(item_profits)
+        self.item_weights = asarray(item_weights)
+        if self.item_profits.shape != self.item_weights.shape:
+            raise ValueError("Profits and weights must have the same shape.")
+        self.max_capacity = max_capacity
+        self.penalty_cte = penalty_cte
+        
+        ### Slack binaries: powers of two, then the capacity remainder
+        c_bitlength = floor(log2(max_capacity))
+        self.slack_coefficients = concatenate([
+            2.0**arange(c_bitlength),
+            [max_capacity + 1 - 2**c_bitlength]
+            ])
+        
+        ### Vectors defining the matrix elements
+        self.coefficients = concatenate([
+            self.item_weights.astype(float64),
+            -self.slack_coefficients
+            ])
+        self.profits = concatenate([
+            self.item_profits.astype(float64),
+            zeros(self.n_slack)
+            ])
+    
+    @property
+    def n_items(self):
+        """Number of items of the KP instance."""
+        return self.item_profits.size
+    
+    @property
+    def n_slack(self):
+        """Number of slack binaries."""
+        return self.slack_coefficients.size
+    
+    @property
+    def n_binaries(self):
+        """Total number of binaries, i.e., the QUBO size."""
+        return self.n_items + self.n_slack
+    
+    @property
+    def shape(self):
+        """Shape of the QUBO matrix."""
+        return (self.n_binaries, self.n_binaries)
+    
+    @property
+    def nbytes(self):
+        """Memory used by the stored vectors, in bytes."""
+        return sum(
+            vec.nbytes for vec in (
+                self.item_profits, self.item_weights, self.slack_coefficients,
+                self.coefficients, self.profits
+                )
+            )
+    
+    def diagonal(self):
+        """Diagonal of the QUBO matrix."""
+        return self.penalty_cte * self.coefficients**2 - self.profits
+    
+    def energy(self, binaries):
+        
+        """
+        Value of the quadratic form x^T Q x
+        ====================================
+        
+        **Arguments**
+        
+            binaries : 1D or 2D Numpy array
+                One configuration of the binaries,
+                or a stack of configurations with
+                shape (n_configurations, n_binaries).
+        
+        **Outputs**
+        
+            energy : float or 1D Numpy array
+                The QUBO cost of each configuration.
+        """
+        
+        binaries = asarray(binaries, dtype=float64)
+        constraint = binaries @ self.coefficients
+        return self.penalty_cte * constraint**2 - binaries**2 @ self.profits
+    
+    def matvec(self, vector):
+        
+        """
+        Matrix-vector product Q v with the upper-triangular QUBO matrix
+        ================================================================
+        
+        **Arguments**
+        
+            vector : 1D or 2D Numpy array
+                A vector of size n_binaries, or a
+                matrix with n_binaries rows.
+        
+        **Outputs**
+        
+            product : 1D or 2D Numpy array
+                The product Q v, with the shape of `vector`.
+        """
+        
+        vector = asarray(vector)
+        coefficients = self._column(self.coefficients, vector)
+        weighted = coefficients * vector
+        tail = cumsum(weighted[::-1], axis=0)[::-1] - weighted
+        return (
+            self._column(self.diagonal(), vector) * vector
+            + 2 * self.penalty_cte * coefficients * tail
+            )
+    
+    def rmatvec(self, vector):
+        
+        """
+        Matrix-vector product Q^T v with the upper-triangular QUBO matrix
+        ==================================================================
+        
+        Same arguments and outputs as `matvec`.
+        """
+        
+        vector = asarray(vector)
+        coefficients = self._column(self.coefficients, vector)
+        weighted = coefficients * vector
+        head = cumsum(weighted, axis=0) - weighted
+        return (
+            self._column(self.diagonal(), vector) * vector
+            + 2 * self.penalty_cte * coefficients * head
+            )
+    
+    def as_linear_operator(self):
+        """The QUBO matrix as a matrix-free `scipy.sparse.linalg.LinearOperator`."""
+        return LinearOperator(
+            shape=self.shape,
+            matvec=self.matvec,
+            rmatvec=self.rmatvec,
+            matmat=self.matvec,
+            rmatmat=self.rmatvec,
+            dtype=float64
+            )
+    
+    def to_dense(self):
+        """The dense QUBO matrix, as returned by `kp_qubo`."""
+        return kp_qubo_vectorized(
+            self.item_profits, self.item_weights,
+            self.max_capacity, self.penalty_cte
+            )
+    
+    def to_sparse(self, format="csr"):
+        
+        """
+        The QUBO matrix in the given `scipy.sparse` format
+        ===================================================
+        
+        The triplets are built directly from the stored vectors,
+        without the dense matrix. Notice that the off-diagonal
+        part 2 * P * a_i * a_j is rank-one, so the upper triangle
+        is dense and the sparse matrix still stores O(n^2)
+        entries: use `matvec` or `as_linear_operator` to keep
+        O(n) memory.
+        
+        **Arguments**
+        
+            format : str
+                The `scipy.sparse` format, e.g. "csr" or "coo".
+        
+        **Outputs**
+        
+            qubo_matrix : scipy.sparse matrix
+                The upper-triangular QUBO matrix,
+                without the entries equal to zero.
+        """
+        
+        rows, cols = triu_indices(self.n_binaries, k=1)
+        values = (2 * self.penalty_cte) * self.coefficients[rows] * self.coefficients[cols]
+        rows = concatenate([arange(self.n_binaries), rows])
+        cols = concatenate([arange(self.n_binaries), cols])
+        values = concatenate([self.diagonal(), values])
+        nonzero = flatnonzero(values)
+        return coo_matrix(
+            (values[nonzero], (rows[nonzero], cols[nonzero])), shape=self.shape
+            ).asformat(format)
+    
+    @staticmethod
+    def _column(values, vector):
+        """Reshaping `values` to broadcast along the rows of `vector`."""
+        return values.reshape((-1,) + (1,) * (vector.ndim - 1))
+
+
 ## QUBO to spinglass Ising KP
 ## Method 1
 def qubo_to_ising_couplings(qubo_matrix):
@@ -183,9 +593,11 @@ def qubo_to_ising_couplings(qubo_matrix):
     
     **Arguments**
     
-        qubo_matrix : 2D Numpy array
+        qubo_matrix : 2D or 3D Numpy array, or scipy sparse matrix
             The QUBO matrix characterizing a
-            KP instance.
+            KP instance. A 3D array of shape
+            (n_instances, n_sites, n_sites)
+            is mapped instance by instance.
     
     **Outputs**
 
@@ -207,37 +619,59 @@ def qubo_to_ising_couplings(qubo_matrix):
                 - 'two-qubit': the set of two-body (in general all-to-all)
                                couplings describing the interactions
                                between pairs of qubits.
+            For a stack of QUBO matrices, every entry
+            gains a leading instance axis. For a sparse
+            QUBO matrix, the two-body couplings are
+            returned as a CSR matrix.
+    
+    **Details**
+    
+        Only the strict upper triangle of the QUBO
+        matrix is read, and it is copied once into
+        the two-body couplings. The magnetic fields
+        follow from the row and column sums of
+        the couplings, without any symmetrized copy.
     """
     
     ### Initializing function variables
-    n_sites = qubo_matrix.shape[0]
-    qubo_diagonal = diagonal(qubo_matrix).copy()
-    two_body_interactions = triu(qubo_matrix, k=1)
-    
-    ### Energy offset
-    cte = 0.5 * npsum(qubo_diagonal) + 0.25 * npsum(two_body_interactions)
+    if issparse(qubo_matrix):
+        qubo_diagonal = qubo_matrix.diagonal()
+        two_body_interactions = sparse_triu(qubo_matrix, k=1, format="csr")
+        two_body_interactions = two_body_interactions.astype(float64)
+        two_body_interactions.data *= 0.25
+        row_sums = asarray(two_body_interactions.sum(axis=1)).ravel()
+        column_sums = asarray(two_body_interactions.sum(axis=0)).ravel()
+        off_diag_sum = two_body_interactions.sum()
+    else:
+        qubo_matrix = asarray(qubo_matrix)
+        qubo_diagonal = diagonal(qubo_matrix, axis1=-2, axis2=-1)
+        two_body_interactions = triu(qubo_matrix, k=1).astype(float64, copy=False)
+        two_body_interactions *= 0.25
+        row_sums = npsum(two_body_interactions, axis=-1)
+        column_sums = npsum(two_body_interactions, axis=-2)
+        off_diag_sum = npsum(row_sums, axis=-1)
+    
+    ### Energy offset
+    cte = 0.5 * npsum(qubo_diagonal, axis=-1) + off_diag_sum
     
     ### Single-binary couplings, aka, spinglass magnetic fields
-    full_qubo_off_diag = two_body_interactions + two_body_interactions.T
-    magnetic_fields = 0.5 * qubo_diagonal
-    for jj in range(n_sites):
-        for jj_prime in range(n_sites):
-            if jj_prime != jj:
-                magnetic_fields[jj] += 0.25 * full_qubo_off_diag[jj][jj_prime]
-    #magnetic_fields = 0.5 * qubo_diagonal + 0.25 * npsum(two_body_interactions, axis=1)
-    
-    ### Output
+    #### Each off-diagonal element contributes to both its row and column site
+    magnetic_fields = 0.5 * qubo_diagonal + row_sums + column_sums
+    
+    ### Output
     couplings_dict = {
         'offset': cte,
         'one-qubit': magnetic_fields,
-        'two-qubit': two_body_interactions * 0.25
+        'two-qubit': two_body_interactions
         }
     return couplings_dict
 
-## Method 2
-## NOTE: do not look at this function
-## Still under debugging
-def spinglass_model(item_profits, item_weights, max_capacity, penalty_cte=1.0):
+## Method 2
+def spinglass_model(item_profits,
+                    item_weights,
+                    max_capacity,
+                    penalty_cte=1.0,
+                    rank_one=False):
     
     """
     Implementing the spinglass model of a KP instance
@@ -248,8 +682,8 @@ def spinglass_model(item_profits, item_weights, max_capacity, penalty_cte=1.0):
     model, obtained by mapping the problem to QUBO and
     then binary variables to spin variables.
     Here, the couplings are implemented directly, without
-    going through the QUBO matrix. This function should
-    obtain the same couplings as the previous one.
+    going through the QUBO matrix, and coincide with the
+    ones obtained by `qubo_to_ising_couplings`.
     
     **Arguments**
 
@@ -266,6 +700,11 @@ def spinglass_model(item_profits, item_weights, max_capacity, penalty_cte=1.0):
             the capacity of the knapsack.
         penalty_cte : float
             The QUBO penalty constant.
+        rank_one : bool
+            If True, the two-body couplings are
+            returned in factorized form (see below)
+            instead of as a dense matrix.
+            Default to False.
 
     **Outputs**
     
@@ -298,78 +737,45 @@ def spinglass_model(item_profits, item_weights, max_capacity, penalty_cte=1.0):
         capacity constraint is met ({b_{l}_{l=0}^M}),
         where M is the bit-length of the maximum capacity
         value.
+        
+        Writing the QUBO matrix as in `KnapsackQubo`, i.e.,
+        Q_ii = P a_i^2 - p_i and Q_ij = 2 P a_i a_j, and
+        mapping x_j = (1 + z_j) / 2, the couplings read
+        
+            offset = P (A^2 + sum_j a_j^2) / 4 - sum_j p_j / 2,
+            h_j = (P A a_j - p_j) / 2,
+            J_jk = P a_j a_k / 2  (j < k),
+        
+        with A = sum_j a_j. The cost is O(n) for the offset and
+        the fields. Since the couplings have rank one, with
+        `rank_one=True` the 'two-qubit' entry is the vector g
+        such that J_jk = g_j g_k for j < k (this requires a
+        non-negative penalty constant), and no n^2 array is
+        ever allocated.
     """
     
-    ### Reading input arguments
-    c_bitlength = floor(log2(max_capacity))
-    n_items = item_profits.size
-    n_slack = c_bitlength + 1
-    n_binaries = n_items + n_slack
-    total_available_weight = npsum(item_weights)
-    slack_prefactor = max_capacity + 1 - 2**c_bitlength
-    
-    ### Initializing variables
-    cte = 0
-    psum = 0
-    magnetic_fields = zeros(n_binaries)
-    two_body_interactions = zeros(shape=(n_binaries, n_binaries))
+    ### Reading input arguments
+    structured_qubo = KnapsackQubo(
+        item_profits, item_weights, max_capacity, penalty_cte
+        )
+    coefficients = structured_qubo.coefficients
+    profits = structured_qubo.profits
+    total_coefficient = npsum(coefficients)
     
     ### Computing the constant factor
-    for pj, wj in zip(item_profits, item_weights):
-        cte += penalty_cte * wj * wj - pj
-    cte *= 0.5
-    for jj in range(n_items - 1):
-        for jj_prime in range(jj + 1, n_items):
-            psum += item_weights[jj] * item_weights[jj_prime]
-    for ll in range(n_slack - 2):
-        for ll_prime in range(ll + 1, n_slack - 1):
-            psum += 2**(ll + ll_prime)
-    psum += slack_prefactor * (slack_prefactor - total_available_weight)
-    psum += 2**n_slack - 1 + (2**c_bitlength - 1) * total_available_weight
-    cte += 0.5 * penalty_cte * psum
-    
-    ### Computing single-qubit couplings, aka magnetic fields
-    #### Item magnetic fields
-    for jj, (pj, wj) in enumerate(zip(item_profits, item_weights)):
-        magnetic_fields[jj] += 0.5 * (
-            penalty_cte * wj * (wj - max_capacity) - pj
-            )
-    for jj in range(n_items - 1):
-        magnetic_fields[jj] += penalty_cte * item_weights[jj] * npsum([
-            item_weights[jj_prime]
-            for jj_prime in range(jj + 1, n_items)
-            ])
-    #### Slack magnetic fields
-    for ll in range(n_slack - 1):
-        magnetic_fields[n_items + ll] += 0.5 * penalty_cte * 2**ll * (
-            2 + 2**c_bitlength + total_available_weight + max_capacity
-            )
-    for ll in range(n_slack - 2):
-        magnetic_fields[n_items + ll] += penalty_cte * 2**ll * npsum([
-            2**ll_prime
-            for ll_prime in range(ll + 1, n_slack - 1)
-            ])
-    magnetic_fields[-1] += 0.5 * penalty_cte * slack_prefactor * (
-        max_capacity + 0.5 - 0.5 * 2**c_bitlength - total_available_weight
-        )
+    cte = 0.25 * penalty_cte * (total_coefficient**2 + npsum(coefficients**2))
+    cte -= 0.5 * npsum(profits)
+    
+    ### Computing single-qubit couplings, aka magnetic fields
+    magnetic_fields = 0.5 * (penalty_cte * total_coefficient * coefficients - profits)
     
     ### Computing two-qubit couplings, aka spin-spin interactions
-    #### item-item interactions
-    for jj in range(n_items - 1):
-        for jj_prime in range(jj + 1, n_items):
-            two_body_interactions[jj][jj_prime] += item_weights[jj] * item_weights[jj_prime]
-    #### slack-slack interactions
-    for ll in range(n_slack - 2):
-        for ll_prime in range(ll + 1, n_slack - 1):
-            two_body_interactions[n_items + ll, n_items + ll_prime] += 2**(ll + ll_prime)
-    for ll in range(n_slack - 1):
-        two_body_interactions[n_items + ll][-1] += slack_prefactor * 2**ll
-    #### item-slack interactions
-    for jj in range(n_items):
-        for ll in range(n_slack - 1):
-            two_body_interactions[jj][n_items + ll] -= 2**ll * item_weights[jj]
-        two_body_interactions[jj][-1] -= slack_prefactor * item_weights[jj]
-    two_body_interactions *= 0.5 * penalty_cte
+    if rank_one:
+        two_body_interactions = sqrt(0.5 * penalty_cte) * coefficients
+    else:
+        two_body_interactions = triu(
+            outer(coefficients, 0.5 * penalty_cte * coefficients), k=1
+            )
     
     ### Output
     couplings_dict = {
@@ -462,4 +868,118 @@ def check_max_capacity(item_weights, optimized_bitstring, max_capacity):
     ### Output
     total_weight = npdot(item_weights, optimized_bitstring)
     flag = True if total_weight <= max_capacity else False
-    return flag, int(total_weight)
\ No newline at end of file
+    return flag, int(total_weight)
+
+## Batched helper functions
+## Unpacking integer-encoded bitstrings
+def unpack_bitstrings(packed_bitstrings, n_items):
+    
+    """
+    Unpacking integer-encoded item configurations
+    ==============================================
+    
+    **Arguments**
+    
+        packed_bitstrings : 1D Numpy array of unsigned ints
+            Item configurations encoded as integers,
+            where bit j (least significant first)
+            is the 0/1 value of item j, as in the
+            brute-force enumeration of the KP.
+        n_items : int
+            The number of items, at most 64.
+    
+    **Outputs**
+    
+        bitstrings : 2D Numpy array
+            The configurations as a 0/1 uint8 array
+            of shape (n_configurations, n_items).
+    """
+    
+    packed_bitstrings = asarray(packed_bitstrings, dtype=uint64)
+    shifts = arange(n_items, dtype=uint64)
+    bitstrings = (packed_bitstrings[:, None] >> shifts) & uint64(1)
+    return bitstrings.astype(uint8)
+
+## Computation of profits, weights and feasibility of many configurations
+def evaluate_bitstrings(item_profits,
+                        item_weights,
+                        max_capacity,
+                        bitstrings,
+                        packed=False):
+    
+    """
+    Evaluating the KP on a batch of item configurations
+    ====================================================
+    
+    Vectorized counterpart of `compute_total_profit`
+    and `check_max_capacity`, e.g., to score all the
+    samples drawn from a quantum (-inspired) solver.
+    
+    **Arguments**
+    
+        item_profits : 1D Numpy array
+            The value of the profits
+            associated with each item
+            to be packed.
+        item_weights : 1D Numpy array
+            The value of the weights
+            associated with each item
+            to be packed.
+        max_capacity : positive int
+            The positive integer limiting
+            the capacity of the knapsack.
+        bitstrings : 2D or 1D Numpy array
+            Either the 0/1 configurations with shape
+            (n_configurations, n_items), or, if `packed`
+            is True, one unsigned integer per configuration
+            with bit j encoding item j (see `unpack_bitstrings`).
+        packed : bool
+            Whether `bitstrings` are integer-encoded.
+            Default to False.
+    
+    **Outputs**
+    
+        total_profits : 1D Numpy array
+            The total profit of each configuration.
+        total_weights : 1D Numpy array
+            The total weight of each configuration.
+        feasible : 1D Numpy array of bool
+            True where the configuration satisfies
+            the KP capacity constraint.
+    """
+    
+    ### Checking input arguments
+    item_profits = asarray(item_profits)
+    item_weights = asarray(item_weights)
+    if item_profits.size != item_weights.size:
+        raise ValueError("The number of profits must match"
+                         " the number of weights.")
+    
+    ### Integer-encoded configurations: one lookup table per byte,
+    ### without materializing the unpacked bitstrings
+    if packed:
+        if item_profits.size > 64:
+            raise ValueError("Packed bitstrings support at most 64 items.")
+        bitstrings = asarray(bitstrings, dtype=uint64)
+        total_profits = zeros(bitstrings.shape, dtype=item_profits.dtype)
+        total_weights = zeros(bitstrings.shape, dtype=item_weights.dtype)
+        byte_values = unpack_bitstrings(arange(256), 8)
+        for first_item in range(0, item_profits.size, 8):
+            items = slice(first_item, first_item + 8)
+            n_byte_items = item_profits[items].size
+            byte = (bitstrings >> uint64(first_item)) & uint64(255)
+            byte = byte.astype(intp)
+            total_profits += (byte_values[:, :n_byte_items] @ item_profits[items])[byte]
+            total_weights += (byte_values[:, :n_byte_items] @ item_weights[items])[byte]
+    
+    ### 0/1 configurations
+    else:
+        bitstrings = atleast_2d(bitstrings)
+        if bitstrings.shape[1] != item_profits.size:
+            raise ValueError("The number of items must match the"
+                             " number of instance profits parameters.")
+        total_profits = bitstrings @ item_profits
+        total_weights = bitstrings @ item_weights
+    
+    ### Output
+    return total_profits, total_weights, total_weights <= max_capacity
@@ -0,0 +1,272 @@
+##############################################################################
+#                              COPYRIGHT NOTICE                              #
+##############################################################################
+#
+# This code is part of the Tensor Network Hackathon
+# project of the Quantum Padova group.
+# (https://baltig.infn.it/qpd/tensor-network-hackathon)
+#
+# This code is licensed under the Apache License, Version 2.0.
+# You may obtain a copy of this license at
+# http://www.apache.org/licenses/LICENSE-2.0.
+#
+# Any modifications or derivative works of this code must retain this
+# copyright notice, and modified files need to carry a notice indicating
+# that they have been altered from the originals.
+#
+##############################################################################
+##############################################################################
+
+"""
+Exhaustive search of QUBO and spinglass ground states
+=====================================================
+
+Enumerates all the 2^n configurations of a QUBO matrix, e.g., from
+`kp_qubo`, or of the spinglass couplings from `qubo_to_ising_couplings`,
+and returns the k lowest-energy states.
+
+The binaries are split in three groups:
+
+- the highest `chunk_bits` binaries are fixed per task, and the tasks
+  are distributed over a process pool;
+- the next `lane_bits` binaries are enumerated at once as a vector of
+  2^lane_bits "lanes";
+- the lowest binaries are visited in Gray-code order, so that every step
+  flips a single binary, the same one in every lane. The energy change
+  of a flip only needs the local field of the flipped binary, hence
+  every step costs O(1) per lane plus O(n) shared work, instead of the
+  O(n^2) of a full energy evaluation. Blocks of steps are processed
+  together with a cumulative sum over the energy changes.
+"""
+
+
+## Modules
+from math import ceil, log2
+from concurrent.futures import ProcessPoolExecutor
+from numpy import arange, argpartition, argsort, asarray, concatenate
+from numpy import cumsum, diagonal, einsum, float64, int64, triu, tril
+from numpy import frexp, zeros
+
+from knapsack import unpack_bitstrings
+
+
+## Energy helpers
+def _split_qubo(qubo_matrix):
+
+    """
+    Diagonal and symmetric zero-diagonal part of a QUBO matrix.
+
+    The QUBO cost x^T Q x equals diag . x + x^T S x / 2, with S the
+    symmetric matrix built from the off-diagonal elements of Q.
+    """
+
+    qubo_matrix = asarray(qubo_matrix, dtype=float64)
+    off_diagonal = triu(qubo_matrix, k=1) + tril(qubo_matrix, k=-1).T
+    return diagonal(qubo_matrix).copy(), off_diagonal + off_diagonal.T
+
+
+def _qubo_energies(binaries, qubo_diagonal, symmetric):
+
+    """
+    QUBO cost of a stack of configurations with shape (m, n).
+    """
+
+    binaries = asarray(binaries, dtype=float64)
+    return binaries @ qubo_diagonal + 0.5 * einsum(
+        "mi,ij,mj->m", binaries, symmetric, binaries
+        )
+
+
+def _lowest(energies, state_ids, n_lowest):
+
+    """
+    The `n_lowest` smallest energies with their state ids.
+    """
+
+    if energies.size > n_lowest:
+        selection = argpartition(energies, n_lowest - 1)[:n_lowest]
+        energies, state_ids = energies[selection], state_ids[selection]
+    return energies, state_ids
+
+
+## Exhaustive search of one task
+def _gray_code_search(task):
+
+    """
+    Enumerating all the configurations sharing the task prefix.
+
+    State ids encode binary j in bit j. Bits `gray_bits` to
+    `gray_bits + lane_bits - 1` are the lane index, the higher
+    ones the task prefix.
+    """
+
+    (qubo_diagonal, symmetric, prefix, lane_bits,
+     gray_bits, n_lowest, block_size) = task
+    n_sites = qubo_diagonal.size
+
+    ### Lanes with all the Gray-code binaries set to zero
+    lane_ids = (prefix << lane_bits) | arange(1 << lane_bits, dtype=int64)
+    lane_states = zeros((lane_ids.size, n_sites))
+    lane_states[:, gray_bits:] = unpack_bitstrings(lane_ids, n_sites - gray_bits)
+    energies = _qubo_energies(lane_states, qubo_diagonal, symmetric)
+    lane_fields = (lane_states @ symmetric[:, :gray_bits]).T
+    best_energies, best_ids = _lowest(energies, lane_ids << gray_bits, n_lowest)
+
+    ### Gray-code walk over the lowest binaries, one block of steps at a time
+    gray_symmetric = symmetric[:gray_bits, :gray_bits]
+    for first_step in range(1, 1 << gray_bits, block_size):
+        steps = arange(first_step, min(first_step + block_size, 1 << gray_bits))
+        flipped = frexp(steps & -steps)[1] - 1
+        previous = unpack_bitstrings((steps - 1) ^ ((steps - 1) >> 1), gray_bits)
+        signs = 1.0 - 2.0 * previous[arange(steps.size), flipped]
+        gray_fields = einsum("tb,bt->t", previous, gray_symmetric[:, flipped])
+        deltas = (qubo_diagonal[flipped] + gray_fields)[:, None]
+        deltas = signs[:, None] * (deltas + lane_fields[flipped])
+        block_energies = energies + cumsum(deltas, axis=0)
+        energies = block_energies[-1]
+        block_ids = (lane_ids[None, :] << gray_bits) | (steps ^ (steps >> 1))[:, None]
+        best_energies, best_ids = _lowest(
+            concatenate([best_energies, block_energies.ravel()]),
+            concatenate([best_ids, block_ids.ravel()]),
+            n_lowest
+            )
+
+    return best_energies, best_ids
+
+
+## Task scheduling
+def _search(qubo_diagonal, symmetric, n_lowest, n_workers,
+            lane_bits, chunk_bits, block_size):
+
+    """
+    Splitting the enumeration in tasks and merging their results.
+    """
+
+    n_sites = qubo_diagonal.size
+    if n_sites > 62:
+        raise ValueError("Exhaustive search supports at most 62 binaries.")
+    if chunk_bits is None:
+        chunk_bits = 0 if n_workers == 1 else ceil(log2(4 * n_workers))
+    chunk_bits = min(chunk_bits, n_sites)
+    lane_bits = min(lane_bits, n_sites - chunk_bits)
+    gray_bits = n_sites - chunk_bits - lane_bits
+    tasks = [
+        (qubo_diagonal, symmetric, prefix, lane_bits,
+         gray_bits, n_lowest, block_size)
+        for prefix in range(1 << chunk_bits)
+        ]
+
+    if n_workers == 1:
+        results = list(map(_gray_code_search, tasks))
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            results = list(executor.map(_gray_code_search, tasks))
+
+    ### Merging the tasks and refining the energies of the selected states
+    energies, state_ids = _lowest(
+        concatenate([energies for energies, _ in results]),
+        concatenate([state_ids for _, state_ids in results]),
+        n_lowest
+        )
+    states = unpack_bitstrings(state_ids, n_sites)
+    energies = _qubo_energies(states, qubo_diagonal, symmetric)
+    order = argsort(energies, kind="stable")
+    return energies[order], states[order]
+
+
+## Brute-force QUBO solver
+def qubo_brute_force(qubo_matrix,
+                     n_lowest=1,
+                     n_workers=1,
+                     lane_bits=10,
+                     chunk_bits=None,
+                     block_size=256):
+
+    """
+    Lowest-cost configurations of a QUBO matrix
+    ============================================
+
+    **Arguments**
+
+        qubo_matrix : 2D Numpy array
+            The QUBO matrix Q, e.g., from `kp_qubo`. The
+            cost of a configuration x is x^T Q x, and
+            only the sum Q_ij + Q_ji matters for i != j.
+        n_lowest : int
+            Number k of lowest-cost states returned.
+            Default to 1.
+        n_workers : int
+            Number of processes of the pool. Default to 1,
+            i.e., the search runs in the calling process.
+        lane_bits : int
+            Number of binaries enumerated as a vector.
+            Default to 10.
+        chunk_bits : int or None
+            Number of binaries fixed per task. Default to
+            None, i.e., about four tasks per worker.
+        block_size : int
+            Number of Gray-code steps processed together.
+            Default to 256.
+
+    **Outputs**
+
+        energies : 1D Numpy array
+            The k lowest costs, in increasing order.
+        states : 2D Numpy array
+            The corresponding 0/1 configurations, with
+            shape (k, n_binaries).
+    """
+
+    qubo_diagonal, symmetric = _split_qubo(qubo_matrix)
+    return _search(qubo_diagonal, symmetric, n_lowest, n_workers,
+                   lane_bits, chunk_bits, block_size)
+
+
+## Brute-force spinglass solver
+def ising_brute_force(couplings_dict,
+                      n_lowest=1,
+                      n_workers=1,
+                      lane_bits=10,
+                      chunk_bits=None,
+                      block_size=256):
+
+    """
+    Lowest-energy spin configurations of a spinglass model
+    =======================================================
+
+    **Arguments**
+
+        couplings_dict : dict
+            The spinglass couplings, as returned by
+            `qubo_to_ising_couplings`, with a dense
+            'two-qubit' matrix. The energy of the spins
+            z is offset + h . z + sum_{i<j} J_ij z_i z_j.
+        n_lowest, n_workers, lane_bits, chunk_bits, block_size
+            See `qubo_brute_force`.
+
+    **Outputs**
+
+        energies : 1D Numpy array
+            The k lowest energies, offset included,
+            in increasing order.
+        spins : 2D Numpy array
+            The corresponding +1/-1 configurations, with
+            shape (k, n_sites).
+
+    **Details**
+
+        The model is mapped back to a QUBO with z = 2 x - 1,
+        consistently with `qubo_to_ising_couplings`.
+    """
+
+    fields = asarray(couplings_dict['one-qubit'], dtype=float64)
+    couplings = asarray(couplings_dict['two-qubit'], dtype=float64)
+    if couplings.ndim != 2:
+        raise ValueError("The two-body couplings must be a dense matrix.")
+    _, symmetric = _split_qubo(couplings)
+    qubo_diagonal = 2 * fields - 2 * symmetric.sum(axis=1)
+    constant = couplings_dict['offset'] - fields.sum() + 0.5 * symmetric.sum()
+    energies, states = _search(qubo_diagonal, 4 * symmetric, n_lowest, n_workers,
+                               lane_bits, chunk_bits, block_size)
+    spins = 2 * states.astype(int64) - 1
+    return energies + constant, spins
@@ -0,0 +1,267 @@
+##############################################################################
+#                              COPYRIGHT NOTICE                              #
+##############################################################################
+#
+# This code is part of the Tensor Network Hackathon
+# project of the Quantum Padova group.
+# (https://baltig.infn.it/qpd/tensor-network-hackathon)
+#
+# This code is licensed under the Apache License, Version 2.0.
+# You may obtain a copy of this license at
+# http://www.apache.org/licenses/LICENSE-2.0.
+#
+# Any modifications or derivative works of this code must retain this
+# copyright notice, and modified files need to carry a notice indicating
+# that they have been altered from the originals.
+#
+##############################################################################
+##############################################################################
+
+"""
+Cache of derived KP artifacts
+=============================
+
+The QUBO matrix, the spinglass couplings and the exact optimum of an
+instance only depend on its data and, for the first two, on the penalty
+constant. `KnapsackCache` stores them under a content hash of these
+inputs, in two layers:
+
+- a folder of binary containers (see `kp_storage`), shared by runs and
+  processes, bounded in size by evicting the least recently used files;
+- an in-memory LRU dictionary in front of it.
+
+.. codeblock::
+
+    cache = KnapsackCache("kp_cache", max_bytes=2**30)
+    for penalty_cte in penalties:
+        couplings = cache.couplings(profits, weights, capacity, penalty_cte)
+    best_profit, best_bitstring = cache.optimum(profits, weights, capacity)
+"""
+
+
+## Modules
+from os import getpid, listdir, makedirs, remove, replace, stat, utime
+from os.path import join, exists
+from hashlib import sha256
+from collections import OrderedDict
+from numpy import asarray, ascontiguousarray, float64, int64, integer, issubdtype
+
+from knapsack import kp_qubo_vectorized, qubo_to_ising_couplings
+from kp_exact import solve_kp
+from kp_storage import save_container, load_container
+
+
+SUFFIX = ".kpb"
+
+
+## Content hash
+def artifact_key(kind, item_profits, item_weights, max_capacity, penalty_cte=None):
+
+    """
+    Content hash of a derived artifact
+    ===================================
+
+    **Arguments**
+
+        kind : str
+            The artifact name, e.g., 'qubo'.
+        item_profits, item_weights : 1D Numpy arrays
+            The generating vectors of the instance.
+        max_capacity : int
+            The knapsack capacity.
+        penalty_cte : float or None
+            The penalty constant, None for the
+            artifacts that do not depend on it.
+
+    **Outputs**
+
+        key : str
+            Hexadecimal SHA-256 digest. Integer data
+            hash the same for any integer dtype.
+    """
+
+    digest = sha256(kind.encode())
+    for vector in (item_profits, item_weights):
+        vector = asarray(vector)
+        vector_dtype = int64 if issubdtype(vector.dtype, integer) else float64
+        vector = ascontiguousarray(vector, dtype=vector_dtype)
+        digest.update(f"|{vector.dtype.str}:{vector.size}|".encode())
+        digest.update(vector.tobytes())
+    digest.update(f"|C={int(max_capacity)}".encode())
+    if penalty_cte is not None:
+        digest.update(f"|P={float(penalty_cte)!r}".encode())
+    return digest.hexdigest()
+
+
+## Two-layer cache
+class KnapsackCache:
+
+    """
+    Disk and in-memory cache of KP artifacts
+    =========================================
+
+    **Arguments**
+
+        cache_dir : str
+            Folder of the binary containers,
+            created if needed. Default to "kp_cache".
+        max_bytes : int or None
+            Size bound of the folder. Default to
+            1 GiB, None for no bound.
+        max_memory_items : int
+            Number of artifacts kept in memory.
+            Default to 32.
+
+    **Details**
+
+        Returned arrays are read-only, either memory-mapped
+        from the cache folder or flagged as non-writeable.
+        Files are written under a temporary name and renamed,
+        so that several processes can share the folder. A hit
+        refreshes the modification time of the file, which
+        is the recency used by the eviction.
+    """
+
+    def __init__(self, cache_dir="kp_cache", max_bytes=2**30, max_memory_items=32):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_memory_items = max_memory_items
+        self.memory = OrderedDict()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+        makedirs(cache_dir, exist_ok=True)
+
+    #### Public artifacts
+    def qubo(self, item_profits, item_weights, max_capacity, penalty_cte):
+
+        """
+        QUBO matrix of `kp_qubo_vectorized`.
+        """
+
+        key = artifact_key("qubo", item_profits, item_weights, max_capacity, penalty_cte)
+
+        def compute():
+            qubo_matrix = kp_qubo_vectorized(
+                item_profits, item_weights, max_capacity, penalty_cte
+                )
+            return {"qubo": qubo_matrix}, {}
+
+        arrays, _ = self._get(key, compute)
+        return arrays["qubo"]
+
+    def couplings(self, item_profits, item_weights, max_capacity, penalty_cte):
+
+        """
+        Spinglass couplings of `qubo_to_ising_couplings`, computed
+        from the cached QUBO matrix.
+        """
+
+        key = artifact_key(
+            "couplings", item_profits, item_weights, max_capacity, penalty_cte
+            )
+
+        def compute():
+            couplings_dict = qubo_to_ising_couplings(
+                self.qubo(item_profits, item_weights, max_capacity, penalty_cte)
+                )
+            arrays = {
+                "one-qubit": couplings_dict['one-qubit'],
+                "two-qubit": couplings_dict['two-qubit']
+                }
+            return arrays, {"offset": float(couplings_dict['offset'])}
+
+        arrays, metadata = self._get(key, compute)
+        return {
+            'offset': metadata["offset"],
+            'one-qubit': arrays["one-qubit"],
+            'two-qubit': arrays["two-qubit"]
+            }
+
+    def optimum(self, item_profits, item_weights, max_capacity):
+
+        """
+        Exact optimum of `kp_exact.solve_kp`, as (best_profit, best_bitstring).
+        """
+
+        key = artifact_key("optimum", item_profits, item_weights, max_capacity)
+
+        def compute():
+            best_profit, best_bitstring = solve_kp(
+                item_profits, item_weights, max_capacity
+                )
+            return {"bitstring": best_bitstring}, {"best_profit": best_profit}
+
+        arrays, metadata = self._get(key, compute)
+        return metadata["best_profit"], arrays["bitstring"]
+
+    def clear(self):
+
+        """
+        Removing every artifact, in memory and on disk.
+        """
+
+        self.memory.clear()
+        for name in listdir(self.cache_dir):
+            if name.endswith(SUFFIX):
+                remove(join(self.cache_dir, name))
+
+    #### Lookup
+    def _get(self, key, compute):
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            self.stats["memory_hits"] += 1
+            return self.memory[key]
+
+        filename = join(self.cache_dir, key + SUFFIX)
+        entry = None
+        if exists(filename):
+            try:
+                entry = load_container(filename)
+                utime(filename)
+                self.stats["disk_hits"] += 1
+            except (IOError, ValueError):
+                entry = None
+        if entry is None:
+            arrays, metadata = compute()
+            arrays = {name: asarray(array) for name, array in arrays.items()}
+            for array in arrays.values():
+                array.flags.writeable = False
+            entry = (arrays, metadata)
+            self._store(filename, arrays, metadata)
+            self.stats["misses"] += 1
+
+        self.memory[key] = entry
+        if len(self.memory) > self.max_memory_items:
+            self.memory.popitem(last=False)
+        return entry
+
+    #### Disk layer
+    def _store(self, filename, arrays, metadata):
+        temporary = f"{filename}.{getpid()}.tmp"
+        save_container(temporary, arrays, metadata)
+        replace(temporary, filename)
+        self._evict(keep=filename)
+
+    def _evict(self, keep=None):
+        if self.max_bytes is None:
+            return
+        entries = []
+        for name in listdir(self.cache_dir):
+            if not name.endswith(SUFFIX):
+                continue
+            filename = join(self.cache_dir, name)
+            try:
+                file_stat = stat(filename)
+            except FileNotFoundError:
+                continue
+            entries.append((file_stat.st_mtime, file_stat.st_size, filename))
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, filename in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            if filename == keep:
+                continue
+            try:
+                remove(filename)
+            except FileNotFoundError:
+                pass
+            total_bytes -= size
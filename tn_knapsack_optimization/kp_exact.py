@@ -0,0 +1,372 @@
+##############################################################################
+#                              COPYRIGHT NOTICE                              #
+##############################################################################
+#
+# This code is part of the Tensor Network Hackathon
+# project of the Quantum Padova group.
+# (https://baltig.infn.it/qpd/tensor-network-hackathon)
+#
+# This code is licensed under the Apache License, Version 2.0.
+# You may obtain a copy of this license at
+# http://www.apache.org/licenses/LICENSE-2.0.
+#
+# Any modifications or derivative works of this code must retain this
+# copyright notice, and modified files need to carry a notice indicating
+# that they have been altered from the originals.
+#
+##############################################################################
+##############################################################################
+
+"""
+Exact classical solvers for the Knapsack Problem
+================================================
+
+Native reference solvers, alternative to brute force and CPLEX:
+
+- a dynamic program over the capacities, O(n C) time, keeping a
+  single row of optimal profits plus one bit per (item, capacity)
+  pair to reconstruct the optimal configuration;
+- a depth-first branch-and-bound with the Dantzig (fractional)
+  upper bound, for instances whose capacity is too large for the
+  dynamic program.
+
+Running the module solves every instance in the given folders,
+by default the whole `kp_instances` tree:
+
+.. codeblock::
+
+    python3 kp_exact.py kp_instances/small kp_instances/medium
+"""
+
+
+## Modules
+from os import listdir
+from os.path import join, isfile
+from time import perf_counter
+from bisect import bisect_right
+from argparse import ArgumentParser
+from numpy import zeros, argsort, packbits, maximum, uint8, integer
+from numpy import asarray, issubdtype
+
+from knapsack import read_kp_instance, check_max_capacity
+
+
+## Checking a KP instance
+def _check_instance(item_profits, item_weights, max_capacity):
+
+    """
+    Converting the instance to arrays and checking its consistency.
+    """
+
+    item_profits = asarray(item_profits)
+    item_weights = asarray(item_weights)
+    if item_profits.shape != item_weights.shape:
+        raise ValueError("The number of profits must match"
+                         " the number of weights.")
+    if (item_weights <= 0).any() or max_capacity < 0:
+        raise ValueError("Weights must be positive and the"
+                         " capacity non-negative.")
+    return item_profits, item_weights, int(max_capacity)
+
+
+## KP solver: dynamic programming
+def kp_dynamic_programming(item_profits,
+                           item_weights,
+                           max_capacity,
+                           return_solution=True):
+
+    """
+    Solving the KP with dynamic programming
+    ========================================
+
+    **Arguments**
+
+        item_profits : 1D Numpy array
+            The value of the profits
+            associated with each item
+            to be packed.
+        item_weights : 1D Numpy array of positive ints
+            The value of the weights
+            associated with each item
+            to be packed.
+        max_capacity : positive int
+            The positive integer limiting
+            the capacity of the knapsack.
+        return_solution : bool
+            If False, only the optimal profit is
+            computed, keeping a single row of C + 1
+            profits in memory. Default to True.
+
+    **Outputs**
+
+        best_profit : int or float
+            The optimal total profit.
+        best_bitstring : 1D Numpy array or None
+            An optimal item configuration, None
+            if `return_solution` is False.
+
+    **Details**
+
+        The row `best[c]` holds the optimal profit with
+        capacity c over the items processed so far, and
+        every item updates it in place in O(C) vectorized
+        operations. To reconstruct the configuration, the
+        positions where the item improved the row are
+        stored as a packed bitset, i.e., n (C + 1) / 8 bytes.
+    """
+
+    ### Initializing
+    item_profits, item_weights, max_capacity = _check_instance(
+        item_profits, item_weights, max_capacity
+        )
+    best = zeros(max_capacity + 1, dtype=item_profits.dtype)
+    decisions = []
+
+    ### Updating the row of optimal profits item by item
+    for pj, wj in zip(item_profits, item_weights):
+        if wj > max_capacity:
+            decisions.append(None)
+            continue
+        candidate = best[:max_capacity + 1 - wj] + pj
+        improved = candidate > best[wj:]
+        maximum(best[wj:], candidate, out=best[wj:])
+        if return_solution:
+            decisions.append(packbits(improved))
+
+    ### Output
+    best_profit = best[-1].item()
+    if not return_solution:
+        return best_profit, None
+
+    ### Backtracking the optimal configuration
+    best_bitstring = zeros(item_profits.size, dtype=uint8)
+    capacity = max_capacity
+    for jj in range(item_profits.size - 1, -1, -1):
+        wj = int(item_weights[jj])
+        if decisions[jj] is None or capacity < wj:
+            continue
+        position = capacity - wj
+        if (decisions[jj][position >> 3] >> (7 - (position & 7))) & 1:
+            best_bitstring[jj] = 1
+            capacity -= wj
+    return best_profit, best_bitstring
+
+
+## KP solver: branch-and-bound
+def kp_branch_and_bound(item_profits,
+                        item_weights,
+                        max_capacity,
+                        max_nodes=None):
+
+    """
+    Solving the KP with depth-first branch-and-bound
+    =================================================
+
+    **Arguments**
+
+        item_profits : 1D Numpy array
+            The value of the profits
+            associated with each item
+            to be packed.
+        item_weights : 1D Numpy array
+            The value of the weights
+            associated with each item
+            to be packed.
+        max_capacity : positive int
+            The positive integer limiting
+            the capacity of the knapsack.
+        max_nodes : int or None
+            Maximum number of explored nodes. When
+            it is reached, the best configuration
+            found so far is returned. Default to None,
+            i.e., no limit.
+
+    **Outputs**
+
+        best_profit : int or float
+            The best total profit found.
+        best_bitstring : 1D Numpy array
+            The corresponding item configuration.
+        is_optimal : bool
+            True if the search tree was fully
+            explored, i.e., the solution is optimal.
+
+    **Details**
+
+        Items are sorted by decreasing profit/weight ratio,
+        the greedy solution gives the first lower bound, and
+        every node is pruned with the Dantzig bound, i.e.,
+        the optimum of the continuous relaxation, computed
+        in O(log n) from prefix sums. The cost does not
+        depend on the capacity, but it is exponential in
+        the worst case.
+    """
+
+    ### Sorting the items by efficiency
+    item_profits, item_weights, max_capacity = _check_instance(
+        item_profits, item_weights, max_capacity
+        )
+    n_items = item_profits.size
+    order = argsort(-item_profits / item_weights, kind="stable")
+    profits = item_profits[order].tolist()
+    weights = item_weights[order].tolist()
+    integer_profits = issubdtype(item_profits.dtype, integer)
+    prefix_profits = [0]
+    prefix_weights = [0]
+    for pj, wj in zip(profits, weights):
+        prefix_profits.append(prefix_profits[-1] + pj)
+        prefix_weights.append(prefix_weights[-1] + wj)
+
+    def upper_bound(level, capacity, profit):
+        critical = bisect_right(
+            prefix_weights, prefix_weights[level] + capacity, lo=level
+            ) - 1
+        bound = profit + prefix_profits[critical] - prefix_profits[level]
+        if critical < n_items:
+            residual = capacity - prefix_weights[critical] + prefix_weights[level]
+            bound += residual * profits[critical] / weights[critical]
+        return int(bound) if integer_profits else bound
+
+    ### Greedy lower bound
+    best_profit, best_mask, capacity = 0, 0, max_capacity
+    for jj in range(n_items):
+        if weights[jj] <= capacity:
+            capacity -= weights[jj]
+            best_profit += profits[jj]
+            best_mask |= 1 << jj
+
+    ### Depth-first search, taking the item before skipping it
+    n_nodes = 0
+    is_optimal = True
+    stack = [(0, max_capacity, 0, 0)]
+    while stack:
+        level, capacity, profit, mask = stack.pop()
+        n_nodes += 1
+        if max_nodes is not None and n_nodes > max_nodes:
+            is_optimal = False
+            break
+        if profit > best_profit:
+            best_profit, best_mask = profit, mask
+        if level == n_items or upper_bound(level, capacity, profit) <= best_profit:
+            continue
+        stack.append((level + 1, capacity, profit, mask))
+        if weights[level] <= capacity:
+            stack.append((
+                level + 1,
+                capacity - weights[level],
+                profit + profits[level],
+                mask | (1 << level)
+                ))
+
+    ### Output, in the original item order
+    best_bitstring = zeros(n_items, dtype=uint8)
+    for jj in range(n_items):
+        if (best_mask >> jj) & 1:
+            best_bitstring[order[jj]] = 1
+    return best_profit, best_bitstring, is_optimal
+
+
+## KP solver: automatic choice
+def solve_kp(item_profits,
+             item_weights,
+             max_capacity,
+             method="auto",
+             max_dp_cells=10**9):
+
+    """
+    Solving a KP instance exactly
+    ==============================
+
+    **Arguments**
+
+        item_profits : 1D Numpy array
+            The value of the profits
+            associated with each item
+            to be packed.
+        item_weights : 1D Numpy array
+            The value of the weights
+            associated with each item
+            to be packed.
+        max_capacity : positive int
+            The positive integer limiting
+            the capacity of the knapsack.
+        method : str
+            "dp" for dynamic programming, "bnb" for
+            branch-and-bound, "auto" to use dynamic
+            programming whenever n (C + 1) does not
+            exceed `max_dp_cells`. Default to "auto".
+        max_dp_cells : int
+            Threshold for the automatic choice.
+
+    **Outputs**
+
+        best_profit : int or float
+            The optimal total profit.
+        best_bitstring : 1D Numpy array
+            An optimal item configuration.
+    """
+
+    if method == "auto":
+        n_cells = len(item_profits) * (max_capacity + 1)
+        method = "dp" if n_cells <= max_dp_cells else "bnb"
+    if method == "dp":
+        return kp_dynamic_programming(item_profits, item_weights, max_capacity)
+    if method == "bnb":
+        return kp_branch_and_bound(item_profits, item_weights, max_capacity)[:2]
+    raise ValueError(f"Unknown method {method}, use 'dp', 'bnb' or 'auto'.")
+
+
+## Solving a KP instance file
+def solve_kp_instance(filename, method="auto"):
+
+    """
+    Solving exactly the KP instance stored in `filename`
+    =====================================================
+
+    **Arguments**
+
+        filename : str
+            Path to a file in the `kp_instances` format.
+        method : str
+            The solver, see `solve_kp`.
+
+    **Outputs**
+
+        best_profit : int
+            The optimal total profit.
+        best_bitstring : 1D Numpy array
+            An optimal item configuration.
+        total_weight : int
+            The total weight of the optimal configuration.
+    """
+
+    item_profits, item_weights, max_capacity = read_kp_instance(filename)
+    best_profit, best_bitstring = solve_kp(
+        item_profits, item_weights, max_capacity, method
+        )
+    _, total_weight = check_max_capacity(item_weights, best_bitstring, max_capacity)
+    return best_profit, best_bitstring, total_weight
+
+
+def main():
+    parser = ArgumentParser(description="Exact optima of KP instance files.")
+    parser.add_argument("folders", nargs="*", default=[
+        "kp_instances/small", "kp_instances/medium", "kp_instances/large"
+        ])
+    parser.add_argument("--method", default="auto", choices=["auto", "dp", "bnb"])
+    args = parser.parse_args()
+
+    print(f"{'instance':<32} {'profit':>8} {'weight':>8} {'time [s]':>10}")
+    for folder in args.folders:
+        for name in sorted(listdir(folder)):
+            filename = join(folder, name)
+            if not isfile(filename):
+                continue
+            st_time = perf_counter()
+            best_profit, _, total_weight = solve_kp_instance(filename, args.method)
+            runtime = perf_counter() - st_time
+            print(f"{name:<32} {best_profit:>8} {total_weight:>8} {runtime:>10.4f}")
+
+
+if __name__ == "__main__":
+    main()
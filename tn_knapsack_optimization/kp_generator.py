@@ -0,0 +1,290 @@
+##############################################################################
+#                              COPYRIGHT NOTICE                              #
+##############################################################################
+#
+# This code is part of the Tensor Network Hackathon
+# project of the Quantum Padova group.
+# (https://baltig.infn.it/qpd/tensor-network-hackathon)
+#
+# This code is licensed under the Apache License, Version 2.0.
+# You may obtain a copy of this license at
+# http://www.apache.org/licenses/LICENSE-2.0.
+#
+# Any modifications or derivative works of this code must retain this
+# copyright notice, and modified files need to carry a notice indicating
+# that they have been altered from the originals.
+#
+##############################################################################
+##############################################################################
+
+"""
+Seedable generator of KP instance families
+==========================================
+
+Same hard-instance construction as `knapsack.kp_instance`, but
+
+- every instance of a family draws from its own random stream, spawned
+  from one root seed with `numpy.random.SeedSequence`, so instances are
+  independent and each one is reproducible on its own;
+- profits and weights are drawn with one vectorized call per instance;
+- families can be streamed as an iterator, e.g., straight into the QUBO
+  builder, or written to disk in parallel.
+
+The 24 hard instances of `benchmarking.ipynb`, here with 10 items,
+are written with
+
+.. codeblock::
+
+    python3 kp_generator.py --n-items 10 --seed 1 --workers 4 --output kp_family_n_10
+"""
+
+
+## Modules
+from os import makedirs
+from os.path import join
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+from numpy import arange, concatenate, repeat, max as npmax
+from numpy.random import SeedSequence, default_rng
+
+from knapsack import write_kp_instance, kp_qubo_vectorized, KnapsackQubo
+
+
+## Knapsack Problem: vectorized instance
+def kp_instance_arrays(n_items,
+                       max_capacity,
+                       classes=2,
+                       fraction=0.1,
+                       epsilon=0,
+                       small=10,
+                       rng=None):
+
+    """
+    Drawing a hard KP instance
+    ==========================
+
+    **Arguments**
+
+        n_items, max_capacity, classes, fraction, epsilon, small
+            The generator parameters, as in `kp_instance`.
+        rng : numpy.random.Generator, SeedSequence, int or None
+            The random stream of the instance.
+
+    **Outputs**
+
+        item_profits : 1D Numpy array
+            The value of the profits
+            associated with each item.
+        item_weights : 1D Numpy array
+            The value of the weights
+            associated with each item.
+    """
+
+    ### Conditions on the parameters
+    if classes < 2:
+        raise ValueError(
+            "The classes parameter of the generator must be greater than 1."
+            )
+    if not (0 <= fraction <= 1):
+        raise ValueError(
+            "The fraction parameter of the generator must be in [0, 1]."
+            )
+    if small >= max_capacity:
+        raise ValueError(
+            "The upper bound for profits and weights"
+            " must be smaller than the knapsack capacity"
+            )
+
+    ### Drawing all the random numbers at once
+    rng = default_rng(rng)
+    amount_small = int(n_items * fraction)
+    am1 = (n_items - amount_small) // classes
+    noise = rng.integers(1, small, size=(2, n_items), endpoint=True)
+
+    ### Class items close to C / 2, C / 4, ..., then small items
+    n_large = am1 * classes
+    denominators = 2.0**(1 + repeat(arange(classes), am1))
+    large_base = (1 / denominators + epsilon) * max_capacity
+    item_profits = concatenate([
+        (large_base + noise[0, :n_large]).astype(int), noise[0, n_large:]
+        ])
+    item_weights = concatenate([
+        (large_base + noise[1, :n_large]).astype(int), noise[1, n_large:]
+        ])
+
+    ### Non-triviality conditions
+    if npmax(item_weights) > max_capacity:
+        raise ValueError("Non-triviality condition on individual weight violated")
+    if item_weights.sum() <= max_capacity:
+        raise ValueError("Non-triviality condition on total weight violated")
+    return item_profits, item_weights
+
+
+## Knapsack Problem: instance families
+def hard_instance_specs(n_items,
+                        classes=(2, 4, 6, 8),
+                        smalls=(4, 6, 12, 20, 40, 50),
+                        capacities=(8, 16, 32, 64, 128, 256),
+                        fraction=0.1,
+                        epsilon=1e-5):
+
+    """
+    Parameters of a family of hard KP instances
+    ============================================
+
+    One instance per number of classes and per (small, capacity)
+    pair, numbered from 1 as in `benchmarking.ipynb`.
+
+    **Outputs**
+
+        specs : list of dict
+            Keyword arguments of `kp_instance_arrays`
+            plus the 'instance_id' suffix.
+    """
+
+    specs = []
+    for n_classes in classes:
+        for small, max_capacity in zip(smalls, capacities):
+            specs.append({
+                "n_items": n_items,
+                "max_capacity": max_capacity,
+                "classes": n_classes,
+                "fraction": fraction,
+                "epsilon": epsilon,
+                "small": small,
+                "instance_id": f"_{len(specs) + 1}",
+                })
+    return specs
+
+
+def kp_instance_family(specs, seed=None):
+
+    """
+    Streaming a family of independent KP instances
+    ===============================================
+
+    **Arguments**
+
+        specs : list of dict
+            One dict of `kp_instance_arrays` keyword
+            arguments per instance; an 'instance_id'
+            key is allowed and ignored.
+        seed : int or None
+            Root seed. Instance i always draws from the
+            i-th child of `SeedSequence(seed)`, regardless
+            of how the family is consumed.
+
+    **Outputs**
+
+        Iterator over (spec, item_profits, item_weights, max_capacity).
+    """
+
+    for spec, child_seed in zip(specs, SeedSequence(seed).spawn(len(specs))):
+        item_profits, item_weights = _draw(spec, child_seed)
+        yield spec, item_profits, item_weights, spec["max_capacity"]
+
+
+def kp_qubo_family(specs, seed=None, penalty_factor=1.1, structured=False):
+
+    """
+    Streaming the QUBO matrices of a family of KP instances
+    ========================================================
+
+    **Arguments**
+
+        specs, seed
+            See `kp_instance_family`.
+        penalty_factor : float
+            The penalty constant of each instance is
+            `penalty_factor` times its largest profit.
+            Default to 1.1.
+        structured : bool
+            If True, yield `KnapsackQubo` objects
+            instead of dense matrices. Default to False.
+
+    **Outputs**
+
+        Iterator over (spec, qubo).
+    """
+
+    builder = KnapsackQubo if structured else kp_qubo_vectorized
+    for spec, item_profits, item_weights, max_capacity in kp_instance_family(specs, seed):
+        penalty_cte = penalty_factor * npmax(item_profits)
+        yield spec, builder(item_profits, item_weights, max_capacity, penalty_cte)
+
+
+def _draw(spec, child_seed):
+    arguments = {key: value for key, value in spec.items() if key != "instance_id"}
+    return kp_instance_arrays(**arguments, rng=child_seed)
+
+
+def _write(task):
+    spec, child_seed, output_dir = task
+    item_profits, item_weights = _draw(spec, child_seed)
+    filename = join(
+        output_dir,
+        f"kp_instance_n_{spec['n_items']}_C_{spec['max_capacity']}"
+        + spec.get("instance_id", "")
+        )
+    write_kp_instance(filename, item_profits, item_weights, spec["max_capacity"])
+    return filename
+
+
+def write_kp_family(specs, output_dir, seed=None, n_workers=1):
+
+    """
+    Writing a family of KP instances to disk
+    =========================================
+
+    **Arguments**
+
+        specs, seed
+            See `kp_instance_family`; the files are the
+            same for any number of workers.
+        output_dir : str
+            Output folder, created if needed. Files are
+            named as the ones written by `kp_instance`.
+        n_workers : int
+            Number of processes. Default to 1.
+
+    **Outputs**
+
+        filenames : list of str
+            The written files, in the order of `specs`.
+    """
+
+    makedirs(output_dir, exist_ok=True)
+    tasks = [
+        (spec, child_seed, output_dir)
+        for spec, child_seed in zip(specs, SeedSequence(seed).spawn(len(specs)))
+        ]
+    if n_workers == 1:
+        return list(map(_write, tasks))
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        return list(executor.map(_write, tasks))
+
+
+def main():
+    parser = ArgumentParser(description="Write a family of hard KP instances.")
+    parser.add_argument("--n-items", type=int, required=True)
+    parser.add_argument("--classes", type=int, nargs="+", default=[2, 4, 6, 8])
+    parser.add_argument("--smalls", type=int, nargs="+", default=[4, 6, 12, 20, 40, 50])
+    parser.add_argument("--capacities", type=int, nargs="+",
+                        default=[8, 16, 32, 64, 128, 256])
+    parser.add_argument("--fraction", type=float, default=0.1)
+    parser.add_argument("--epsilon", type=float, default=1e-5)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--output", required=True)
+    args = parser.parse_args()
+
+    specs = hard_instance_specs(
+        args.n_items, args.classes, args.smalls, args.capacities,
+        args.fraction, args.epsilon
+        )
+    filenames = write_kp_family(specs, args.output, args.seed, args.workers)
+    print(f"Written {len(filenames)} instances into {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,339 @@
+##############################################################################
+#                              COPYRIGHT NOTICE                              #
+##############################################################################
+#
+# This code is part of the Tensor Network Hackathon
+# project of the Quantum Padova group.
+# (https://baltig.infn.it/qpd/tensor-network-hackathon)
+#
+# This code is licensed under the Apache License, Version 2.0.
+# You may obtain a copy of this license at
+# http://www.apache.org/licenses/LICENSE-2.0.
+#
+# Any modifications or derivative works of this code must retain this
+# copyright notice, and modified files need to carry a notice indicating
+# that they have been altered from the originals.
+#
+##############################################################################
+##############################################################################
+
+"""
+Binary storage of KP instances and QUBO matrices
+================================================
+
+The text files in `kp_qubo_instances` store the full QUBO matrix with
+`savetxt`, and have to be parsed at every load. The binary container
+defined here stores raw arrays next to a small JSON header:
+
+- 8 bytes of magic string, 8 bytes with the header length;
+- the JSON header with the metadata and, for every array, its dtype,
+  shape and byte offset;
+- the arrays, each aligned to 64 bytes.
+
+Arrays are loaded as read-only `numpy.memmap`, i.e., without parsing
+nor copying. A KP record stores the generating vectors (profits,
+weights) with capacity and penalty constant in the metadata, and/or
+the upper triangle of the QUBO matrix.
+
+Running the module converts the whole `kp_qubo_instances` tree:
+
+.. codeblock::
+
+    python3 kp_storage.py --output kp_qubo_instances_bin
+"""
+
+
+## Modules
+from os import listdir, makedirs
+from os.path import join, isfile, exists
+from json import dumps, loads
+from struct import pack, unpack
+from argparse import ArgumentParser
+from numpy import asarray, ascontiguousarray, dtype as npdtype, empty, memmap
+from numpy import array_equal, loadtxt, max as npmax, triu_indices, zeros
+
+from knapsack import read_kp_instance, kp_qubo_vectorized, KnapsackQubo
+
+
+MAGIC = b"KPBIN\x00\x01\x00"
+ALIGNMENT = 64
+
+
+## Generic binary container
+def _aligned(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def save_container(filename, arrays, metadata=None):
+
+    """
+    Writing arrays and metadata to a binary container
+    ==================================================
+
+    **Arguments**
+
+        filename : str
+            Path of the output file.
+        arrays : dict
+            Numpy arrays by name.
+        metadata : dict or None
+            JSON-serializable metadata.
+    """
+
+    arrays = {name: ascontiguousarray(array) for name, array in arrays.items()}
+
+    ### Layout: the header length depends on the offsets, so the
+    ### offsets are computed relative to the end of the header
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        layout[name] = {
+            "dtype": array.dtype.str,
+            "shape": list(array.shape),
+            "offset": offset
+            }
+        offset = _aligned(offset + array.nbytes)
+    header = dumps({"metadata": metadata or {}, "arrays": layout}).encode()
+    data_start = _aligned(len(MAGIC) + 8 + len(header))
+
+    ### Writing
+    with open(filename, "wb") as out_file:
+        out_file.write(MAGIC)
+        out_file.write(pack("<Q", len(header)))
+        out_file.write(header)
+        for name, array in arrays.items():
+            out_file.seek(data_start + layout[name]["offset"])
+            out_file.write(array.tobytes())
+        out_file.truncate(data_start + offset)
+
+
+def load_container(filename):
+
+    """
+    Reading arrays and metadata from a binary container
+    ====================================================
+
+    **Arguments**
+
+        filename : str
+            Path of a file written by `save_container`.
+
+    **Outputs**
+
+        arrays : dict
+            Read-only `numpy.memmap` arrays by name.
+        metadata : dict
+            The stored metadata.
+    """
+
+    with open(filename, "rb") as in_file:
+        if in_file.read(len(MAGIC)) != MAGIC:
+            raise IOError(f"File {filename} is not a KP binary container.")
+        header_length = unpack("<Q", in_file.read(8))[0]
+        header = loads(in_file.read(header_length).decode())
+    data_start = _aligned(len(MAGIC) + 8 + header_length)
+
+    arrays = {}
+    for name, layout in header["arrays"].items():
+        shape = tuple(layout["shape"])
+        if 0 in shape:
+            arrays[name] = empty(shape, dtype=npdtype(layout["dtype"]))
+            continue
+        arrays[name] = memmap(
+            filename, dtype=npdtype(layout["dtype"]), mode="r",
+            offset=data_start + layout["offset"], shape=shape
+            )
+    return arrays, header["metadata"]
+
+
+## KP records
+def save_kp_binary(filename,
+                   item_profits=None,
+                   item_weights=None,
+                   max_capacity=None,
+                   penalty_cte=None,
+                   qubo_matrix=None,
+                   metadata=None):
+
+    """
+    Writing a KP instance and/or its QUBO matrix in binary form
+    ============================================================
+
+    **Arguments**
+
+        filename : str
+            Path of the output file.
+        item_profits, item_weights : 1D Numpy arrays or None
+            The generating vectors of the instance.
+        max_capacity : int or None
+            The knapsack capacity.
+        penalty_cte : float or None
+            The QUBO penalty constant.
+        qubo_matrix : 2D Numpy array or None
+            If given, its upper triangle (diagonal
+            included) is stored as well.
+        metadata : dict or None
+            Additional JSON-serializable metadata.
+    """
+
+    arrays = {}
+    record = dict(metadata or {})
+    if item_profits is not None:
+        arrays["item_profits"] = asarray(item_profits)
+        arrays["item_weights"] = asarray(item_weights)
+        record["n_items"] = int(arrays["item_profits"].size)
+    if max_capacity is not None:
+        record["max_capacity"] = int(max_capacity)
+    if penalty_cte is not None:
+        record["penalty_cte"] = float(penalty_cte)
+    if qubo_matrix is not None:
+        qubo_matrix = asarray(qubo_matrix)
+        arrays["qubo_triu"] = qubo_matrix[triu_indices(qubo_matrix.shape[0])]
+        record["n_binaries"] = int(qubo_matrix.shape[0])
+    save_container(filename, arrays, record)
+
+
+def load_kp_binary(filename):
+
+    """
+    Reading a KP record written by `save_kp_binary`
+    ================================================
+
+    **Outputs**
+
+        arrays : dict
+            Memory-mapped arrays among 'item_profits',
+            'item_weights' and 'qubo_triu'.
+        metadata : dict
+            The record metadata, e.g., 'max_capacity'
+            and 'penalty_cte'.
+    """
+
+    return load_container(filename)
+
+
+def load_qubo_binary(filename):
+
+    """
+    Dense QUBO matrix of a KP record
+    =================================
+
+    The matrix is expanded from the stored upper triangle if
+    present, otherwise it is rebuilt from the generating
+    vectors with `kp_qubo_vectorized`.
+    """
+
+    arrays, metadata = load_container(filename)
+    if "qubo_triu" in arrays:
+        n_binaries = metadata["n_binaries"]
+        qubo_matrix = zeros((n_binaries, n_binaries), dtype=arrays["qubo_triu"].dtype)
+        qubo_matrix[triu_indices(n_binaries)] = arrays["qubo_triu"]
+        return qubo_matrix
+    return kp_qubo_vectorized(
+        arrays["item_profits"], arrays["item_weights"],
+        metadata["max_capacity"], metadata["penalty_cte"]
+        )
+
+
+def load_structured_qubo(filename):
+
+    """
+    `KnapsackQubo` of a KP record, backed by the memory-mapped vectors.
+    """
+
+    arrays, metadata = load_container(filename)
+    return KnapsackQubo(
+        arrays["item_profits"], arrays["item_weights"],
+        metadata["max_capacity"], metadata["penalty_cte"]
+        )
+
+
+## One-shot converter of the QUBO instances library
+def convert_qubo_library(qubo_root="kp_qubo_instances",
+                         instance_root="kp_instances",
+                         output_root="kp_qubo_instances_bin",
+                         store_triangle=False):
+
+    """
+    Converting the text QUBO library to binary records
+    ===================================================
+
+    **Arguments**
+
+        qubo_root : str
+            Root of the text QUBO matrices, with one
+            subfolder per instance size.
+        instance_root : str
+            Root of the KP instances with the same layout.
+        output_root : str
+            Root of the binary records, created if needed.
+        store_triangle : bool
+            If True, the upper triangle of the QUBO matrix
+            is always stored. Otherwise it is stored only
+            when the matrix cannot be rebuilt bit-identically
+            from the instance with penalty 1.1 * max(profits).
+            Default to False.
+
+    **Outputs**
+
+        converted : list of str
+            The written files.
+    """
+
+    converted = []
+    for size in sorted(listdir(qubo_root)):
+        makedirs(join(output_root, size), exist_ok=True)
+        for name in sorted(listdir(join(qubo_root, size))):
+            qubo_filename = join(qubo_root, size, name)
+            if not isfile(qubo_filename):
+                continue
+            qubo_matrix = loadtxt(qubo_filename, delimiter=";")
+            record = {"source": qubo_filename}
+
+            ### Generating vectors, if the instance is available
+            instance = None
+            instance_filename = join(
+                instance_root, size, name.replace("kp_qubo", "kp_instance")
+                )
+            if exists(instance_filename):
+                item_profits, item_weights, max_capacity = read_kp_instance(
+                    instance_filename
+                    )
+                penalty_cte = 1.1 * npmax(item_profits)
+                instance = (item_profits, item_weights, max_capacity, penalty_cte)
+                rebuilt = kp_qubo_vectorized(*instance)
+                if not array_equal(rebuilt, qubo_matrix):
+                    store_triangle_here = True
+                else:
+                    store_triangle_here = store_triangle
+            else:
+                store_triangle_here = True
+
+            output_filename = join(output_root, size, name + ".kpb")
+            save_kp_binary(
+                output_filename,
+                *(instance or (None, None, None, None)),
+                qubo_matrix=qubo_matrix if store_triangle_here else None,
+                metadata=record
+                )
+            converted.append(output_filename)
+    return converted
+
+
+def main():
+    parser = ArgumentParser(description="Convert the QUBO library to binary records.")
+    parser.add_argument("--qubo-root", default="kp_qubo_instances")
+    parser.add_argument("--instance-root", default="kp_instances")
+    parser.add_argument("--output", default="kp_qubo_instances_bin")
+    parser.add_argument("--store-triangle", action="store_true",
+                        help="Always store the upper triangle of the QUBO matrix.")
+    args = parser.parse_args()
+
+    converted = convert_qubo_library(
+        args.qubo_root, args.instance_root, args.output, args.store_triangle
+        )
+    print(f"Converted {len(converted)} QUBO matrices into {args.output}")
+
+
+if __name__ == "__main__":
+    main()
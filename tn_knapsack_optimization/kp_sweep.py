@@ -0,0 +1,350 @@
+##############################################################################
+#                              COPYRIGHT NOTICE                              #
+##############################################################################
+#
+# This code is part of the Tensor Network Hackathon
+# project of the Quantum Padova group.
+# (https://baltig.infn.it/qpd/tensor-network-hackathon)
+#
+# This code is licensed under the Apache License, Version 2.0.
+# You may obtain a copy of this license at
+# http://www.apache.org/licenses/LICENSE-2.0.
+#
+# Any modifications or derivative works of this code must retain this
+# copyright notice, and modified files need to carry a notice indicating
+# that they have been altered from the originals.
+#
+##############################################################################
+##############################################################################
+
+"""
+Penalty-constant sweep of the KP pipeline
+=========================================
+
+Runs every (instance, penalty factor, solver) combination over the
+instances of the `kp_qubo_instances` tree, with the penalty constant
+`penalty_factor * max(profits)` as in `benchmarking.ipynb`. The QUBO
+matrices are rebuilt for each penalty from the matching files of
+`kp_instances`, through the shared `KnapsackCache`, as is the exact
+optimum used as reference.
+
+For every run the sweep records the wall time of the solver and,
+with `--trace-memory`, its peak memory, traced by `tracemalloc` in a
+second, separate call so that the tracing overhead does not enter the
+timing (-1 when not traced), the best feasible profit,
+the optimality gap and the fraction of feasible returned states.
+Each finished run is appended to a journal, so that an interrupted
+sweep resumes where it stopped, and the journal is converted to a
+columnar binary container (see `kp_storage`) at the end:
+
+.. codeblock::
+
+    python3 kp_sweep.py --sizes small --penalty-factors 0.5 1.1 2 5 \\
+        --solvers brute_force exact --workers 4 --output sweep_small
+"""
+
+
+## Modules
+from os import listdir, makedirs
+from os.path import join, isfile, exists
+from json import dumps, loads
+from time import perf_counter
+from tracemalloc import start as start_tracing, stop as stop_tracing
+from tracemalloc import get_traced_memory
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from numpy import array, float64, int64, nan
+
+from knapsack import read_kp_instance, evaluate_bitstrings
+from kp_exact import solve_kp
+from kp_brute_force import qubo_brute_force
+from kp_cache import KnapsackCache
+from kp_storage import save_container
+
+
+COLUMNS = {
+    "instance": str,
+    "penalty_factor": float64,
+    "solver": str,
+    "n_items": int64,
+    "n_binaries": int64,
+    "status": str,
+    "wall_time": float64,
+    "peak_memory": int64,
+    "best_profit": float64,
+    "optimum": float64,
+    "optimality_gap": float64,
+    "feasibility_rate": float64,
+    }
+
+
+## Solvers
+def brute_force_solver(qubo_matrix, item_profits, item_weights, max_capacity,
+                       n_lowest=8, max_binaries=24):
+
+    """
+    The `n_lowest` lowest-cost states of `qubo_brute_force`.
+    """
+
+    if qubo_matrix.shape[0] > max_binaries:
+        return None
+    _, states = qubo_brute_force(qubo_matrix, n_lowest=n_lowest)
+    return states[:, :item_profits.size]
+
+
+def exact_solver(qubo_matrix, item_profits, item_weights, max_capacity):
+
+    """
+    The optimum of `kp_exact.solve_kp`, which ignores the penalty.
+    """
+
+    _, best_bitstring = solve_kp(item_profits, item_weights, max_capacity)
+    return best_bitstring[None, :]
+
+
+SOLVERS = {
+    "brute_force": brute_force_solver,
+    "exact": exact_solver,
+    }
+
+
+## Instances
+def find_instances(qubo_root="kp_qubo_instances",
+                   instance_root="kp_instances",
+                   sizes=None):
+
+    """
+    Instance files matching the QUBO library
+    =========================================
+
+    **Arguments**
+
+        qubo_root, instance_root : str
+            Roots of the QUBO library and of the instances,
+            with one subfolder per size.
+        sizes : list of str or None
+            Subfolders to include, e.g., ["small"].
+            Default to None, i.e., all of them.
+
+    **Outputs**
+
+        instances : list of (str, str)
+            Instance name, as 'size/name', and file path.
+    """
+
+    instances = []
+    for size in sorted(listdir(qubo_root)):
+        if sizes is not None and size not in sizes:
+            continue
+        for name in sorted(listdir(join(qubo_root, size))):
+            instance_name = name.replace("kp_qubo", "kp_instance")
+            filename = join(instance_root, size, instance_name)
+            if isfile(join(qubo_root, size, name)) and exists(filename):
+                instances.append((f"{size}/{instance_name}", filename))
+    return instances
+
+
+## Single run
+def run_task(task):
+
+    """
+    Solving one (instance, penalty factor, solver) combination
+    ===========================================================
+
+    **Arguments**
+
+        task : tuple
+            (instance name, instance file, penalty factor,
+            solver name, cache folder, trace memory).
+            With trace memory True, the solver is run a
+            second time under `tracemalloc` for the peak
+            memory, else the peak memory is -1.
+
+    **Outputs**
+
+        row : dict
+            One value per entry of `COLUMNS`.
+    """
+
+    instance, filename, penalty_factor, solver, cache_dir, trace_memory = task
+    cache = KnapsackCache(cache_dir)
+    item_profits, item_weights, max_capacity = read_kp_instance(filename)
+    optimum, _ = cache.optimum(item_profits, item_weights, max_capacity)
+    qubo_matrix = cache.qubo(
+        item_profits, item_weights, max_capacity,
+        penalty_factor * item_profits.max()
+        )
+    row = {
+        "instance": instance,
+        "penalty_factor": penalty_factor,
+        "solver": solver,
+        "n_items": int(item_profits.size),
+        "n_binaries": int(qubo_matrix.shape[0]),
+        "optimum": float(optimum),
+        }
+
+    ### Timing the solver, without tracing
+    solver_args = (qubo_matrix, item_profits, item_weights, max_capacity)
+    st_time = perf_counter()
+    try:
+        bitstrings = SOLVERS[solver](*solver_args)
+        status = "skipped" if bitstrings is None else "ok"
+    except Exception as error:
+        bitstrings, status = None, f"error: {type(error).__name__}"
+    row["wall_time"] = perf_counter() - st_time
+    row["status"] = status
+
+    ### Memory peak of a second, traced run, -1 if missing
+    row["peak_memory"] = -1
+    if trace_memory and status == "ok":
+        start_tracing()
+        try:
+            SOLVERS[solver](*solver_args)
+            row["peak_memory"] = get_traced_memory()[1]
+        except Exception:
+            pass
+        finally:
+            stop_tracing()
+
+    ### Quality of the returned states
+    row["best_profit"] = row["optimality_gap"] = row["feasibility_rate"] = nan
+    if bitstrings is not None:
+        profits, _, feasible = evaluate_bitstrings(
+            item_profits, item_weights, max_capacity, bitstrings
+            )
+        row["feasibility_rate"] = float(feasible.mean())
+        if feasible.any():
+            row["best_profit"] = float(profits[feasible].max())
+            # Optimum 0: no item fits, and the gap is 0
+            row["optimality_gap"] = (
+                (optimum - row["best_profit"]) / optimum if optimum > 0 else 0.0
+                )
+    return row
+
+
+## Journal and columnar results
+def read_journal(filename):
+
+    """
+    Rows of the finished runs, one JSON object per line.
+    """
+
+    if not exists(filename):
+        return []
+    rows = []
+    with open(filename, "r") as in_file:
+        for line in in_file:
+            try:
+                rows.append(loads(line))
+            except ValueError:
+                break  # line truncated by an interruption
+    return rows
+
+
+def save_results(filename, rows):
+
+    """
+    Writing the rows as one array per column.
+    """
+
+    columns = {
+        name: array([row[name] for row in rows], dtype=column_type)
+        for name, column_type in COLUMNS.items()
+        }
+    save_container(filename, columns, {"n_rows": len(rows)})
+
+
+def run_sweep(instances, penalty_factors, solvers, output_dir,
+              n_workers=1, cache_dir="kp_cache", trace_memory=False):
+
+    """
+    Running and resuming a penalty sweep
+    =====================================
+
+    **Arguments**
+
+        instances : list of (str, str)
+            As returned by `find_instances`.
+        penalty_factors : list of float
+            Penalty constants in units of the
+            largest profit of each instance.
+        solvers : list of str
+            Keys of `SOLVERS`.
+        output_dir : str
+            Folder of 'journal.jsonl' and 'results.kpb'.
+        n_workers : int
+            Number of processes. Default to 1.
+        cache_dir : str
+            Folder of the shared `KnapsackCache`.
+        trace_memory : bool
+            If True, trace the peak memory of each run
+            in a second call of the solver. Default to False.
+
+    **Outputs**
+
+        rows : list of dict
+            All the rows, resumed ones included.
+    """
+
+    makedirs(output_dir, exist_ok=True)
+    journal = join(output_dir, "journal.jsonl")
+    rows = read_journal(journal)
+    done = {(row["instance"], row["penalty_factor"], row["solver"]) for row in rows}
+    tasks = [
+        (instance, filename, float(penalty_factor), solver, cache_dir, trace_memory)
+        for instance, filename in instances
+        for penalty_factor in penalty_factors
+        for solver in solvers
+        if (instance, float(penalty_factor), solver) not in done
+        ]
+    print(f"{len(done)} runs resumed, {len(tasks)} to go")
+
+    ### Rewriting the journal drops a truncated last line, if any
+    with open(journal, "w") as out_file:
+        for row in rows:
+            print(dumps(row), file=out_file)
+
+    with open(journal, "a") as out_file:
+        def record(row):
+            rows.append(row)
+            print(dumps(row), file=out_file, flush=True)
+            print(f"{row['instance']:<36} {row['penalty_factor']:>6} "
+                  f"{row['solver']:<12} {row['status']:<8} {row['wall_time']:>10.4f}")
+
+        if n_workers == 1:
+            for task in tasks:
+                record(run_task(task))
+        else:
+            with ProcessPoolExecutor(max_workers=n_workers) as executor:
+                futures = [executor.submit(run_task, task) for task in tasks]
+                for future in as_completed(futures):
+                    record(future.result())
+
+    save_results(join(output_dir, "results.kpb"), rows)
+    return rows
+
+
+def main():
+    parser = ArgumentParser(description="Penalty-constant sweep of the KP pipeline.")
+    parser.add_argument("--qubo-root", default="kp_qubo_instances")
+    parser.add_argument("--instance-root", default="kp_instances")
+    parser.add_argument("--sizes", nargs="+", default=None)
+    parser.add_argument("--penalty-factors", type=float, nargs="+",
+                        default=[0.5, 1.1, 2.0, 5.0])
+    parser.add_argument("--solvers", nargs="+", default=["brute_force", "exact"],
+                        choices=list(SOLVERS))
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--cache", default="kp_cache")
+    parser.add_argument("--output", default="kp_sweep")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="Trace the peak memory in a second call of each solver.")
+    args = parser.parse_args()
+
+    instances = find_instances(args.qubo_root, args.instance_root, args.sizes)
+    rows = run_sweep(instances, args.penalty_factors, args.solvers,
+                     args.output, args.workers, args.cache, args.trace_memory)
+    print(f"{len(rows)} runs stored in {join(args.output, 'results.kpb')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+##############################################################################
+#                              COPYRIGHT NOTICE                              #
+##############################################################################
+#
+# This code is part of the Tensor Network Hackathon
+# project of the Quantum Padova group.
+# (https://baltig.infn.it/qpd/tensor-network-hackathon)
+#
+# This code is licensed under the Apache License, Version 2.0.
+# You may obtain a copy of this license at
+# http://www.apache.org/licenses/LICENSE-2.0.
+#
+# Any modifications or derivative works of this code must retain this
+# copyright notice, and modified files need to carry a notice indicating
+# that they have been altered from the originals.
+#
+##############################################################################
+##############################################################################
+
+"""
+Property-based tests of the KP spinglass model
+==============================================
+
+On random KP instances, including the edge cases of a unit capacity
+and of a single item, the closed-form `spinglass_model` must agree with
+the route through the QUBO matrix, `kp_qubo` + `qubo_to_ising_couplings`:
+offset, magnetic fields, couplings (also in the `rank_one` form) and the
+energy of random spin configurations.
+
+.. codeblock::
+
+    python3 -m pytest test_knapsack.py
+"""
+
+
+## Modules
+import pytest
+from numpy import allclose, arange, einsum, triu
+from numpy.random import default_rng
+
+from knapsack import kp_qubo, qubo_to_ising_couplings, spinglass_model
+
+
+N_RANDOM_INSTANCES = 100
+
+
+## Instances
+def random_instance(seed):
+
+    """
+    Random KP instance and penalty constant
+    ========================================
+
+    **Arguments**
+
+        seed : int
+            Seed of the instance. Seeds 0 and 1 give
+            the edge cases of a unit capacity and of
+            a single item.
+
+    **Outputs**
+
+        instance : tuple
+            (item_profits, item_weights,
+            max_capacity, penalty_cte).
+    """
+
+    rng = default_rng(seed)
+    n_items = 1 if seed == 1 else int(rng.integers(1, 9))
+    item_profits = rng.integers(1, 30, n_items)
+    item_weights = rng.integers(1, 30, n_items)
+    if seed == 0:
+        max_capacity = 1
+    else:
+        max_capacity = int(rng.integers(1, max(2, item_weights.sum())))
+    penalty_cte = float(rng.uniform(0.1, 3)) * item_profits.max()
+    return item_profits, item_weights, max_capacity, penalty_cte
+
+
+def spin_energies(couplings_dict, spins):
+
+    """
+    Energies of a stack of spin configurations
+    ===========================================
+
+    offset + sum_j h_j z_j + sum_{j<k} J_jk z_j z_k, with
+    the couplings given either as a dense upper-triangular
+    matrix or as the rank-one vector g, J_jk = g_j g_k.
+    """
+
+    two_qubit = couplings_dict['two-qubit']
+    if two_qubit.ndim == 1:
+        two_qubit = triu(einsum("j,k->jk", two_qubit, two_qubit), k=1)
+    return (
+        couplings_dict['offset']
+        + spins @ couplings_dict['one-qubit']
+        + einsum("cj,jk,ck->c", spins, two_qubit, spins)
+        )
+
+
+## Tests
+@pytest.mark.parametrize("seed", range(N_RANDOM_INSTANCES))
+def test_spinglass_model_matches_qubo_route(seed):
+
+    instance = random_instance(seed)
+    direct = spinglass_model(*instance)
+    from_qubo = qubo_to_ising_couplings(kp_qubo(*instance))
+
+    assert allclose(direct['offset'], from_qubo['offset'])
+    assert allclose(direct['one-qubit'], from_qubo['one-qubit'])
+    assert allclose(direct['two-qubit'], from_qubo['two-qubit'])
+
+
+@pytest.mark.parametrize("seed", range(N_RANDOM_INSTANCES))
+def test_rank_one_couplings(seed):
+
+    instance = random_instance(seed)
+    dense = spinglass_model(*instance)
+    factorized = spinglass_model(*instance, rank_one=True)
+    vector = factorized['two-qubit']
+
+    assert vector.ndim == 1
+    assert allclose(factorized['offset'], dense['offset'])
+    assert allclose(factorized['one-qubit'], dense['one-qubit'])
+    assert allclose(triu(einsum("j,k->jk", vector, vector), k=1), dense['two-qubit'])
+
+
+@pytest.mark.parametrize("seed", range(N_RANDOM_INSTANCES))
+def test_spin_energies_match_qubo_cost(seed):
+
+    instance = random_instance(seed)
+    qubo_matrix = kp_qubo(*instance)
+    n_binaries = qubo_matrix.shape[0]
+    rng = default_rng(seed + N_RANDOM_INSTANCES)
+    binaries = rng.integers(0, 2, (64, n_binaries))
+    if n_binaries <= 10:
+        # All the configurations
+        binaries = (arange(2**n_binaries)[:, None] >> arange(n_binaries)) & 1
+    spins = 2.0 * binaries - 1
+    qubo_cost = einsum("cj,jk,ck->c", binaries, qubo_matrix, binaries)
+
+    for couplings_dict in (
+            spinglass_model(*instance),
+            spinglass_model(*instance, rank_one=True),
+            qubo_to_ising_couplings(qubo_matrix),
+            ):
+        assert allclose(spin_energies(couplings_dict, spins), qubo_cost)
@@ -0,0 +1,258 @@
+r"""
+Memory-mapped feature map of the MNIST dataset
+==============================================
+
+Product-state feature map of the MPS1 encoding, where each pixel of
+intensity p in [0, 1] is mapped to the qubit
+
+.. math::
+
+    |q\rangle = \sqrt{1-p}|0\rangle + p|1\rangle .
+
+Instead of building a python list with one `MPS` for each image, the
+local states of the whole dataset are written, chunk by chunk, in a
+single contiguous float32 array of shape (n_samples, n_sites, 2), stored
+as a `.npy` file and memory-mapped. The images can be coarse-grained
+before the encoding, e.g. averaging blocks of 2x2 pixels gives 14x14 = 196
+sites instead of 784.
+
+The `FeatureMapStore` behaves as the list of MPS expected by
+`MPS.ml_optimize_mps` and `MPS.ml_predict`: the MPS of a sample is built
+only when it is accessed, and its tensors are views of shape (1, 2, 1) of
+the memory-mapped array, without any copy.
+
+.. codeblock::
+
+    encode_dataset(X_train, "features/train.npy", pool=2)
+    X_train_mps = FeatureMapStore("features/train.npy")
+    tn_classifier = MPS(X_train_mps.num_sites, conv_params, dtype=float)
+    tn_classifier.ml_optimize_mps(X_train_mps, y_train, batch_size, learning_rate, num_sweeps)
+
+"""
+
+import os
+import argparse
+
+import numpy as np
+from qtealeaves.emulator.mps_simulator import MPS
+from qtealeaves.tensors import TensorBackend
+
+__all__ = ["pool_images", "feature_map", "encode_dataset", "FeatureMapStore"]
+
+
+def pool_images(images, pool=1):
+    """
+    Coarse-grain a batch of images averaging blocks of pool x pool pixels.
+
+    Parameters
+    ----------
+    images : np.ndarray
+        Images of shape (n_samples, height, width)
+    pool : int, optional
+        Size of the blocks, dividing height and width. Default to 1, i.e.
+        no pooling.
+
+    Returns
+    -------
+    np.ndarray
+        Pooled images of shape (n_samples, height/pool, width/pool)
+    """
+    if pool == 1:
+        return images
+    num, height, width = images.shape
+    if height % pool or width % pool:
+        raise ValueError(f"The pooling {pool} must divide the image size {height}x{width}.")
+    blocks = images.reshape(num, height // pool, pool, width // pool, pool)
+    return blocks.mean(axis=(2, 4))
+
+
+def feature_map(pixels, out=None):
+    """
+    Local states sqrt(1-p)|0> + p|1> of the pixels.
+
+    Parameters
+    ----------
+    pixels : np.ndarray
+        Intensities in [0, 1], any shape
+    out : np.ndarray | None, optional
+        Array of shape pixels.shape + (2,) where the states are written.
+        Default to None, i.e. a new float32 array.
+
+    Returns
+    -------
+    np.ndarray
+        Local states, shape pixels.shape + (2,)
+    """
+    if out is None:
+        out = np.empty(pixels.shape + (2,), dtype=np.float32)
+    pixels = np.clip(pixels, 0, 1)
+    out[..., 0] = np.sqrt(1 - pixels)
+    out[..., 1] = pixels
+    return out
+
+
+def encode_dataset(images, filename, pool=1, scale=255.0, chunk_size=4096):
+    """
+    Write the feature map of a dataset of images in a memory-mapped `.npy`
+    file, one chunk of images at a time.
+
+    Parameters
+    ----------
+    images : np.ndarray
+        Images of shape (n_samples, height, width), e.g. the uint8 MNIST
+        digits. It can itself be memory-mapped.
+    filename : str
+        Path of the `.npy` file of shape (n_samples, n_sites, 2), float32
+    pool : int, optional
+        Size of the blocks of pixels averaged before the encoding, see
+        `pool_images`. Default to 1.
+    scale : float, optional
+        The intensities are the pixels divided by scale. Default to 255.
+    chunk_size : int, optional
+        Number of images encoded at once. Default to 4096.
+
+    Returns
+    -------
+    np.memmap
+        The feature map, opened in read-only mode
+    """
+    num, height, width = images.shape
+    num_sites = (height // pool) * (width // pool)
+    folder = os.path.dirname(filename)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+
+    features = np.lib.format.open_memmap(
+        filename, mode="w+", dtype=np.float32, shape=(num, num_sites, 2)
+    )
+    for start in range(0, num, chunk_size):
+        chunk = np.asarray(images[start : start + chunk_size], dtype=np.float32) / scale
+        chunk = pool_images(chunk, pool).reshape(chunk.shape[0], num_sites)
+        feature_map(chunk, out=features[start : start + chunk.shape[0]])
+    features.flush()
+    del features
+
+    return np.load(filename, mmap_mode="r")
+
+
+class FeatureMapStore:
+    """
+    Dataset of product-state MPS backed by a memory-mapped feature map.
+
+    Indexing with an integer gives the `MPS` of a sample, indexing with a
+    slice or an array of indexes gives the list of their `MPS`. The tensors
+    of the MPS are views of the memory-mapped array.
+
+    Parameters
+    ----------
+    features : str | np.ndarray
+        Path of the `.npy` file written by `encode_dataset`, or the array
+        of shape (n_samples, n_sites, 2) itself
+    conv_params : TNConvergenceParameters | None, optional
+        Convergence parameters of the MPS of the samples. Default to None.
+    """
+
+    def __init__(self, features, conv_params=None):
+        if isinstance(features, str):
+            features = np.load(features, mmap_mode="r")
+        if features.ndim != 3 or features.shape[2] != 2:
+            raise ValueError(f"The features must have shape (n_samples, n_sites, 2), not {features.shape}.")
+        self.features = features
+        self.conv_params = conv_params
+        # Same data type as the features, so that the tensors are not converted
+        self.tensor_backend = TensorBackend(device="cpu", dtype=features.dtype.type)
+
+    def __len__(self):
+        return self.features.shape[0]
+
+    @property
+    def num_sites(self):
+        """Number of sites of the MPS"""
+        return self.features.shape[1]
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self.sample_mps(ii) for ii in range(*idx.indices(len(self)))]
+        if np.ndim(idx) > 0:
+            return [self.sample_mps(ii) for ii in np.asarray(idx)]
+        return self.sample_mps(idx)
+
+    def __iter__(self):
+        for ii in range(len(self)):
+            yield self.sample_mps(ii)
+
+    def sample_mps(self, idx):
+        """
+        MPS of a single sample, with tensors of shape (1, 2, 1) that are
+        views of the feature map.
+
+        Parameters
+        ----------
+        idx : int
+            Index of the sample
+
+        Returns
+        -------
+        MPS
+            The product state of the sample
+        """
+        states = self.features[idx]
+        tensors = [states[ii].reshape(1, 2, 1) for ii in range(states.shape[0])]
+        return MPS.from_tensor_list(tensors, conv_params=self.conv_params, tensor_backend=self.tensor_backend)
+
+    def batches(self, batch_size, labels=None, shuffle=False, seed=None):
+        """
+        Iterate over the dataset in contiguous batches.
+
+        Parameters
+        ----------
+        batch_size : int
+            Number of samples of each batch
+        labels : np.ndarray | None, optional
+            Labels of the samples, sliced together with the batches.
+            Default to None.
+        shuffle : bool, optional
+            If True, the batches are visited in random order. The samples
+            of a batch stay contiguous, to keep the views. Default to False.
+        seed : int | None, optional
+            Seed of the shuffling. Default to None.
+
+        Yields
+        ------
+        FeatureMapStore
+            The batch, a view of the feature map
+        np.ndarray
+            Labels of the batch, only if `labels` is given
+        """
+        starts = np.arange(0, len(self), batch_size)
+        if shuffle:
+            np.random.default_rng(seed).shuffle(starts)
+        for start in starts:
+            batch = FeatureMapStore(self.features[start : start + batch_size], self.conv_params)
+            if labels is None:
+                yield batch
+            else:
+                yield batch, labels[start : start + batch_size]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Encode the MNIST digits with the MPS1 feature map.")
+    parser.add_argument("mnist", help="npz file with x_train, y_train, x_test, y_test, as keras' mnist.npz")
+    parser.add_argument("--digits", type=int, nargs="+", default=[3, 8])
+    parser.add_argument("--pool", type=int, default=1)
+    parser.add_argument("--output", default="features")
+    args = parser.parse_args()
+
+    data = np.load(args.mnist)
+    for split in ("train", "test"):
+        images, labels = data[f"x_{split}"], data[f"y_{split}"]
+        selected = np.isin(labels, args.digits)
+        filename = os.path.join(args.output, f"{split}.npy")
+        features = encode_dataset(images[selected], filename, args.pool)
+        # Binary labels, 1 for the last digit
+        np.save(os.path.join(args.output, f"{split}_labels.npy"), (labels[selected] == args.digits[-1]).astype(int))
+        print(f"{split}: {features.shape[0]} samples, {features.shape[1]} sites, written to {filename}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+r"""
+Brickwork circuits for the parallel MPS benchmarks
+==================================================
+
+Fast construction of the circuit of `mpi_example.py`: a layer of Hadamard
+followed by `num_layers` layers of random Rz rotations, CNOTs on even
+qubits and CNOTs on odd qubits.
+
+Instead of drawing one angle and adding one gate at a time, all the
+angles are drawn with a single vectorized call, and each layer is
+appended from gate templates: the CNOT and Hadamard gates are shared
+instances, and the instructions skip the argument checks of
+`QuantumCircuit.rz` and `QuantumCircuit.cx`. The angles are drawn from a
+`RandomState` in the same order as `apply_layer`, so the circuit is the
+same as the one of `mpi_example.py` for the same seed.
+
+The circuits are cached on disk in qiskit's binary QPY format, keyed
+by (qubits, layers, seed), so repeated benchmark runs load them instead
+of building them again.
+"""
+
+import os
+
+import numpy as np
+from qiskit import QuantumCircuit, qpy
+from qiskit.circuit import CircuitInstruction
+from qiskit.circuit.library import CXGate, HGate, RZGate
+
+__all__ = ["brickwork_angles", "brickwork_circuit", "cached_brickwork_circuit"]
+
+
+def brickwork_angles(num_qubits, num_layers, seed=None):
+    """
+    Draw all the Rz angles of the circuit at once.
+
+    Parameters
+    ----------
+    num_qubits : int
+        Number of qubits
+    num_layers : int
+        Number of layers
+    seed : int | List[int] | None, optional
+        Seed of the `RandomState`. Default to None.
+
+    Returns
+    -------
+    np.ndarray
+        Angles in [0, 2pi), shape (num_layers, num_qubits)
+    """
+    return np.random.RandomState(seed).uniform(0, 2 * np.pi, (num_layers, num_qubits))
+
+
+def brickwork_circuit(num_qubits, num_layers, seed=None, angles=None):
+    """
+    Build the brickwork circuit of `mpi_example.py`.
+
+    Parameters
+    ----------
+    num_qubits : int
+        Number of qubits
+    num_layers : int
+        Number of layers
+    seed : int | List[int] | None, optional
+        Seed of the angles. Default to None.
+    angles : np.ndarray | None, optional
+        Rz angles of shape (num_layers, num_qubits). If None, they are
+        drawn with `brickwork_angles`. Default to None.
+
+    Returns
+    -------
+    QuantumCircuit
+        The brickwork circuit
+    """
+    if angles is None:
+        angles = brickwork_angles(num_qubits, num_layers, seed)
+    qc = QuantumCircuit(num_qubits)
+    qubits = qc.qubits
+
+    # Gate templates, shared by all the instructions
+    hadamard = HGate()
+    cnot = CXGate()
+    cnot_pairs = [(qubits[ii], qubits[ii + 1]) for ii in range(0, num_qubits - 1, 2)]
+    cnot_pairs += [(qubits[ii], qubits[ii + 1]) for ii in range(1, num_qubits - 1, 2)]
+    cnot_layer = [CircuitInstruction(cnot, pair, ()) for pair in cnot_pairs]
+
+    for qubit in qubits:
+        qc._append(CircuitInstruction(hadamard, (qubit,), ()))
+    for layer in angles.tolist():
+        for qubit, angle in zip(qubits, layer):
+            qc._append(CircuitInstruction(RZGate(angle), (qubit,), ()))
+        for instruction in cnot_layer:
+            qc._append(instruction)
+    return qc
+
+
+def cached_brickwork_circuit(num_qubits, num_layers, seed, cache_dir="brickwork_cache"):
+    """
+    Load the brickwork circuit from the disk cache, building and storing
+    it if it is not there yet.
+
+    Parameters
+    ----------
+    num_qubits : int
+        Number of qubits
+    num_layers : int
+        Number of layers
+    seed : int | List[int]
+        Seed of the angles
+    cache_dir : str, optional
+        Folder of the cached circuits. Default to "brickwork_cache".
+
+    Returns
+    -------
+    QuantumCircuit
+        The brickwork circuit
+    """
+    seed_str = "-".join(str(ss) for ss in np.atleast_1d(seed))
+    filename = os.path.join(cache_dir, f"brickwork_q{num_qubits}_l{num_layers}_s{seed_str}.qpy")
+    if os.path.exists(filename):
+        with open(filename, "rb") as fh:
+            return qpy.load(fh)[0]
+
+    qc = brickwork_circuit(num_qubits, num_layers, seed)
+    os.makedirs(cache_dir, exist_ok=True)
+    # Write to a temporary file first, for concurrent benchmark runs
+    temporary = filename + f".{os.getpid()}"
+    with open(temporary, "wb") as fh:
+        qpy.dump(qc, fh)
+    os.replace(temporary, filename)
+    return qc
@@ -0,0 +1,300 @@
+r"""
+Distributed MPS overlaps without gathering the state
+====================================================
+
+After a parallel ("CT") simulation the MPS is split between the MPI
+processes. Instead of gathering all the tensors on rank 0, writing the
+states to file and reloading them, the overlap of two distributed MPS
+is contracted in place: every rank contracts the tensors of its own
+sites, and only the boundary environments, matrices of shape
+(bond dimension, bond dimension), are exchanged with point-to-point
+`Send`/`Recv`. The left environments travel from rank 0 towards the
+middle of the chain, the right environments from the last rank towards
+the middle, and the rank in the middle closes the contraction.
+
+The circuits are run through `QCEmulator` directly, so the distributed
+state is kept in memory as it is at the end of the circuit. The serial
+reference state is computed in memory by rank 0 alone, while the other
+ranks wait idle, and each rank receives only the tensors of its own sites
+with point-to-point communications, without any file.
+"""
+
+from time import perf_counter, sleep
+
+import numpy as np
+from qmatchatea.preprocessing import preprocess
+from qmatchatea.py_emulator import QCEmulator
+from qmatchatea.utils import QCBackend, MPISettings, to_layered_circ
+from qtealeaves.tensors import TensorBackend
+
+__all__ = [
+    "run_distributed_circuit",
+    "local_tensors",
+    "distributed_overlap",
+    "distributed_fidelity",
+    "serial_reference",
+]
+
+# Precisions of the QCBackend
+PRECISIONS = {"Z": np.complex128, "C": np.complex64, "D": np.float64, "S": np.float32}
+
+
+def run_distributed_circuit(qc, conv_params, mpi_settings, where_barriers=3, precision="Z"):
+    """
+    Run a circuit with the python backend and return the emulator, whose MPS
+    is still distributed between the processes for a parallel approach.
+
+    Parameters
+    ----------
+    qc : QuantumCircuit
+        Circuit to simulate
+    conv_params : QCConvergenceParameters
+        Convergence parameters of the simulation
+    mpi_settings : MPISettings
+        MPI settings. With "SR", every process simulates the whole circuit.
+    where_barriers : int, optional
+        Reisometrization every `where_barriers` layers. Default to 3.
+    precision : str, optional
+        Precision of the simulation. Default to "Z".
+
+    Returns
+    -------
+    QCEmulator
+        The emulator at the end of the circuit
+    List[float]
+        Singular values cut on this process
+    float
+        Time of the simulation on this process, in seconds
+    """
+    backend = QCBackend(backend="PY", precision=precision, device="cpu", mpi_settings=mpi_settings)
+    if backend.mpi_approach != "SR":
+        if where_barriers <= 0:
+            raise ValueError("A parallel simulation needs where_barriers > 0")
+        # Same switch of ansatz as in qmatchatea.run_simulation
+        backend._ansatz = "MPIMPS"
+
+    preprocessed = preprocess(qc)
+    if where_barriers > 0:
+        preprocessed = to_layered_circ(preprocessed, where_barriers=where_barriers)
+
+    tensor_backend = TensorBackend(device="cpu", dtype=PRECISIONS[precision])
+    simulator = QCEmulator(
+        preprocessed.num_qubits,
+        conv_params,
+        tensor_backend=tensor_backend,
+        qc_backend=backend,
+    )
+    start = perf_counter()
+    singvals_cut, _, _ = simulator.run_from_qk(preprocessed)
+    return simulator, singvals_cut, perf_counter() - start
+
+
+def local_tensors(emulator, indexes=None, rank=0):
+    """
+    Tensors of the sites owned by this process, as numpy arrays of shape
+    (left bond, local dimension, right bond).
+
+    Parameters
+    ----------
+    emulator : MPIMPS | MPS
+        The state. A distributed MPIMPS gives its own sites, without the
+        auxiliary copy of the first tensor of the next process.
+    indexes : np.ndarray | None, optional
+        For a serial MPS, first site of each process (as `MPIMPS.indexes`),
+        to keep only the sites of `rank`. Default to None, i.e. all the sites.
+    rank : int, optional
+        Rank selecting the sites of a serial MPS. Default to 0.
+
+    Returns
+    -------
+    List[np.ndarray]
+        Tensors of the local sites
+    """
+    if hasattr(emulator, "par_map"):
+        sites = range(len(emulator.par_map))
+    elif indexes is not None:
+        sites = range(indexes[rank], indexes[rank + 1])
+    else:
+        sites = range(emulator.num_sites)
+
+    tensors = []
+    for ii in sites:
+        elem = emulator[ii].elem
+        tensors.append(np.asarray(elem.get() if hasattr(elem, "get") else elem))
+    return tensors
+
+
+def _contract_left(env, bra, ket):
+    """Left environment through the sites of `bra`, `ket`, conjugating `bra`"""
+    for aa, bb in zip(bra, ket):
+        env = np.einsum("ab,asc,bsd->cd", env, np.conj(aa), bb, optimize=True)
+    return env
+
+
+def _contract_right(env, bra, ket):
+    """Right environment through the sites of `bra`, `ket`, conjugating `bra`"""
+    for aa, bb in zip(bra[::-1], ket[::-1]):
+        env = np.einsum("cd,asc,bsd->ab", env, np.conj(aa), bb, optimize=True)
+    return env
+
+
+def _send_matrix(comm, matrix, dest):
+    """Send a matrix with point-to-point communications, shape first"""
+    comm.Send(np.array(matrix.shape, dtype=np.int64), dest)
+    comm.Send(np.ascontiguousarray(matrix, dtype=np.complex128), dest)
+
+
+def _recv_matrix(comm, source):
+    """Receive a matrix sent by `_send_matrix`"""
+    shape = np.empty(2, dtype=np.int64)
+    comm.Recv(shape, source)
+    matrix = np.empty(shape, dtype=np.complex128)
+    comm.Recv(matrix, source)
+    return matrix
+
+
+def _send_tensors(comm, tensors, dest):
+    """Send a list of tensors of rank 3 with point-to-point communications, shapes first"""
+    comm.Send(np.array([len(tensors)], dtype=np.int64), dest)
+    comm.Send(np.array([tens.shape for tens in tensors], dtype=np.int64).reshape(-1, 3), dest)
+    for tens in tensors:
+        comm.Send(np.ascontiguousarray(tens, dtype=np.complex128), dest)
+
+
+def _recv_tensors(comm, source, poll_interval=0.01):
+    """
+    Receive the tensors sent by `_send_tensors`. The first message is polled,
+    sleeping in between, so that the process does not compete for the cores
+    while it waits.
+    """
+    num_tensors = np.empty(1, dtype=np.int64)
+    request = comm.Irecv(num_tensors, source)
+    while not request.Test():
+        sleep(poll_interval)
+    shapes = np.empty((num_tensors[0], 3), dtype=np.int64)
+    comm.Recv(shapes, source)
+    tensors = []
+    for shape in shapes:
+        tens = np.empty(shape, dtype=np.complex128)
+        comm.Recv(tens, source)
+        tensors.append(tens)
+    return tensors
+
+
+def distributed_overlap(bra, ket, comm, pairs=None):
+    """
+    Overlap <bra|ket> of two MPS distributed with the same sites on each process.
+
+    Parameters
+    ----------
+    bra : List[np.ndarray]
+        Local tensors of the bra, see `local_tensors`
+    ket : List[np.ndarray]
+        Local tensors of the ket
+    comm : MPI.Comm
+        Communicator of the processes, in the order of the chain
+    pairs : List[Tuple[List[np.ndarray], List[np.ndarray]]] | None, optional
+        Several (bra, ket) pairs to contract at the same time, in which
+        case `bra` and `ket` are ignored. Default to None.
+
+    Returns
+    -------
+    complex | List[complex]
+        The overlap on all the processes, or the list of the overlaps of `pairs`
+    """
+    rank, size = comm.Get_rank(), comm.Get_size()
+    single = pairs is None
+    if single:
+        pairs = [(bra, ket)]
+    # Ranks up to `middle` carry left environments, the others right environments
+    middle = (size - 1) // 2
+
+    overlaps = None
+    if rank <= middle:
+        envs = []
+        for bra_t, ket_t in pairs:
+            env = _recv_matrix(comm, rank - 1) if rank > 0 else np.ones((1, 1), dtype=np.complex128)
+            envs.append(_contract_left(env, bra_t, ket_t))
+        if rank < middle:
+            for env in envs:
+                _send_matrix(comm, env, rank + 1)
+        else:
+            rights = [_recv_matrix(comm, rank + 1) if size > 1 else np.ones((1, 1)) for _ in pairs]
+            overlaps = [complex(np.sum(left * right)) for left, right in zip(envs, rights)]
+    else:
+        envs = []
+        for bra_t, ket_t in pairs:
+            env = _recv_matrix(comm, rank + 1) if rank < size - 1 else np.ones((1, 1), dtype=np.complex128)
+            envs.append(_contract_right(env, bra_t, ket_t))
+        for env in envs:
+            _send_matrix(comm, env, rank - 1)
+
+    overlaps = comm.bcast(overlaps, root=middle)
+    return overlaps[0] if single else overlaps
+
+
+def distributed_fidelity(state, reference, comm):
+    """
+    Fidelity |<state|reference>|^2 / (<state|state><reference|reference>)
+    of two distributed MPS, with a single pass over the chain.
+
+    Parameters
+    ----------
+    state : List[np.ndarray]
+        Local tensors of the first state, see `local_tensors`
+    reference : List[np.ndarray]
+        Local tensors of the second state
+    comm : MPI.Comm
+        Communicator of the processes
+
+    Returns
+    -------
+    float
+        The fidelity, on all the processes
+    """
+    overlap, norm_state, norm_ref = distributed_overlap(
+        None, None, comm, pairs=[(state, reference), (state, state), (reference, reference)]
+    )
+    return float(np.abs(overlap) ** 2 / np.real(norm_state * norm_ref))
+
+
+def serial_reference(qc, conv_params, emulator, comm):
+    """
+    Simulate the circuit serially on rank 0 only, and send to each process
+    the tensors of the sites that `emulator` owns on it. The other ranks
+    wait idle, so the serial time is measured without competing processes.
+
+    Parameters
+    ----------
+    qc : QuantumCircuit
+        Circuit to simulate
+    conv_params : QCConvergenceParameters
+        Convergence parameters of the simulation
+    emulator : MPIMPS | MPS
+        Distributed state, defining the sites of each process
+    comm : MPI.Comm
+        Communicator of the processes
+
+    Returns
+    -------
+    List[np.ndarray]
+        Local tensors of the serial state
+    float
+        Time of the serial simulation on rank 0, in seconds, on all the processes
+    """
+    rank, size = comm.Get_rank(), comm.Get_size()
+    indexes = getattr(emulator, "indexes", None)
+
+    runtime = None
+    if rank == 0:
+        simulator, _, runtime = run_distributed_circuit(
+            qc, conv_params, MPISettings(mpi_approach="SR"), where_barriers=-1
+        )
+        for dest in range(1, size):
+            _send_tensors(comm, local_tensors(simulator.emulator, indexes, dest), dest)
+        reference = local_tensors(simulator.emulator, indexes, 0)
+        del simulator
+    else:
+        reference = _recv_tensors(comm, 0)
+
+    return reference, comm.bcast(runtime, root=0)
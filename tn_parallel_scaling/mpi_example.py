@@ -17,8 +17,8 @@ can be executed parallely on multiple processes. This means
 that the MPS state is going to be divided between the different
 processes, and each one of the processes will apply gates to
 its subsystem.
-At the end of the circuit, all the MPS will be gathered on
-the rank 0 process to perform the measurement of the observables.
+At the end of the circuit, the MPS stays divided between the processes,
+and its fidelity with the serial result is contracted in place.
 
 NOTICE: differently from `data_parallelism_mpi_example.py` this example
 is not employing data parallelism: you are really executing a single
@@ -36,12 +36,16 @@ where the ``-n`` parameters indicates the number of processes you use.
 """
 
 import numpy as np
-import matplotlib.pyplot as plt
-import qtealeaves.observables as obs
-from qmatchatea import QCConvergenceParameters, QCBackend, run_simulation
+from qmatchatea import QCConvergenceParameters
 from qmatchatea.utils import MPISettings
-from qiskit import QuantumCircuit
-from qtealeaves.emulator import MPS
+
+from brickwork import brickwork_circuit
+from distributed_overlap import (
+    run_distributed_circuit,
+    local_tensors,
+    serial_reference,
+    distributed_fidelity,
+)
 
 # Try to import mpi4py and exit the program if it is not installed.
 # This procedure is done to allow sphinx-gallery to compile all the
@@ -62,7 +66,8 @@ except ImportError:
 #
 # We repeat `num_layers` times 2)-4). This circuit structure is an optimal
 # structure to parallelize, since all the gates can, in principle, be executed
-# in parallel
+# in parallel. `apply_layer` shows one layer gate by gate, while `main` builds
+# the whole circuit with the vectorized `brickwork_circuit`.
 
 
 def apply_layer(qc):
@@ -95,23 +100,9 @@ def apply_layer(qc):
 def main():
     num_qubits = 16
     num_layers = 30
-    np.random.seed([11, 13, 23, 41])
-    qc = QuantumCircuit(num_qubits)
-
-    # Apply hadamard
-    for ii in range(num_qubits):
-        qc.h(ii)
-    # Apply the layers
-    for _ in range(num_layers):
-        apply_layer(qc)
-
-    ###############################################################################
-    # Define the observables we are interested in. In this case we are interested
-    # in the final statevector, so we save the state, and projective measurements.
-
-    observables = obs.TNObservables()
-    observables += obs.TNObsProjective(128, True)
-    observables += obs.TNState2File("state", "U")
+    # Same circuit as applying hadamard and then `apply_layer` num_layers times,
+    # with all the angles drawn at once (see brickwork.py)
+    qc = brickwork_circuit(num_qubits, num_layers, seed=[11, 13, 23, 41])
 
     ###############################################################################
     # Define the convergence parameters, in particular the maximum bond dimension.
@@ -142,48 +133,37 @@ def main():
     # A list is accessed with periodic boundary condition for the different isometrization
     # steps
     mpi_settings = MPISettings(mpi_approach="CT", isometrization=-1, num_procs=1)
-    backend = QCBackend(
-        backend="PY", precision="Z", device="cpu", mpi_settings=mpi_settings
-    )
 
-    results = run_simulation(
+    ###############################################################################
+    # We run the circuit through the emulator directly, so that at the end the
+    # MPS is still divided among the processes: it is never gathered on rank 0
+    # nor written to file.
+    simulator, _, parallel_time = run_distributed_circuit(
         qc,
-        convergence_parameters=conv_params,
-        observables=observables,
-        backend=backend,
+        conv_params,
+        mpi_settings,
         where_barriers=3,  # we apply a reisometrization every 3 layers
     )
+    comm = MPI.COMM_WORLD
+    rank = comm.Get_rank()
+    parallel_time = comm.reduce(parallel_time, op=MPI.MAX, root=0)
+    state = local_tensors(simulator.emulator)
+
+    ###############################################################################
+    # We also run the simulation serially to compare the results. Only rank 0
+    # runs it, while the other processes wait, and then sends to each process
+    # the tensors of its own qubits, so that the fidelity is contracted in
+    # place: each process contracts its own segment, and only the boundary
+    # environments are communicated.
+    reference, serial_time = serial_reference(qc, conv_params, simulator.emulator, comm)
+    fidelity = distributed_fidelity(state, reference, comm)
 
     # Print results only if we are on rank 0
-    if MPI.COMM_WORLD.Get_rank() == 0:
-        print(f"Used {MPI.COMM_WORLD.Get_size()} processors")
-        print(f"Time spent for parallel simulation: {results.computational_time}s")
-
-        # We also run the simulation serially to compare the results
-        mpi_settings = MPISettings(mpi_approach="SR", isometrization=-1, num_procs=1)
-        backend = QCBackend(
-            backend="PY", precision="Z", device="cpu", mpi_settings=mpi_settings
-        )
-
-        observables = obs.TNObservables()
-        observables += obs.TNObsProjective(128, True)
-        observables += obs.TNState2File("state_serial", "U")
-        results_serial = run_simulation(
-            qc,
-            convergence_parameters=conv_params,
-            observables=observables,
-            backend=backend,
-        )
-        print(f"Time spent for serial simulation: {results_serial.computational_time}s")
-
-        # Load the MPS states to check for the results
-        mps1 = MPS.from_tensor_list(np.load("data/out/state.pklmps", allow_pickle=True))
-        mps2 = MPS.from_tensor_list(
-            np.load("data/out/state_serial.pklmps", allow_pickle=True)
-        )
-        print(
-            f"Fidelity of the parallel result: { np.abs(mps1.contract(mps2))**2 }. Expected result is 1."
-        )
+    if rank == 0:
+        print(f"Used {comm.Get_size()} processors")
+        print(f"Time spent for parallel simulation: {parallel_time}s")
+        print(f"Time spent for serial simulation: {serial_time}s")
+        print(f"Fidelity of the parallel result: {fidelity}. Expected result is 1.")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,408 @@
+r"""
+Strong and weak scaling benchmark of parallel MPS circuits
+==========================================================
+
+Benchmark suite for the parallel MPS simulation of `mpi_example.py`.
+A grid of configurations, i.e. number of qubits, number of layers of the
+brickwork circuit, bond dimension, `isometrization` and `where_barriers`,
+is run with repetitions on each number of MPI processes. For every run we
+record
+
+- the wall time (slowest rank) and the `computational_time` of qmatchatea;
+- the fidelity lower bound from the singular values cut, and optionally
+  the fidelity with the serial simulation, contracted on the distributed MPS,
+  where the serial reference is simulated once per circuit and bond dimension;
+- the communication volume, i.e. the bytes sent between the ranks,
+  counted on the communicator of the distributed MPS.
+
+The records are appended to a JSON-lines file, so a grid can be extended
+or resumed, and the speedup/efficiency tables for strong scaling (fixed
+number of qubits) and weak scaling (fixed qubits per process) are written
+as csv files.
+
+The `sweep` command launches one MPI job per number of processes:
+
+.. codeblock::
+
+    python3 scaling_benchmark.py sweep --procs 1 2 4 8 --qubits 16 32 --layers 30 \
+        --bond-dimensions 64 --isometrization -1 2 --where-barriers 3 --repetitions 3
+
+while `run` benchmarks the grid on the processes it is launched with, and
+`report` only recomputes the tables:
+
+.. codeblock::
+
+    mpiexec -n 4 python3 scaling_benchmark.py run --qubits 16 --layers 30
+    python3 scaling_benchmark.py report --output scaling_results
+"""
+
+import os
+import sys
+import csv
+import json
+import pickle
+import argparse
+import itertools
+import subprocess
+from time import perf_counter
+
+import numpy as np
+from qmatchatea import QCConvergenceParameters
+from qmatchatea.utils import MPISettings
+
+from brickwork import cached_brickwork_circuit
+from distributed_overlap import run_distributed_circuit, local_tensors, serial_reference, distributed_fidelity
+
+GRID = ["num_qubits", "num_layers", "bond_dimension", "isometrization", "where_barriers"]
+
+
+def _buffer_bytes(buf):
+    """Number of bytes of a buffer-like MPI message, i.e. `array` or `[array, type]`"""
+    if isinstance(buf, (list, tuple)):
+        buf = buf[0]
+    return getattr(buf, "nbytes", 0)
+
+
+class CountingComm:
+    """
+    Wrapper of an MPI communicator counting the bytes and messages sent
+    through it. All the other methods are forwarded to the communicator.
+
+    Parameters
+    ----------
+    comm : MPI.Comm
+        The wrapped communicator
+    """
+
+    def __init__(self, comm):
+        self._comm = comm
+        self.bytes_sent = 0
+        self.messages_sent = 0
+
+    def __getattr__(self, name):
+        return getattr(self._comm, name)
+
+    def _count(self, num_bytes):
+        self.bytes_sent += num_bytes
+        self.messages_sent += 1
+
+    def Send(self, buf, dest, tag=0):
+        self._count(_buffer_bytes(buf))
+        return self._comm.Send(buf, dest, tag)
+
+    def Isend(self, buf, dest, tag=0):
+        self._count(_buffer_bytes(buf))
+        return self._comm.Isend(buf, dest, tag)
+
+    def send(self, obj, dest, tag=0):
+        self._count(len(pickle.dumps(obj)))
+        return self._comm.send(obj, dest, tag)
+
+    def isend(self, obj, dest, tag=0):
+        self._count(len(pickle.dumps(obj)))
+        return self._comm.isend(obj, dest, tag)
+
+
+class _CountingMPI:
+    """The MPI module as seen by the distributed MPS, with a counting COMM_WORLD"""
+
+    def __init__(self, mpi, comm):
+        self._mpi = mpi
+        self.COMM_WORLD = comm
+
+    def __getattr__(self, name):
+        return getattr(self._mpi, name)
+
+
+def run_configuration(qc, bond_dimension, isometrization, where_barriers, check_fidelity=False, references=None):
+    """
+    Run one parallel simulation of the circuit on all the MPI processes.
+    The final MPS stays distributed, and it is never gathered on rank 0.
+
+    Parameters
+    ----------
+    qc : QuantumCircuit
+        The circuit to simulate
+    bond_dimension : int
+        Maximum bond dimension of the MPS
+    isometrization : int
+        Isometrization of the `MPISettings`, -1 for serial
+    where_barriers : int
+        Reisometrization every `where_barriers` layers
+    check_fidelity : bool, optional
+        If True, also compute the fidelity with the serial simulation,
+        contracted in place on the distributed state. Default to False.
+    references : dict | None, optional
+        Cache of the local tensors of the serial simulations of `qc`, keyed by
+        bond dimension, so that the serial reference is computed only once
+        for all the repetitions and parallel settings. Default to None.
+
+    Returns
+    -------
+    dict or None
+        On rank 0, the measured quantities of the run, None on the other ranks
+    """
+    from mpi4py import MPI
+    import qtealeaves.emulator.mpi_mps_simulator as mpi_mps_simulator
+
+    comm = MPI.COMM_WORLD
+    rank, size = comm.Get_rank(), comm.Get_size()
+    counter = CountingComm(comm)
+    # The distributed MPS takes its communicator from the module at creation
+    mpi_mps_simulator.MPI = _CountingMPI(MPI, counter)
+
+    mpi_approach = "CT" if size > 1 else "SR"
+    mpi_settings = MPISettings(mpi_approach=mpi_approach, isometrization=isometrization, num_procs=1)
+    conv_params = QCConvergenceParameters(max_bond_dimension=bond_dimension, trunc_tracking_mode="C")
+
+    try:
+        comm.Barrier()
+        start = perf_counter()
+        simulator, singvals_cut, computational_time = run_distributed_circuit(
+            qc, conv_params, mpi_settings, where_barriers=where_barriers
+        )
+        wall_time = perf_counter() - start
+    finally:
+        mpi_mps_simulator.MPI = MPI
+
+    # Lower bound of the fidelity from the singular values cut on all the processes
+    fidelity = comm.reduce(float(np.prod(1 - np.array(singvals_cut))), op=MPI.PROD, root=0)
+    serial_fidelity = None
+    if check_fidelity:
+        if references is None:
+            references = {}
+        if bond_dimension not in references:
+            references[bond_dimension], _ = serial_reference(qc, conv_params, simulator.emulator, comm)
+        reference = references[bond_dimension]
+        serial_fidelity = distributed_fidelity(local_tensors(simulator.emulator), reference, comm)
+
+    wall_time = comm.reduce(wall_time, op=MPI.MAX, root=0)
+    computational_time = comm.reduce(computational_time, op=MPI.MAX, root=0)
+    bytes_sent = comm.reduce(counter.bytes_sent, op=MPI.SUM, root=0)
+    messages_sent = comm.reduce(counter.messages_sent, op=MPI.SUM, root=0)
+    if rank != 0:
+        return None
+    return {
+        "mpi_approach": mpi_approach,
+        "wall_time": wall_time,
+        "computational_time": computational_time,
+        "fidelity": fidelity,
+        "serial_fidelity": serial_fidelity,
+        "bytes_sent": int(bytes_sent),
+        "messages_sent": int(messages_sent),
+    }
+
+
+def run_grid(grid, repetitions, output, seed, check_fidelity=False):
+    """
+    Run all the configurations of the grid on the current MPI processes,
+    appending one record per repetition to `output/results.jsonl`.
+    Configurations already in the file are skipped.
+
+    Parameters
+    ----------
+    grid : dict
+        Lists of values for each entry of `GRID`
+    repetitions : int
+        Number of repetitions of each configuration
+    output : str
+        Output folder
+    seed : int
+        Seed of the circuits
+    check_fidelity : bool, optional
+        If True, also record the fidelity with the serial simulation. Default to False.
+
+    Returns
+    -------
+    None
+    """
+    from mpi4py import MPI
+
+    comm = MPI.COMM_WORLD
+    rank, size = comm.Get_rank(), comm.Get_size()
+    filename = os.path.join(output, "results.jsonl")
+
+    done = None
+    if rank == 0:
+        os.makedirs(output, exist_ok=True)
+        done = {(tuple(rec[key] for key in GRID), rec["repetition"])
+                for rec in read_records(filename) if rec["num_procs"] == size}
+    done = comm.bcast(done, root=0)
+
+    # Circuit of the current (num_qubits, num_layers) and its serial references
+    circuit_key, qc, references = None, None, {}
+    for values in itertools.product(*(grid[key] for key in GRID)):
+        config = dict(zip(GRID, values))
+        if config["num_qubits"] < 2 * size:
+            continue
+        for repetition in range(repetitions):
+            if (values, repetition) in done:
+                continue
+            if circuit_key != values[:2]:
+                circuit_key, references = values[:2], {}
+                qc = cached_brickwork_circuit(config["num_qubits"], config["num_layers"], seed,
+                                              cache_dir=os.path.join(output, "circuits"))
+            result = run_configuration(
+                qc, config["bond_dimension"], config["isometrization"], config["where_barriers"],
+                check_fidelity, references,
+            )
+            if rank == 0:
+                record = {**config, "num_procs": size, "repetition": repetition, "seed": seed, **result}
+                with open(filename, "a") as fh:
+                    fh.write(json.dumps(record) + "\n")
+                print(json.dumps(record), flush=True)
+
+
+def read_records(filename):
+    """
+    Read the records of the benchmark.
+
+    Parameters
+    ----------
+    filename : str
+        Path to the results.jsonl file
+
+    Returns
+    -------
+    List[dict]
+        The records, empty if the file does not exist
+    """
+    if not os.path.exists(filename):
+        return []
+    with open(filename) as fh:
+        return [json.loads(line) for line in fh if line.strip()]
+
+
+def scaling_tables(records):
+    """
+    Compute the strong and weak scaling tables from the records, using the
+    median over the repetitions of the wall time.
+
+    Strong scaling compares runs with the same configuration, with speedup
+    S(p) = T(p0)/T(p) and efficiency E(p) = S(p) p0/p, where p0 is the smallest
+    number of processes measured. Weak scaling compares runs with the same
+    number of qubits per process, with efficiency E(p) = T(p0)/T(p).
+
+    Parameters
+    ----------
+    records : List[dict]
+        Records of `run_grid`
+
+    Returns
+    -------
+    strong, weak : List[dict]
+        Rows of the two tables
+    """
+    times = {}
+    for rec in records:
+        key = tuple(rec[key] for key in GRID) + (rec["num_procs"],)
+        times.setdefault(key, []).append(rec)
+    summary = []
+    for key, recs in sorted(times.items()):
+        summary.append({
+            **dict(zip(GRID, key[:-1])),
+            "num_procs": key[-1],
+            "repetitions": len(recs),
+            "wall_time": float(np.median([rec["wall_time"] for rec in recs])),
+            "fidelity": float(np.median([rec["fidelity"] for rec in recs])),
+            "bytes_sent": float(np.median([rec["bytes_sent"] for rec in recs])),
+        })
+
+    strong = []
+    for key, group in itertools.groupby(summary, key=lambda row: tuple(row[key] for key in GRID)):
+        group = list(group)
+        base = group[0]
+        for row in group:
+            speedup = base["wall_time"] / row["wall_time"]
+            strong.append({**row, "speedup": speedup,
+                           "efficiency": speedup * base["num_procs"] / row["num_procs"]})
+
+    weak_key = lambda row: (row["num_qubits"] / row["num_procs"],) + tuple(row[key] for key in GRID[1:])
+    weak = []
+    for key, group in itertools.groupby(sorted(summary, key=lambda row: weak_key(row) + (row["num_procs"],)),
+                                        key=weak_key):
+        group = list(group)
+        if len(group) < 2:
+            continue
+        base = group[0]
+        for row in group:
+            weak.append({**row, "qubits_per_proc": key[0],
+                         "efficiency": base["wall_time"] / row["wall_time"]})
+    return strong, weak
+
+
+def write_table(filename, rows):
+    """Write the rows of a table to a csv file"""
+    if not rows:
+        return
+    with open(filename, "w", newline="") as fh:
+        writer = csv.DictWriter(fh, fieldnames=list(rows[0].keys()))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def report(output):
+    """
+    Write `strong_scaling.csv` and `weak_scaling.csv` in the output folder and
+    print the strong scaling table.
+
+    Parameters
+    ----------
+    output : str
+        Output folder of the benchmark
+    """
+    strong, weak = scaling_tables(read_records(os.path.join(output, "results.jsonl")))
+    write_table(os.path.join(output, "strong_scaling.csv"), strong)
+    write_table(os.path.join(output, "weak_scaling.csv"), weak)
+
+    print(f"{'qubits':>6} {'layers':>6} {'chi':>5} {'iso':>4} {'barr':>4} {'procs':>5} "
+          f"{'time [s]':>10} {'speedup':>8} {'eff.':>6} {'fidelity':>10} {'MB sent':>10}")
+    for row in strong:
+        print(f"{row['num_qubits']:>6} {row['num_layers']:>6} {row['bond_dimension']:>5} "
+              f"{row['isometrization']:>4} {row['where_barriers']:>4} {row['num_procs']:>5} "
+              f"{row['wall_time']:>10.3f} {row['speedup']:>8.2f} {row['efficiency']:>6.2f} "
+              f"{row['fidelity']:>10.6f} {row['bytes_sent'] / 2**20:>10.3f}")
+    if weak:
+        print(f"\nWeak scaling: {len(weak)} rows written to {os.path.join(output, 'weak_scaling.csv')}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scaling benchmark of parallel MPS circuits.")
+    parser.add_argument("command", choices=["run", "sweep", "report"])
+    parser.add_argument("--qubits", type=int, nargs="+", default=[16])
+    parser.add_argument("--layers", type=int, nargs="+", default=[30])
+    parser.add_argument("--bond-dimensions", type=int, nargs="+", default=[64])
+    parser.add_argument("--isometrization", type=int, nargs="+", default=[-1])
+    parser.add_argument("--where-barriers", type=int, nargs="+", default=[3])
+    parser.add_argument("--repetitions", type=int, default=3)
+    parser.add_argument("--procs", type=int, nargs="+", default=[1, 2, 4],
+                        help="Numbers of MPI processes of the sweep.")
+    parser.add_argument("--mpi-command", default="mpiexec")
+    parser.add_argument("--seed", type=int, default=11)
+    parser.add_argument("--check-fidelity", action="store_true",
+                        help="Also compute the fidelity with the serial simulation.")
+    parser.add_argument("--output", default="scaling_results")
+    args = parser.parse_args()
+
+    grid = {
+        "num_qubits": args.qubits,
+        "num_layers": args.layers,
+        "bond_dimension": args.bond_dimensions,
+        "isometrization": args.isometrization,
+        "where_barriers": args.where_barriers,
+    }
+
+    if args.command == "run":
+        run_grid(grid, args.repetitions, args.output, args.seed, args.check_fidelity)
+    elif args.command == "sweep":
+        run_args = ["run"] + sys.argv[2:]
+        for num_procs in args.procs:
+            subprocess.run([args.mpi_command, "-n", str(num_procs), sys.executable,
+                            os.path.abspath(__file__)] + run_args, check=True)
+        report(args.output)
+    else:
+        report(args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Exact solution of the 2D Ising model on the infinite square lattice,
+as in the notebook 2D_ising_exact.ipynb.
+
+All the functions take arrays of inverse temperatures and evaluate them
+at once: the free energy integral uses one fixed Gauss-Legendre grid,
+broadcast over beta, while internal energy and specific heat are written
+with the complete elliptic integrals K and E, so no adaptive quadrature
+nor finite differences are involved. For repeated dense scans, the
+curves can also be read from a lookup table cached on disk.
+
+https://en.wikipedia.org/wiki/Square_lattice_Ising_model
+https://arxiv.org/abs/cond-mat/9511003
+"""
+
+import os
+from functools import lru_cache
+
+import numpy as np
+from scipy.special import ellipe, ellipk
+
+T_crit = 2 / np.log(1 + np.sqrt(2))
+beta_crit = 1 / T_crit
+
+# Gauss-Legendre grid on [0, pi/2]; the integrand is symmetric around pi/2,
+# and its only non-smooth point at T_c falls on the boundary of the interval
+_nodes, _weights = np.polynomial.legendre.leggauss(256)
+_nodes = np.pi/4*(_nodes + 1)
+_weights = np.pi/4*_weights
+_sin2 = np.sin(_nodes)**2
+
+
+def _modulus(beta, J):
+    """
+    k = 2 sinh(2 beta J)/cosh(2 beta J)^2, the elliptic modulus of the solution, with k<=1
+    """
+
+    return np.minimum(2*np.sinh(2*beta*J)/np.cosh(2*beta*J)**2, 1)
+
+
+def _singular_term(t, m):
+    """
+    (2 t^2 - 1) K(m) with t = tanh(2 beta J) and m = k^2. At T_c K diverges
+    logarithmically while 2 t^2 - 1 vanishes linearly, so the product is 0
+    """
+
+    with np.errstate(invalid="ignore"):
+        return np.where(m < 1, (2*t**2 - 1)*ellipk(m), 0.0)
+
+
+def Helmholtz_free_energy(beta, J=1):
+    """
+    Argument: Inverse temperature beta=1/T, scalar or array, and coupling J
+    Returns: Exact Helmholtz_free_energy per side, -beta*f = ln(Z)/N
+    """
+
+    beta = np.asarray(beta, dtype=float)
+    k = _modulus(beta, J)[..., None]
+    integrand = np.log(0.5*(1 + np.sqrt(np.maximum(0, 1 - k**2*_sin2))))
+    return np.log(2*np.cosh(2*beta*J)) + (1/np.pi)*(integrand @ _weights)
+
+
+def U_exact(beta, J):
+    """
+    Arguments:
+    beta inverse temperature (1/T), scalar or array, J coupling in Ising model
+    Returns:
+    Internal energy per site, U = -d(ln Z/N)/d(beta)
+    """
+
+    beta = np.asarray(beta, dtype=float)
+    t = np.tanh(2*beta*J)
+    return -J/t*(1 + (2/np.pi)*_singular_term(t, _modulus(beta, J)**2))
+
+
+def specific_heat(beta, J):
+    """
+    Arguments:
+    beta inverse temperature (1/T), scalar or array, J coupling in Ising model
+    Returns:
+    Specific heat per site, C = -beta^2 dU/d(beta), diverging logarithmically at T_c
+    """
+
+    beta = np.asarray(beta, dtype=float)
+    t = np.tanh(2*beta*J)
+    m = _modulus(beta, J)**2
+    K, E = ellipk(m), ellipe(m)
+    return (4/np.pi)*(beta*J/t)**2*(K - E - (1 - t**2)*(np.pi/2 + _singular_term(t, m)))
+
+
+def M_exact(beta, J):
+    """
+    Arguments:
+    beta inverse temperature (1/T), scalar or array, J coupling in Ising model
+    Returns:
+    Exact solution for magnetization per side, zero above T_c
+    """
+
+    beta = np.asarray(beta, dtype=float)
+    M = np.maximum(0, 1 - np.sinh(2*beta*J)**(-4.0))**(1/8)
+    return M
+
+
+@lru_cache(maxsize=None)
+def reference_table(J=1, beta_min=0.05, beta_max=2, n_points=200001, cache_dir="ising_exact_cache"):
+    """
+    Arguments:
+    J coupling, beta_min, beta_max and n_points of the uniform beta grid,
+    cache_dir folder of the cached tables
+    Returns:
+    Dictionary of arrays 'beta', 'free_energy', 'U', 'C', 'M' on the grid,
+    loaded from cache_dir if it was computed before, and kept in memory
+    """
+
+    os.makedirs(cache_dir, exist_ok=True)
+    filename = os.path.join(cache_dir, f"ising_exact_J_{J!r}_{beta_min!r}_{beta_max!r}_{n_points}.npz")
+    if os.path.exists(filename):
+        with np.load(filename) as table:
+            return dict(table)
+
+    beta = np.linspace(beta_min, beta_max, n_points)
+    table = {
+        "beta": beta,
+        "free_energy": np.concatenate([Helmholtz_free_energy(chunk, J) for chunk in np.array_split(beta, 100)]),
+        "U": U_exact(beta, J),
+        "C": specific_heat(beta, J),
+        "M": M_exact(beta, J),
+    }
+    temporary = filename + f".{os.getpid()}.npz"
+    np.savez(temporary, **table)
+    os.replace(temporary, filename)
+    return table
+
+
+def interpolate_reference(beta, quantity="free_energy", J=1, **table_options):
+    """
+    Arguments:
+    beta inverse temperatures, quantity among 'free_energy', 'U', 'C', 'M',
+    J coupling, table_options passed to reference_table
+    Returns:
+    The quantity at beta, linearly interpolated on the cached table
+    """
+
+    table = reference_table(J, **table_options)
+    return np.interp(beta, table["beta"], table[quantity])
+
+
+def check_critical_point(J=1, delta=1e-6):
+    """
+    Arguments:
+    J coupling, delta step of the finite difference
+    Returns:
+    The internal energy at beta_c/J, checked against U(beta_c) = -sqrt(2) J and
+    against the finite difference of the free energy around beta_c
+    """
+
+    beta = beta_crit/J
+    U_crit = U_exact(beta, J)
+    if not np.isclose(U_crit, -np.sqrt(2)*J, rtol=1e-12, atol=0):
+        raise ValueError(f"U(beta_c) = {U_crit}, expected {-np.sqrt(2)*J}")
+    log_z = Helmholtz_free_energy([beta - delta, beta + delta], J)
+    U_numerical = -(log_z[1] - log_z[0])/(2*delta)
+    if not np.isclose(U_crit, U_numerical, rtol=1e-6, atol=0):
+        raise ValueError(f"U(beta_c) = {U_crit}, finite difference of the free energy {U_numerical}")
+    return U_crit
+
+
+if __name__ == "__main__":
+    print(f"U(beta_c) = {check_critical_point()}, -sqrt(2) = {-np.sqrt(2)}")
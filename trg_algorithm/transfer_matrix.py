@@ -0,0 +1,200 @@
+"""
+Transfer matrix of the 2D Ising model on cylinders of finite width W.
+
+The row-to-row transfer matrix of a periodic row of W spins,
+    T(s, s') = exp(beta/2 E(s)) prod_i exp(beta J s_i s'_i) exp(beta/2 E(s')),
+    E(s) = J sum_i s_i s_{i+1} + h sum_i s_i,
+is a 2^W x 2^W dense matrix, but it is never stored. The spin rows are the
+bits of the integers 0, ..., 2^W-1 (bit set = spin down), the diagonal part
+follows from bit operations on all the integers at once, and the vertical
+bonds are a tensor product of 2x2 matrices, applied on groups of bits
+as small Kronecker-product matrices. The product is cache-blocked: the
+groups of the low bits are applied chunk by chunk on 2^chunk_bits
+contiguous entries, and the groups of the high bits on blocks of columns
+of the vector seen as a (2^(W-split), 2^split) matrix, so the whole
+vector is read only twice per product instead of once per group.
+The leading eigenvalues come from ARPACK (Lanczos), and give for the
+infinitely long cylinder:
+- the free energy per site, ln(Z)/N = ln(lambda_0)/W,
+- the correlation length along the cylinder, 1/ln(lambda_0/|lambda_1|),
+- the magnetization per site, from the leading eigenvector.
+
+Measured cost on one core at beta_c, about 27 products per call:
+    W    product    cylinder_observables
+    16   1.2 ms     0.07 s
+    20   11 ms      1.3 s
+    22   46 ms      7 s
+    24   0.26 s     31 s
+Above W~20 most of the time is spent by ARPACK itself, orthogonalizing
+and restarting the Lanczos vectors of size 2^W, rather than in the products.
+
+Usage:
+    python3 transfer_matrix.py --widths 4 8 12 16 --beta 0.4 0.44 0.5
+"""
+
+import argparse
+from time import perf_counter
+
+import numpy as np
+from scipy.sparse.linalg import LinearOperator, eigsh
+
+from ising_exact import Helmholtz_free_energy, beta_crit
+
+
+def popcount(x):
+    """
+    Arguments: array of non-negative integers below 2^32
+    Returns: number of set bits of each integer (SWAR bit counting)
+    """
+
+    x = x.astype(np.uint32)
+    x = x - ((x >> 1) & 0x55555555)
+    x = (x & 0x33333333) + ((x >> 2) & 0x33333333)
+    x = (x + (x >> 4)) & 0x0F0F0F0F
+    return ((x * np.uint32(0x01010101)) >> 24).astype(np.int64)
+
+
+def row_energies(W, J=1, h=0):
+    """
+    Arguments:
+    W width of the cylinder, J coupling, h magnetic field
+    Returns:
+    E(s) = J sum_i s_i s_{i+1} + h sum_i s_i and the magnetization sum_i s_i
+    of all the 2^W periodic rows, indexed by their bit string
+    """
+
+    states = np.arange(2**W, dtype=np.uint32)
+    rotated = ((states >> 1) | (states << (W - 1))) & np.uint32(2**W - 1)
+    magnetization = W - 2*popcount(states)
+    energies = J*(W - 2*popcount(states ^ rotated)) + h*magnetization
+    return energies, magnetization
+
+
+class IsingTransferMatrix(LinearOperator):
+    """
+    Arguments:
+    W width of the cylinder, beta inverse temperature (1/T), J coupling, h magnetic field,
+    group_bits number of bits whose vertical bonds are applied as one 2^group_bits matrix,
+    chunk_bits the low groups are applied on chunks of 2^chunk_bits entries
+
+    Symmetric matrix-free transfer matrix, usable by the scipy.sparse.linalg solvers.
+    """
+
+    def __init__(self, W, beta, J=1, h=0, group_bits=4, chunk_bits=16):
+        super().__init__(dtype=np.float64, shape=(2**W, 2**W))
+        self.W = W
+        energies, self.magnetization = row_energies(W, J, h)
+        # The diagonal factor is shifted by its maximum, i.e. T = exp(shift) T_scaled
+        self.shift = beta*np.max(energies) + beta*abs(J)*W
+        self.half_diagonal = np.exp(0.5*beta*(energies - np.max(energies)))
+        parallel, antiparallel = 1.0, np.exp(-2*beta*abs(J))
+        if J < 0:
+            parallel, antiparallel = antiparallel, parallel
+        # Vertical bonds: Kronecker products of the 2x2 bond matrix on groups of bits
+        bond = np.array([[parallel, antiparallel], [antiparallel, parallel]])
+        self.groups = []
+        for low in range(0, W, group_bits):
+            block = np.ones((1, 1))
+            for _ in range(min(group_bits, W - low)):
+                block = np.kron(block, bond)
+            self.groups.append((low, block))
+        # Groups fully inside a chunk are applied chunk by chunk, the others on columns
+        ends = [low + int(np.log2(block.shape[0])) for low, block in self.groups]
+        self.split = max([end for end in ends if end <= chunk_bits], default=0)
+        self.chunk_size = 2**max(chunk_bits, self.split)
+        self.columns = max(1, 2**chunk_bits >> (W - self.split))
+
+    @staticmethod
+    def _apply_groups(x, groups, offset=0, columns=1):
+        """
+        Arguments: x array of the entries, groups list of (low bit, block),
+        offset first bit of x, columns number of contiguous entries of each bit string
+        Returns: the groups applied to x, as an array of the same size
+        """
+
+        for low, block in groups:
+            if low == offset and columns == 1:
+                x = x.reshape(-1, block.shape[0]) @ block
+            else:
+                x = np.matmul(block, x.reshape(-1, block.shape[0], 2**(low - offset)*columns))
+        return x
+
+    def _matvec(self, x):
+        x = np.ravel(x)
+        low_groups = [group for group in self.groups if group[0] < self.split]
+        high_groups = [group for group in self.groups if group[0] >= self.split]
+        if not low_groups:
+            y = self.half_diagonal*x
+        else:
+            y = np.empty(self.shape[0])
+            for start in range(0, y.size, self.chunk_size):
+                chunk = slice(start, start + self.chunk_size)
+                y[chunk] = self._apply_groups(self.half_diagonal[chunk]*x[chunk], low_groups).ravel()
+        if not high_groups:
+            return self.half_diagonal*y
+
+        Y = y.reshape(-1, 2**self.split)
+        half_diagonal = self.half_diagonal.reshape(Y.shape)
+        for start in range(0, Y.shape[1], self.columns):
+            block = np.s_[:, start:start + self.columns]
+            Y[block] = half_diagonal[block]*self._apply_groups(
+                Y[block], high_groups, self.split, self.columns).reshape(-1, self.columns)
+        return y
+
+    def _rmatvec(self, x):
+        return self._matvec(x)
+
+
+def cylinder_observables(W, beta, J=1, h=0, n_eigenvalues=2, tol=1e-8, ncv=8, seed=1):
+    """
+    Arguments:
+    W width of the cylinder, beta inverse temperature (1/T), J coupling, h magnetic field,
+    n_eigenvalues number of leading eigenvalues, tol and ncv ARPACK tolerance and
+number of Lanczos vectors, seed of the start vector
+    Returns:
+    Dictionary with the free energy per site 'log_z' = ln(Z)/N = -beta*f,
+    the 'correlation_length', the 'magnetization' per site <s>, its root
+    mean square on a row 'rms_magnetization', which is nonzero also at h=0,
+    and the logarithms 'log_eigenvalues' of the leading eigenvalues of the transfer matrix
+    """
+
+    transfer = IsingTransferMatrix(W, beta, J, h)
+    v0 = np.random.default_rng(seed).standard_normal(2**W)
+    values, vectors = eigsh(transfer, k=n_eigenvalues, which="LA", v0=v0, tol=tol,
+                            ncv=max(ncv, 2*n_eigenvalues + 1))
+    order = np.argsort(values)[::-1]
+    values, leading = values[order], vectors[:, order[0]]
+
+    weights = leading**2/np.sum(leading**2)
+    row_magnetization = transfer.magnetization/W
+    log_values = np.log(np.abs(values)) + transfer.shift
+    return {
+        "log_z": log_values[0]/W,
+        "correlation_length": 1/(log_values[0] - log_values[1]),
+        "magnetization": np.dot(weights, row_magnetization),
+        "rms_magnetization": np.sqrt(np.dot(weights, row_magnetization**2)),
+        "log_eigenvalues": log_values,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Transfer matrix of 2D Ising cylinders.")
+    parser.add_argument("--widths", type=int, nargs="+", default=[4, 8, 12, 16, 20])
+    parser.add_argument("--beta", type=float, nargs="+", default=[0.3, 0.4, beta_crit, 0.5])
+    parser.add_argument("--field", type=float, default=0)
+    args = parser.parse_args()
+
+    print(f"{'W':>3} {'beta':>8} {'ln(Z)/N':>14} {'exact (W=inf)':>14} {'xi':>12} "
+          f"{'<s>':>9} {'rms(s)':>9} {'time [s]':>9}")
+    for W in args.widths:
+        for beta in args.beta:
+            st_time = perf_counter()
+            result = cylinder_observables(W, beta, h=args.field)
+            runtime = perf_counter() - st_time
+            print(f"{W:>3} {beta:>8.5f} {result['log_z']:>14.10f} {Helmholtz_free_energy(beta):>14.10f} "
+                  f"{result['correlation_length']:>12.4f} {result['magnetization']:>9.5f} "
+                  f"{result['rms_magnetization']:>9.5f} {runtime:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()